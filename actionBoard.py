@@ -0,0 +1,41 @@
+class ActionBoard:
+    """
+    Merges the action messages of the controllers moving the axes of one
+    tracker into the one action text of the tracker.
+
+    The FleetManager moves the pitch and the roll of a tracker with one
+    controller each. Writing their own messages, they would overwrite each
+    other every tick and both would send the text. Every controller posts
+    the message of the axes it moves instead: the text shows the messages
+    of all axes and is only sent when it changed, whoever posted it.
+    """
+    def __init__(self):
+        self.messages = {} # actionStateId -> {axes: message}
+        self.texts = {} # actionStateId -> last text handed out
+
+    def post(self, actionStateId, axes, message):
+        """
+        Parameters:
+            actionStateId (str): Action text entity of the tracker
+            axes (frozenset): Axes the message is about, it replaces the messages of overlapping axes
+            message (str): Message of these axes
+
+        Returns:
+            str: The new action text, None if it didn't change
+        """
+        messages = self.messages.setdefault(actionStateId, {})
+        for key in [key for key in messages if key != axes and key & axes]:
+            del messages[key]
+        messages[axes] = message
+        text = " | ".join(messages[key] for key in sorted(messages, key=sorted))
+        if self.texts.get(actionStateId) == text:
+            return None
+        self.texts[actionStateId] = text
+        return text
+
+    def forget(self, actionStateId):
+        """The next post hands out the text in any case, e.g. at the start of a move."""
+        self.texts.pop(actionStateId, None)
+
+# Shared by all SolarController instances of the process
+actionBoard = ActionBoard()
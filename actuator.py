@@ -0,0 +1,112 @@
+import asyncio
+
+from asyncUtils import resolve
+
+class Actuator:
+    """
+    Write-coalescing front end for the switch, speed and text service calls.
+
+    Commands are queued per entity, a later command for the same entity
+    replaces an earlier one, and commands equal to the last one sent are
+    dropped. Queued commands are sent with flush()/flushAsync(), which the
+    move loops call once at the end of every tick.
+    """
+    def __init__(self, hass, transport=None):
+        self.hass = hass
+        self.transport = transport if transport is not None else hass
+        self.commanded = {}
+        self.pending = {}
+        self.sentCount = 0
+        self.skippedCount = 0
+
+    def reset(self):
+        """Drop queued commands and forget everything sent so far."""
+        self.pending.clear()
+        self.commanded.clear()
+
+    def invalidate(self, entityId=None):
+        """Forget the last commanded value(s), so that the next command is sent in any case."""
+        if entityId is None:
+            self.commanded.clear()
+        else:
+            self.commanded.pop(entityId, None)
+
+    def switchOn(self, entityId, observedState=None):
+        self.queue(entityId, "on", "switch/turn_on", {}, observedState)
+
+    def switchOff(self, entityId, observedState=None):
+        self.queue(entityId, "off", "switch/turn_off", {}, observedState)
+
+    def setBrightness(self, entityId, brightness, force=False):
+        if force:
+            self.invalidate(entityId)
+        self.queue(entityId, brightness, "light/turn_on", {"brightness": brightness})
+
+    def setText(self, entityId, value):
+        self.queue(entityId, value, "input_text/set_value", {"value": value})
+
+    def queue(self, entityId, value, service, kwargs, observedState=None):
+        """
+        Queues a service call unless it wouldn't change anything.
+
+        Parameters:
+            entityId (str): Entity to write
+            value: Value the entity will have after the call
+            service (str): Home Assistant service
+            kwargs (dict): Extra service data
+            observedState: State read from Home Assistant, overrides the last commanded value
+        """
+        if entityId is None:
+            return
+        if observedState is not None and observedState != self.commanded.get(entityId):
+            self.commanded[entityId] = observedState
+
+        if entityId not in self.pending and self.commanded.get(entityId) == value:
+            self.skippedCount += 1
+            return
+        self.pending[entityId] = (value, service, kwargs)
+
+    def takePending(self):
+        pending, self.pending = self.pending, {}
+        commands = []
+        for entityId, (value, service, kwargs) in pending.items():
+            if self.commanded.get(entityId) == value:
+                self.skippedCount += 1
+                continue
+            self.log(entityId, service, kwargs)
+            self.commanded[entityId] = value
+            commands.append((entityId, service, kwargs))
+        self.sentCount += len(commands)
+        return commands
+
+    def flush(self):
+        """Sends all queued commands."""
+        for entityId, service, kwargs in self.takePending():
+            self.call(entityId, service, kwargs)
+
+    async def flushAsync(self):
+        """Sends all queued commands concurrently."""
+        commands = self.takePending()
+        await asyncio.gather(*(self.callAsync(entityId, service, kwargs) for entityId, service, kwargs in commands))
+
+    def call(self, entityId, service, kwargs):
+        try:
+            self.transport.call_service(service, entity_id=entityId, **kwargs)
+        except:
+            self.invalidate(entityId)
+            raise
+
+    async def callAsync(self, entityId, service, kwargs):
+        try:
+            await resolve(self.transport.call_service(service, entity_id=entityId, **kwargs))
+        except:
+            self.invalidate(entityId)
+            raise
+
+    def log(self, entityId, service, kwargs):
+        if service == "switch/turn_on":
+            self.hass.log(f"Switch on {entityId}")
+        elif service == "switch/turn_off":
+            self.hass.log(f"Switch off {entityId}")
+        elif service == "light/turn_on":
+            self.hass.log(f"Set speed of {entityId} with {kwargs['brightness']}")
@@ -0,0 +1,41 @@
+import asyncio
+import inspect
+
+async def resolve(result):
+    """Awaits results of AppDaemon's async API, results of the sync API are returned as they are."""
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+def getHassLoop(hass):
+    """Returns the event loop of AppDaemon if hass is an AppDaemon app, None otherwise."""
+    return getattr(getattr(hass, "AD", None), "loop", None)
+
+def runSync(coroutine, hass):
+    """
+    Runs a coroutine from synchronous code and returns its result.
+
+    AppDaemon's sync API only blocks on threads without a running event
+    loop, on a loop of its own asyncio.run would get futures of that loop
+    back. So on AppDaemon the coroutine runs on AppDaemon's loop, where
+    resolve awaits these futures, and the calling worker thread waits for
+    it. Without AppDaemon, e.g. in the simulation, it runs on a new loop.
+
+    Parameters:
+        coroutine (coroutine): Coroutine to run
+        hass (object): The AppDaemon app or its stand-in
+
+    Raises:
+        RuntimeError: If it is called on AppDaemon's loop, async apps have to await the coroutine
+    """
+    loop = getHassLoop(hass)
+    if loop is None:
+        return asyncio.run(coroutine)
+    try:
+        runningLoop = asyncio.get_running_loop()
+    except RuntimeError:
+        runningLoop = None
+    if runningLoop is loop:
+        coroutine.close()
+        raise RuntimeError("The sync API would block AppDaemon's loop, await the async API instead")
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
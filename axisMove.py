@@ -0,0 +1,32 @@
+from dataclasses import dataclass
+
+from motionVerifier import MotionStatus
+
+@dataclass(frozen=True)
+class AxisMoveResult:
+    """Outcome of the move of one axis."""
+    axis: str # 'pitch' or 'roll'
+    endReason: str # e.g. 'settled', 'steady', 'timeout', 'stalled', 'not connected', 'preempted', 'cancelled', 'error'
+    status: MotionStatus # Fault found by the motion verification, MotionStatus.Ok if none
+    ticks: int
+
+    @property
+    def ok(self):
+        return self.status == MotionStatus.Ok
+
+class AxisMove:
+    """State of one axis during a move."""
+    def __init__(self, axis):
+        self.axis = axis # 'pitch' or 'roll'
+        self.active = True
+        self.printedDirection = False
+        self.direction = None # Direction the motor was last switched on in
+        self.speed = 0.0 # Last commanded speed in %
+        self.control = None # PID output of the current tick
+        self.ticks = 0
+        self.endReason = None # e.g. 'settled', 'steady', 'max position', 'timeout'
+        self.status = MotionStatus.Ok
+        self.approachUntil = None # End of the open loop approach, None if closed loop
+
+    def getResult(self):
+        return AxisMoveResult(self.axis, self.endReason, self.status, self.ticks)
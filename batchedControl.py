@@ -0,0 +1,114 @@
+import math
+
+import numpy as np
+
+class BatchedPIDController:
+    """
+    Steps count independent PID states at once.
+
+    Gains may be scalars shared by all states or arrays with one gain per
+    state, e.g. one candidate per state in a tuning sweep. The arithmetic is
+    the one of PIDController.update in the same order, so every state gives
+    bitwise the same output as a scalar PIDController fed the same values.
+    """
+    def __init__(self, Kp, Ki, Kd, count, setpoint=0.0):
+        self.Kp = np.broadcast_to(np.asarray(Kp, dtype=float), (count,))
+        self.Ki = np.broadcast_to(np.asarray(Ki, dtype=float), (count,))
+        self.Kd = np.broadcast_to(np.asarray(Kd, dtype=float), (count,))
+        self.setpoint = np.broadcast_to(np.asarray(setpoint, dtype=float), (count,))
+        self.count = count
+
+        self._prev_error = np.zeros(count)
+        self._integral = np.zeros(count)
+
+    @classmethod
+    def fromControllers(cls, pidControllers):
+        """Creates the batched counterpart of a list of PIDController, with their current state."""
+        batched = cls([pid.Kp for pid in pidControllers], [pid.Ki for pid in pidControllers],
+                      [pid.Kd for pid in pidControllers], len(pidControllers),
+                      [pid.setpoint for pid in pidControllers])
+        batched._prev_error[:] = [pid._prev_error for pid in pidControllers]
+        batched._integral[:] = [pid._integral for pid in pidControllers]
+        return batched
+
+    def update(self, measurement, dt, mask=None):
+        """
+        Calculate the PID outputs of all states.
+
+        :param measurement: Current values, array of count values
+        :param dt: Time interval since last update, scalar or array of count values
+        :param mask: Boolean array of the states to update, all if None. The
+                     other states keep their state and output 0.
+        :return: Control outputs, array of count values
+        """
+        measurement = np.asarray(measurement, dtype=float)
+        dt = np.broadcast_to(np.asarray(dt, dtype=float), (self.count,))
+        if mask is None:
+            mask = np.ones(self.count, dtype=bool)
+
+        error = self.setpoint - measurement
+        integral = self._integral + error * dt
+        derivative = np.zeros(self.count)
+        np.divide(error - self._prev_error, dt, out=derivative, where=dt > 0)
+
+        output = (
+            self.Kp * error +
+            self.Ki * integral +
+            self.Kd * derivative
+        )
+
+        self._integral = np.where(mask, integral, self._integral)
+        self._prev_error = np.where(mask, error, self._prev_error)
+        return np.where(mask, output, 0.0)
+
+    def reset(self, mask=None):
+        """Reset the integral and previous error of the selected states, all if mask is None."""
+        if mask is None:
+            self._integral[:] = 0.0
+            self._prev_error[:] = 0.0
+        else:
+            self._integral[mask] = 0.0
+            self._prev_error[mask] = 0.0
+
+class BatchedCompensatePosition:
+    """
+    Maps arrays of pitches through the CompensatePosition curve in one call.
+
+    The curve parameters may be scalars or arrays broadcastable against the
+    input, e.g. one aggressiveness per tracker. NumPy's vectorized power may
+    round the last bit differently than math.pow, so results match
+    CompensatePosition.compensate within one ulp. With exact=True the power
+    is taken with math.pow per element, which is slower but bitwise identical.
+    """
+    def __init__(self, in_min=30, in_max=70, out_min=1.0, out_max=1.5, aggressiveness=3, exact=False):
+        self.in_min = np.asarray(in_min, dtype=float)
+        self.in_max = np.asarray(in_max, dtype=float)
+        self.out_min = np.asarray(out_min, dtype=float)
+        self.out_max = np.asarray(out_max, dtype=float)
+        self.aggressiveness = np.asarray(aggressiveness, dtype=float)
+        # The exponent is computed with Python floats like CompensatePosition does
+        self.exponent = np.vectorize(lambda aggressiveness: float(aggressiveness) ** 1.5, otypes=[float])(self.aggressiveness)
+        self.exact = exact
+
+    @classmethod
+    def fromCompensations(cls, compensations, exact=False):
+        """Creates the batched counterpart of a list of CompensatePosition, one per input element."""
+        return cls([c.in_min for c in compensations], [c.in_max for c in compensations],
+                   [c.out_min for c in compensations], [c.out_max for c in compensations],
+                   [c.aggressiveness for c in compensations], exact)
+
+    def compensate(self, x):
+        """
+        Parameters:
+            x (array): Input values
+
+        Returns:
+            ndarray: Mapped output values
+        """
+        x_clamped = np.maximum(np.minimum(np.asarray(x, dtype=float), self.in_max), self.in_min)
+        t = (x_clamped - self.in_min) / (self.in_max - self.in_min)
+        if self.exact:
+            curved = np.frompyfunc(math.pow, 2, 1)(t, self.exponent).astype(float)
+        else:
+            curved = np.power(t, self.exponent)
+        return self.out_min + (self.out_max - self.out_min) * curved
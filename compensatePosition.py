@@ -1,12 +1,22 @@
 import math
+from array import array
+from bisect import bisect_right
+from functools import lru_cache
 
 class CompensatePosition:
-    def __init__(self, in_min=30, in_max=70, out_min=1.0, out_max=1.5, aggressiveness=3):
+    def __init__(self, in_min=30, in_max=70, out_min=1.0, out_max=1.5, aggressiveness=3, resolution=None):
         self.in_min = float(in_min)
         self.in_max = float(in_max)
         self.out_min = float(out_min)
         self.out_max = float(out_max)
         self.aggressiveness = float(aggressiveness)
+        self.exponent = self.aggressiveness ** 1.5
+
+        # Table mode, the table is shared by all instances with the same curve
+        self.table = None
+        if resolution is not None:
+            self.table = getCompensationTable(self.in_min, self.in_max, self.out_min, self.out_max,
+                                              self.aggressiveness, float(resolution))
 
     def compensate(self, x):
         """
@@ -23,6 +33,9 @@ class CompensatePosition:
         Returns:
             float: Mapped output value.
         """
+        if self.table is not None:
+            return self.table.lookup(x)
+
         # Clamp x to the input range
         x_clamped = max(min(float(x), self.in_max), self.in_min)
 
@@ -30,8 +43,83 @@ class CompensatePosition:
         t = (x_clamped - self.in_min) / (self.in_max - self.in_min)
 
         # Apply an aggressive curve (super-exponential-like)
-        curved = math.pow(t, self.aggressiveness ** 1.5)
+        curved = math.pow(t, self.exponent)
 
         # Map to output range
         y = self.out_min + (self.out_max - self.out_min) * curved
-        return y
\ No newline at end of file
+        return y
+
+    def invert(self, y):
+        """
+        Maps output y back to the input, the inverse of compensate().
+
+        Outputs below out_min map to in_min and above out_max to in_max.
+
+        Parameters:
+            y (float): Output value.
+
+        Returns:
+            float: Input value.
+        """
+        if self.table is not None:
+            return self.table.inverse(y)
+
+        curved = (float(y) - self.out_min) / (self.out_max - self.out_min)
+        t = math.pow(max(min(curved, 1.0), 0.0), 1.0 / self.exponent)
+        return self.in_min + (self.in_max - self.in_min) * t
+
+    def getMaxError(self):
+        """Returns the maximum absolute error of the table against the exact curve, 0 without table."""
+        return self.table.maxError if self.table is not None else 0.0
+
+@lru_cache(maxsize=32)
+def getCompensationTable(in_min, in_max, out_min, out_max, aggressiveness, resolution):
+    return CompensationTable(in_min, in_max, out_min, out_max, aggressiveness, resolution)
+
+class CompensationTable:
+    """
+    Compensation curve precomputed every resolution degrees of the input range.
+
+    Values in between are linearly interpolated. The maximum interpolation
+    error is measured against the exact curve when the table is built.
+    """
+    ERROR_SAMPLES_PER_STEP = 16
+
+    def __init__(self, in_min, in_max, out_min, out_max, aggressiveness, resolution):
+        exact = CompensatePosition(in_min, in_max, out_min, out_max, aggressiveness)
+        self.in_min = exact.in_min
+        self.in_max = exact.in_max
+        self.count = max(1, math.ceil((self.in_max - self.in_min) / resolution))
+        self.step = (self.in_max - self.in_min) / self.count
+        self.inverseStep = 1.0 / self.step
+        self.values = array('d', (exact.compensate(self.in_min + i * self.step) for i in range(self.count + 1)))
+
+        self.maxError = 0.0
+        for i in range(self.count):
+            for sample in range(1, self.ERROR_SAMPLES_PER_STEP):
+                x = self.in_min + (i + sample / self.ERROR_SAMPLES_PER_STEP) * self.step
+                self.maxError = max(self.maxError, abs(self.lookup(x) - exact.compensate(x)))
+
+    def lookup(self, x):
+        position = (x - self.in_min) * self.inverseStep
+        if position <= 0:
+            return self.values[0]
+        if position >= self.count:
+            return self.values[-1]
+        index = int(position)
+        low = self.values[index]
+        return low + (self.values[index + 1] - low) * (position - index)
+
+    def inverse(self, y):
+        values = self.values
+        y = float(y)
+        if y <= values[0]:
+            return self.in_min
+        if y >= values[-1]:
+            return self.in_max
+        index = bisect_right(values, y) - 1
+        # Near in_min the curve is so flat that neighbouring values can be equal
+        if values[index + 1] == values[index]:
+            return self.in_min + index * self.step
+        fraction = (y - values[index]) / (values[index + 1] - values[index])
+        return self.in_min + (index + fraction) * self.step
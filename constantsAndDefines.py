@@ -33,8 +33,46 @@ class Constants():
         DIFFERENCE_MAX_WITHIN_THRESHOLD = MAX_WITHIN_THRESHOLD - MIN
 
     class PIDController():
+        KP = 1.0
+        KI = 0.0
+        KD = 0.0
         THRESHOLD = 15
         UPDATE_PERIOD = 1 # s
+        SAMPLE_TIMEOUT = 3 # s, event driven ticks without a new sample
+
+    class MotionVerification():
+        GRACE_TICKS = 1 # Ticks after switching the motor on before the rate is checked
+        WINDOW_TICKS = 8
+        MINIMUM_WINDOW_TICKS = 3 # Samples before the rate is judged, noisy fits need more
+        CONFIRM_TICKS = 2
+        EXPECTED_FRACTION = 0.3 # Stalled below this fraction of the MotorModel rate, reversed above it away from the target
+        STALL_RATE = 0.025 # degrees/s
+        REVERSE_RATE = 0.02 # degrees/s away from the target
+        CONFIDENCE = 2 # Standard errors of the fitted rate
+        UNRESPONSIVE_TICKS = 3
+
+    class Motor():
+        RATE_PER_PERCENT = 0.03 # degrees/s per % of speed above the breakaway speed
+        BREAKAWAY_SPEED = 40 # %, below the motor doesn't turn
+
+    class Approach():
+        CLOSED_LOOP_DISTANCE = 3 # degrees before the target the open loop approach hands over to the PID
+        MINIMUM_DURATION = 3 # s, shorter approaches run closed loop
+
+    class Tracking():
+        KP = 0.05 # degrees/s per degree of difference
+        KI = 0.0
+        KD = 0.0
+        BAND = 0.3 # degrees, the difference is kept within ± BAND when the axis moves in pulses
+        RATE_WINDOW = 300 # s, the sun rate is fitted over this window
+
+    class Fleet():
+        MAX_CONCURRENT_MOTORS = 4
+
+    class Stow():
+        MAX_CONCURRENT_MOTORS = 4 # Motor current budget of the emergency stow, all other moves are preempted
+        POLL_PERIOD = 0.05 # s, check interval while preempted moves stop their motors
+        PREEMPT_TIMEOUT = 5 # s, an axis is stowed anyway if its preempted move hasn't stopped by then
 
 class ControllerID():
     ONE_AXIS_ID = "1_axis"
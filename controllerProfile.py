@@ -0,0 +1,177 @@
+from dataclasses import dataclass
+
+from constantsAndDefines import Constants, ControllerID
+from compensatePosition import CompensatePosition
+from motorModel import MotorModel
+
+class AxisLimits():
+    def __init__(self, maximum, minimum):
+        self.MAX = maximum
+        self.MIN = minimum
+        self.DIFFERENCE_MAX = self.MAX - self.MIN
+
+class SpeedCurve():
+    def __init__(self, maximum, minimum, maximumWithinThreshold, threshold):
+        self.MAX = maximum
+        self.MIN = minimum
+        self.DIFFERENCE_MAX = self.MAX - self.MIN
+        self.MAX_WITHIN_THRESHOLD = maximumWithinThreshold
+        self.DIFFERENCE_MAX_WITHIN_THRESHOLD = self.MAX_WITHIN_THRESHOLD - self.MIN
+        self.THRESHOLD = threshold
+
+    def getSpeed(self, control, compensation=1.0):
+        """Maps the PID output to a motor speed in %, full speed outside of the threshold."""
+        if abs(control) < self.THRESHOLD:
+            return abs(control / self.THRESHOLD) * self.DIFFERENCE_MAX_WITHIN_THRESHOLD * compensation + self.MIN
+        return self.MAX
+
+@dataclass(frozen=True)
+class ControllerProfile:
+    """Everything a SolarController needs to know about one solar controller."""
+    controllerName: str
+    isOneAxis: bool
+    controllerEntityIdBase: str
+    mqttTopicPrefix: str # Topic prefix of the ESPHome device, its node name unless configured otherwise
+    statusEntityId: str
+    pitchEntityId: str
+    rollEntityId: str
+    switchUpEntityId: str
+    switchDownEntityId: str
+    switchEastEntityId: str
+    switchWestEntityId: str
+    lightSpeedUpDownEntityId: str
+    lightSpeedEastWestEntityId: str
+    actionStateId: str
+    pitchMaximas: AxisLimits
+    rollMaximas: AxisLimits
+    compensateUpDownPosition: CompensatePosition
+    pidGains: tuple
+    speedCurve: SpeedCurve
+    motorModel: MotorModel
+
+class ControllerRegistry:
+    """
+    Resolves controller profiles once per controller name and hands out the
+    cached profile afterwards.
+
+    A profile is rebuilt when its controller is configured again or when one
+    of the Constants defaults it was built from (device name prefix, roll
+    limits, PID gains, speed curve) has been changed.
+
+    Settings accepted by configure():
+        oneAxis (bool): Controller only moves up/down, defaults to False for unknown names
+        pitchMax, pitchMin (float): Pitch limits, default to Constants.Pitch
+        rollMax, rollMin (float): Roll limits, default to Constants.Roll
+        kp, ki, kd (float): PID gains, default to Constants.PIDController
+        aggressiveness (float): Curve of the up/down speed compensation
+        compensationResolution (float): Step in degrees of the speed compensation table, exact curve if None
+        speedMax, speedMin, speedMaxWithinThreshold (float): Speed curve in %, default to Constants.Speed
+        threshold (float): PID output below which the speed is reduced, defaults to Constants.PIDController
+        motorRates (dict): Calibrated direction -> (ratePerPercent, breakawaySpeed), see MotorCalibration
+        mqttTopicPrefix (str): MQTT topic prefix of the ESPHome device, defaults to the device name
+    """
+    def __init__(self):
+        self.settings = {
+            ControllerID.ONE_AXIS_ID: {"oneAxis": True},
+            ControllerID.TWO_AXIS_ID: {"oneAxis": False},
+        }
+        self.profiles = {}
+
+    def configure(self, controllerName, **settings):
+        """Adds a controller or changes its settings."""
+        self.settings[controllerName] = dict(self.settings.get(controllerName, {}), **settings)
+        self.invalidate(controllerName)
+
+    def invalidate(self, controllerName=None):
+        if controllerName is None:
+            self.profiles.clear()
+        else:
+            self.profiles.pop(controllerName, None)
+
+    def isValid(self, controllerName):
+        return controllerName in self.settings
+
+    def isOneAxis(self, controllerName):
+        return self.settings.get(controllerName, {}).get("oneAxis", False)
+
+    def getControllerNames(self):
+        return list(self.settings)
+
+    def get(self, controllerName):
+        """
+        Returns the profile of a controller, building it when needed.
+
+        Returns:
+            tuple: (ControllerProfile or None if the controller is unknown, True if the profile was just built)
+        """
+        if not self.isValid(controllerName):
+            return None, False
+
+        key = self.getConfigurationKey(controllerName)
+        cached = self.profiles.get(controllerName)
+        if cached is not None and cached[0] == key:
+            return cached[1], False
+
+        profile = self.build(controllerName, self.settings[controllerName])
+        self.profiles[controllerName] = (key, profile)
+        return profile, True
+
+    def getConfigurationKey(self, controllerName):
+        return (
+            Constants.DEVICE_NAME_PREFIX,
+            Constants.Roll.MAX,
+            Constants.Roll.MIN,
+            Constants.PIDController.KP,
+            Constants.PIDController.KI,
+            Constants.PIDController.KD,
+            Constants.PIDController.THRESHOLD,
+            Constants.Speed.MAX,
+            Constants.Speed.MIN,
+            Constants.Speed.MAX_WITHIN_THRESHOLD,
+            Constants.Motor.RATE_PER_PERCENT,
+            Constants.Motor.BREAKAWAY_SPEED,
+        )
+
+    def build(self, controllerName, settings):
+        isOneAxis = settings.get("oneAxis", False)
+        defaultPitch = Constants.Pitch(ControllerID.ONE_AXIS_ID if isOneAxis else ControllerID.TWO_AXIS_ID)
+        pitchMaximas = AxisLimits(settings.get("pitchMax", defaultPitch.MAX), settings.get("pitchMin", defaultPitch.MIN))
+        rollMaximas = AxisLimits(settings.get("rollMax", Constants.Roll.MAX), settings.get("rollMin", Constants.Roll.MIN))
+
+        base = Constants.DEVICE_NAME_PREFIX + controllerName
+        return ControllerProfile(
+            controllerName = controllerName,
+            isOneAxis = isOneAxis,
+            controllerEntityIdBase = base,
+            mqttTopicPrefix = settings.get("mqttTopicPrefix", base),
+            statusEntityId = "binary_sensor." + base + "_status",
+            pitchEntityId = "sensor." + base + "_mpu6050_pitch",
+            rollEntityId = "sensor." + base + "_mpu6050_roll",
+            switchUpEntityId = "switch." + base + "_up",
+            switchDownEntityId = "switch." + base + "_down",
+            switchEastEntityId = "switch." + base + "_east",
+            switchWestEntityId = "switch." + base + "_west",
+            lightSpeedUpDownEntityId = "light." + base + "_speed_up_down",
+            lightSpeedEastWestEntityId = "light." + base + "_speed_east_west",
+            actionStateId = "input_text." + base + "_action_state",
+            pitchMaximas = pitchMaximas,
+            rollMaximas = rollMaximas,
+            compensateUpDownPosition = CompensatePosition(pitchMaximas.MIN, pitchMaximas.MAX,
+                                                          aggressiveness=settings.get("aggressiveness", 3),
+                                                          resolution=settings.get("compensationResolution")),
+            pidGains = (
+                settings.get("kp", Constants.PIDController.KP),
+                settings.get("ki", Constants.PIDController.KI),
+                settings.get("kd", Constants.PIDController.KD),
+            ),
+            speedCurve = SpeedCurve(
+                settings.get("speedMax", Constants.Speed.MAX),
+                settings.get("speedMin", Constants.Speed.MIN),
+                settings.get("speedMaxWithinThreshold", Constants.Speed.MAX_WITHIN_THRESHOLD),
+                settings.get("threshold", Constants.PIDController.THRESHOLD),
+            ),
+            motorModel = MotorModel(settings.get("motorRates")),
+        )
+
+# Shared by all SolarController instances of the process
+controllerRegistry = ControllerRegistry()
@@ -0,0 +1,181 @@
+import asyncio
+import threading
+
+from asyncUtils import getHassLoop
+from constantsAndDefines import (
+    UpDownPosition,
+    EastWestPosition,
+    Constants
+)
+from controllerProfile import controllerRegistry
+from solarController import SolarController
+
+class FleetManager:
+    """
+    Drives many solar controllers (trackers) from one process.
+
+    Every axis of every tracker gets its own SolarController which is kept
+    between moves, so PID, steady state and compensation state are never
+    shared between axes or trackers. All moves run concurrently on one event
+    loop, but at most maxConcurrentMotors motors run at the same time. The
+    synchronous entry points, e.g. the run_at callbacks of planned moves,
+    hand their moves to the long-lived loop of the fleet, so the limit holds
+    across them and no AppDaemon worker thread waits for a move. On
+    AppDaemon this is AppDaemon's own loop, which the hass calls of the moves
+    have to run on, otherwise a loop in a thread of the fleet. Call close()
+    on shutdown.
+
+    preempt() ends all moves of the fleet and refuses new ones until
+    release(), e.g. while the StowCoordinator keeps the trackers stowed.
+    """
+    def __init__(self, hass, maxConcurrentMotors=Constants.Fleet.MAX_CONCURRENT_MOTORS, registry=None, **controllerOptions):
+        self.hass = hass
+        self.maxConcurrentMotors = maxConcurrentMotors
+        self.registry = registry if registry is not None else controllerRegistry
+        self.controllerOptions = controllerOptions
+        self.controllers = {}
+        self.motorSemaphore = None
+        self.motorSemaphoreLoop = None
+        self.preempted = False
+        self.loop = None
+        self.loopThread = None
+        self.loopLock = threading.Lock()
+        self.tasks = set() # Moves submitted to the loop, close() cancels them
+
+    def getController(self, controllerName, axis):
+        """
+        Parameters:
+            controllerName (str): Name of the controller
+            axis (str): Either 'pitch' or 'roll'
+        """
+        key = (controllerName, axis)
+        if key not in self.controllers:
+            self.controllers[key] = SolarController(self.hass, registry=self.registry, **self.controllerOptions)
+            if self.preempted:
+                self.controllers[key].preempt()
+        return self.controllers[key]
+
+    def getMotorSemaphore(self):
+        # asyncio primitives are bound to the loop they are used on
+        loop = asyncio.get_running_loop()
+        if self.motorSemaphoreLoop is not loop:
+            self.motorSemaphore = asyncio.Semaphore(self.maxConcurrentMotors)
+            self.motorSemaphoreLoop = loop
+        return self.motorSemaphore
+
+    def preempt(self):
+        """Ends all moves of the fleet at once and refuses new ones until release(), can be called from any thread."""
+        self.preempted = True
+        for controller in list(self.controllers.values()):
+            controller.preempt()
+
+    def release(self):
+        self.preempted = False
+        for controller in list(self.controllers.values()):
+            controller.clearPreemption()
+
+    async def moveUpDownAsync(self, controllerName, upDownPosition):
+        async with self.getMotorSemaphore():
+            if self.preempted:
+                return None
+            return await self.getController(controllerName, "pitch").moveUpDownAsync(controllerName, upDownPosition)
+
+    async def moveEastWestAsync(self, controllerName, eastWestPosition):
+        async with self.getMotorSemaphore():
+            if self.preempted:
+                return None
+            return await self.getController(controllerName, "roll").moveEastWestAsync(controllerName, eastWestPosition)
+
+    def getLoop(self):
+        """Returns the event loop of the fleet, without AppDaemon it is started in its own thread on first use."""
+        with self.loopLock:
+            if self.loop is None:
+                self.loop = getHassLoop(self.hass)
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                self.loopThread = threading.Thread(target=self.loop.run_forever, name="FleetManager", daemon=True)
+                self.loopThread.start()
+            return self.loop
+
+    def submit(self, coroutine):
+        """
+        Runs a coroutine on the loop of the fleet, can be called from any thread.
+
+        Returns:
+            concurrent.futures.Future: Result of the coroutine
+        """
+        future = asyncio.run_coroutine_threadsafe(self.runTaskAsync(coroutine), self.getLoop())
+        future.add_done_callback(self.logFailure)
+        return future
+
+    async def runTaskAsync(self, coroutine):
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        try:
+            return await coroutine
+        finally:
+            self.tasks.discard(task)
+
+    def logFailure(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            self.hass.log(f"Fleet move failed: {future.exception()!r}")
+
+    def close(self):
+        """Cancels the moves still running on the loop of the fleet and stops the loop if it is the fleet's own."""
+        with self.loopLock:
+            loop, thread = self.loop, self.loopThread
+            self.loop = self.loopThread = None
+        if loop is None:
+            return
+        async def cancelMovesAsync():
+            tasks = list(self.tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        asyncio.run_coroutine_threadsafe(cancelMovesAsync(), loop).result()
+        if thread is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+    def runPlannedMove(self, kwargs):
+        """
+        AppDaemon run_at callback for the moves scheduled by MovePlanner.scheduleDay.
+
+        The move runs on the loop of the fleet, the callback returns at once.
+        """
+        if kwargs["axis"] == "pitch":
+            self.submit(self.moveUpDownAsync(kwargs["controllerName"], UpDownPosition.MinimizeDifference))
+        else:
+            self.submit(self.moveEastWestAsync(kwargs["controllerName"], EastWestPosition.MinimizeDifference))
+
+    async def moveTrackersAsync(self, controllerNames=None,
+                                upDownPosition=UpDownPosition.MinimizeDifference,
+                                eastWestPosition=EastWestPosition.MinimizeDifference):
+        """
+        Moves pitch and roll of all given trackers in parallel.
+
+        Parameters:
+            controllerNames (list): Trackers to move, all known controllers if None
+            upDownPosition (UpDownPosition): Target of the pitch moves, None to keep pitch
+            eastWestPosition (EastWestPosition): Target of the roll moves, None to keep roll
+
+        Returns:
+            list: AxisMoveResult of every axis move, None for moves that didn't run
+        """
+        if controllerNames is None:
+            controllerNames = self.registry.getControllerNames()
+
+        moves = []
+        for controllerName in controllerNames:
+            if upDownPosition is not None:
+                moves.append(self.moveUpDownAsync(controllerName, upDownPosition))
+            if eastWestPosition is not None and not self.registry.isOneAxis(controllerName):
+                moves.append(self.moveEastWestAsync(controllerName, eastWestPosition))
+        return await asyncio.gather(*moves)
+
+    def moveTrackers(self, controllerNames=None,
+                     upDownPosition=UpDownPosition.MinimizeDifference,
+                     eastWestPosition=EastWestPosition.MinimizeDifference):
+        return self.submit(self.moveTrackersAsync(controllerNames, upDownPosition, eastWestPosition)).result()
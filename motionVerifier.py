@@ -0,0 +1,141 @@
+import math
+from collections import deque
+from enum import IntEnum
+
+from constantsAndDefines import Constants
+
+class MotionStatus(IntEnum):
+    Ok           = 0
+    Stalled      = 1 # The motor is on but the axis doesn't move, e.g. jammed or at an end stop
+    Reversed     = 2 # The axis moves away from the target, e.g. swapped motor wires
+    Unresponsive = 3 # The device doesn't take the commanded switch state
+
+class MotionVerifier:
+    """
+    Compares the commanded motion of one axis with the observed one.
+
+    Every tick gets the difference to the target, the direction the motor
+    was commanded in during the last interval and the rate the MotorModel
+    expects at the commanded speed. While the motor runs in one direction,
+    the rate at which the difference shrinks is fitted over the last
+    windowTicks samples, the first graceTicks ticks of a run are skipped for
+    the motor to get up to speed. Faults are judged from minimumWindowTicks
+    samples on, with a margin of confidence standard errors, so sensor noise
+    doesn't raise faults but delays them: the axis stalls if its rate is
+    surely below expectedFraction of the expected rate, the motor is
+    reversed if the axis surely moves away from the target faster than that.
+    The rates never go below stallRate and reverseRate, but an axis the
+    MotorModel expects to crawl slower than stallRate, close to the breakaway
+    speed, isn't stalled as long as it surely moves towards the target.
+    Either fault has to hold for confirmTicks ticks in a row. A direction
+    switch read back as not 'on' for unresponsiveTicks ticks means the
+    device doesn't execute the commands.
+    """
+    def __init__(self, graceTicks=Constants.MotionVerification.GRACE_TICKS,
+                 windowTicks=Constants.MotionVerification.WINDOW_TICKS,
+                 minimumWindowTicks=Constants.MotionVerification.MINIMUM_WINDOW_TICKS,
+                 confirmTicks=Constants.MotionVerification.CONFIRM_TICKS,
+                 expectedFraction=Constants.MotionVerification.EXPECTED_FRACTION,
+                 stallRate=Constants.MotionVerification.STALL_RATE,
+                 reverseRate=Constants.MotionVerification.REVERSE_RATE,
+                 confidence=Constants.MotionVerification.CONFIDENCE,
+                 unresponsiveTicks=Constants.MotionVerification.UNRESPONSIVE_TICKS):
+        self.graceTicks = graceTicks
+        self.windowTicks = windowTicks
+        self.minimumWindowTicks = minimumWindowTicks
+        self.confirmTicks = confirmTicks
+        self.expectedFraction = expectedFraction
+        self.stallRate = stallRate
+        self.reverseRate = reverseRate
+        self.confidence = confidence
+        self.unresponsiveTicks = unresponsiveTicks
+        self.samples = deque(maxlen=windowTicks)
+        self.expectedRates = deque(maxlen=windowTicks)
+        self.reset()
+
+    def reset(self):
+        self.direction = None
+        self.sign = 0.0
+        self.ticks = 0
+        self.offTicks = 0
+        self.candidate = MotionStatus.Ok
+        self.confirmations = 0
+        self.rate = None
+        self.rateError = None
+        self.samples.clear()
+        self.expectedRates.clear()
+
+    def update(self, time, difference, direction, switchState=None, expectedRate=None):
+        """
+        Parameters:
+            time (float): Time of the reading in seconds
+            difference (float): Difference to the target, the motor is expected to shrink its magnitude
+            direction (str): Direction the motor was switched on in during the last interval, None if off
+            switchState (str): Read back state of the switch of that direction, None if unknown
+            expectedRate (float): Rate in degrees/s the commanded speed moves the axis at, see MotorModel, None if unknown
+
+        Returns:
+            MotionStatus: Ok until a fault is confirmed
+        """
+        if direction is None or direction != self.direction:
+            self.reset()
+            self.direction = direction
+            self.sign = math.copysign(1.0, difference)
+            self.samples.append((time, difference))
+            self.expectedRates.append(math.inf if expectedRate is None else expectedRate)
+            return MotionStatus.Ok
+
+        self.ticks += 1
+        self.offTicks = self.offTicks + 1 if switchState is not None and switchState != "on" else 0
+        if self.offTicks >= self.unresponsiveTicks:
+            return MotionStatus.Unresponsive
+
+        if self.ticks <= self.graceTicks:
+            # The run up isn't part of the fit
+            self.samples.clear()
+            self.expectedRates.clear()
+        self.samples.append((time, difference))
+        self.expectedRates.append(math.inf if expectedRate is None else expectedRate)
+        if len(self.samples) < self.minimumWindowTicks:
+            return MotionStatus.Ok
+
+        slope, self.rateError = getSlope(self.samples)
+        self.rate = -self.sign * slope
+        margin = self.confidence * self.rateError
+        # The lowest speed of the window bounds the rate the axis has to reach
+        lowestRate = min(self.expectedRates)
+        expected = self.expectedFraction * lowestRate if lowestRate < math.inf else 0.0
+        if self.rate + margin < -max(self.reverseRate, expected):
+            candidate = MotionStatus.Reversed
+        elif math.fabs(self.rate) + margin < max(self.stallRate, expected) and not (lowestRate < self.stallRate and self.rate - margin > 0):
+            candidate = MotionStatus.Stalled
+        else:
+            candidate = MotionStatus.Ok
+        if candidate == self.candidate:
+            self.confirmations += 1
+        else:
+            self.candidate = candidate
+            self.confirmations = 1
+        if candidate != MotionStatus.Ok and self.confirmations >= self.confirmTicks:
+            return candidate
+        return MotionStatus.Ok
+
+def getSlope(samples):
+    """
+    Least squares fit of a line through (time, value) samples.
+
+    Returns:
+        tuple: (slope, standard error of the slope), the error is 0 for less than 3 samples
+    """
+    count = len(samples)
+    meanTime = sum(time for time, value in samples) / count
+    meanValue = sum(value for time, value in samples) / count
+    covariance = sum((time - meanTime) * (value - meanValue) for time, value in samples)
+    variance = sum((time - meanTime) ** 2 for time, value in samples)
+    if variance <= 0:
+        return 0.0, 0.0
+    slope = covariance / variance
+    if count < 3:
+        return slope, 0.0
+    residuals = sum((value - meanValue - slope * (time - meanTime)) ** 2 for time, value in samples)
+    return slope, math.sqrt(residuals / (count - 2) / variance)
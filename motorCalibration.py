@@ -0,0 +1,152 @@
+import asyncio
+import json
+
+from asyncUtils import runSync
+from constantsAndDefines import Constants
+from controllerProfile import controllerRegistry
+from motionVerifier import getSlope
+
+AXIS_DIRECTIONS = {"pitch": ("up", "down"), "roll": ("east", "west")}
+
+class MotorCalibration:
+    """
+    Measures the rate of the axes of a controller against the speed.
+
+    Every direction of an axis runs at each of the speeds for runTime
+    seconds, the directions alternate so the axis ends up about where it
+    started. The rate of a run is the slope of the readings after
+    settleTime seconds of run up, a run stops early at the limits of the
+    axis. The MotorModel line (ratePerPercent, breakawaySpeed) is fitted
+    through the rates of all speeds the axis moved at.
+    """
+    def __init__(self, controller, speeds=None, runTime=6.0, settleTime=1.5, minimumRate=0.01):
+        """
+        Parameters:
+            controller (SolarController): Controller sending the commands and reading the sensors
+            speeds (tuple): Speeds in %, 4 speeds from the lowest to the highest one of the speed curve if None
+            minimumRate (float): Rates in degrees/s below count as not moving
+        """
+        self.controller = controller
+        self.speeds = speeds
+        self.runTime = runTime
+        self.settleTime = settleTime
+        self.minimumRate = minimumRate
+
+    def getSpeeds(self):
+        if self.speeds is not None:
+            return self.speeds
+        curve = self.controller.speedCurve
+        return tuple(curve.MIN + (curve.MAX - curve.MIN) * i / 3 for i in range(4))
+
+    def getPosition(self, axis):
+        return self.controller.getPitch() if axis == "pitch" else self.controller.getRoll()
+
+    def getSpeedEntityId(self, axis):
+        controller = self.controller
+        return controller.lightSpeedUpDownEntityId if axis == "pitch" else controller.lightSpeedEastWestEntityId
+
+    async def measureRateAsync(self, axis, direction, speed):
+        """
+        Runs the axis in direction at speed.
+
+        Returns:
+            float: Rate in degrees/s, None if the run was too short to measure it
+        """
+        controller = self.controller
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        samples = []
+        await controller.readSnapshotAsync(axis)
+        if not controller.isPositionMax(direction):
+            controller.queueSwitchOn(controller.getDirectionSwitchEntityId(direction))
+            controller.queueSpeed(self.getSpeedEntityId(axis), speed, force=True)
+            await controller.actuator.flushAsync()
+            while loop.time() - start < self.runTime:
+                await asyncio.sleep(Constants.PIDController.UPDATE_PERIOD)
+                await controller.readSnapshotAsync(axis)
+                if controller.isPositionMax(direction):
+                    break
+                if loop.time() - start >= self.settleTime:
+                    samples.append((loop.time(), self.getPosition(axis)))
+
+        controller.queueSpeed(self.getSpeedEntityId(axis), 0, force=True)
+        await controller.actuator.flushAsync()
+        controller.snapshot = None
+        # Let the axis coast to rest before the next run
+        await asyncio.sleep(self.settleTime)
+        if len(samples) < 3:
+            return None
+        slope, error = getSlope(samples)
+        return abs(slope)
+
+    async def calibrateAxisAsync(self, axis):
+        """
+        Returns:
+            dict: direction -> (ratePerPercent, breakawaySpeed) of the directions with at least two moving speeds
+        """
+        measured = {direction: [] for direction in AXIS_DIRECTIONS[axis]}
+        for speed in self.getSpeeds():
+            for direction in AXIS_DIRECTIONS[axis]:
+                rate = await self.measureRateAsync(axis, direction, speed)
+                if rate is not None and rate >= self.minimumRate:
+                    measured[direction].append((speed, rate))
+                self.controller.hass.log(f"Calibration {axis} {direction} at {speed:.0f}%: {rate} degrees/s")
+
+        rates = {}
+        for direction, points in measured.items():
+            if len(points) < 2:
+                continue
+            ratePerPercent, error = getSlope(points)
+            if ratePerPercent <= 0:
+                continue
+            meanSpeed = sum(speed for speed, rate in points) / len(points)
+            meanRate = sum(rate for speed, rate in points) / len(points)
+            rates[direction] = (ratePerPercent, meanSpeed - meanRate / ratePerPercent)
+        return rates
+
+    async def calibrateAsync(self, controllerName):
+        """
+        Calibrates all axes of a controller and stores the result in its
+        profile, in the registry of the SolarController.
+
+        Returns:
+            dict: direction -> (ratePerPercent, breakawaySpeed), empty if the controller isn't connected
+        """
+        controller = self.controller
+        if not controller.setSolarControllerEntityID(controllerName):
+            return {}
+        controller.actuator.reset()
+        await controller.readSnapshotAsync()
+        connected = controller.isSolarControllerConnected()
+        controller.snapshot = None
+        if not connected:
+            controller.hass.log(f"Solar controller {controllerName} is not connected, calibration skipped")
+            return {}
+
+        rates = {}
+        for axis in ("pitch",) if controller.is1AxisSolarControl() else ("pitch", "roll"):
+            rates.update(await self.calibrateAxisAsync(axis))
+        controller.registry.configure(controllerName, motorRates=rates)
+        return rates
+
+    def calibrate(self, controllerName):
+        return runSync(self.calibrateAsync(controllerName), self.controller.hass)
+
+def saveMotorRates(path, registry=None):
+    """Writes the calibrated motor rates of all controllers as JSON."""
+    registry = registry if registry is not None else controllerRegistry
+    motorRates = {}
+    for controllerName in registry.getControllerNames():
+        rates = registry.settings[controllerName].get("motorRates")
+        if rates:
+            motorRates[controllerName] = rates
+    with open(path, "w") as file:
+        json.dump(motorRates, file, indent=1, sort_keys=True)
+
+def loadMotorRates(path, registry=None):
+    """Configures the motor rates saved by saveMotorRates."""
+    registry = registry if registry is not None else controllerRegistry
+    with open(path) as file:
+        motorRates = json.load(file)
+    for controllerName, rates in motorRates.items():
+        registry.configure(controllerName, motorRates={direction: tuple(rate) for direction, rate in rates.items()})
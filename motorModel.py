@@ -0,0 +1,47 @@
+from constantsAndDefines import Constants
+
+class MotorModel:
+    """
+    Rate of an axis as function of the commanded speed, per direction.
+
+    Above the breakaway speed the axis moves at ratePerPercent degrees/s for
+    every percent of speed, below it doesn't move. Directions whose rates
+    were given, e.g. measured by MotorCalibration, are calibrated, the
+    others use the defaults.
+    """
+    def __init__(self, rates=None):
+        """
+        Parameters:
+            rates (dict): direction -> (ratePerPercent, breakawaySpeed), directions
+                          not given use the defaults of Constants.Motor scaled
+                          like the speed factors of the move loops
+        """
+        self.rates = getDefaultRates()
+        self.calibrated = set()
+        if rates is not None:
+            self.rates.update({direction: tuple(rate) for direction, rate in rates.items()})
+            self.calibrated.update(rates)
+
+    def isCalibrated(self, direction):
+        return direction in self.calibrated
+
+    def getRate(self, direction, speed):
+        """Returns the rate in degrees/s at speed in %."""
+        ratePerPercent, breakawaySpeed = self.rates[direction]
+        return ratePerPercent * max(0.0, speed - breakawaySpeed)
+
+    def getSpeed(self, direction, rate):
+        """Returns the speed in % moving the axis at rate degrees/s."""
+        ratePerPercent, breakawaySpeed = self.rates[direction]
+        return breakawaySpeed + rate / ratePerPercent
+
+def getDefaultRates():
+    # The move loops slow down by DOWN_FACTOR and speed up by WEST_FACTOR, the motors are faster down and slower west
+    rate = Constants.Motor.RATE_PER_PERCENT
+    breakaway = Constants.Motor.BREAKAWAY_SPEED
+    return {
+        "up": (rate, breakaway),
+        "down": (rate / Constants.Speed.DOWN_FACTOR, breakaway),
+        "east": (rate, breakaway),
+        "west": (rate / Constants.Speed.WEST_FACTOR, breakaway),
+    }
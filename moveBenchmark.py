@@ -0,0 +1,352 @@
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass
+
+from constantsAndDefines import (
+    ControllerID,
+    UpDownPosition,
+    EastWestPosition,
+    Constants
+)
+from controllerProfile import controllerRegistry
+from motorCalibration import MotorCalibration
+from moveMetrics import MoveMetrics
+from mqttTransport import MqttTransport, LocalBroker
+from sensorFilter import AlphaBetaFilter, KalmanFilter
+from solarController import SolarController, clamp
+from trackerSimulation import SimulatedHass, SimulatedTracker, SimulatedEspHomeDevice
+from transport import HassTransport
+
+BASELINE_VERSION = 1
+
+SENSOR_FILTERS = {"alpha-beta": AlphaBetaFilter, "kalman": KalmanFilter}
+
+CONTROLLER_NAMES = (ControllerID.ONE_AXIS_ID, ControllerID.TWO_AXIS_ID)
+POSITIONS = ("MinimizeDifference", "Protect")
+START_OFFSETS = (-30.0, -15.0, -8.0, -3.0, 3.0, 8.0, 15.0, 30.0) # degrees from the target
+SUN_POSITIONS = ((15.0, 100.0), (35.0, 140.0), (60.0, 180.0), (35.0, 220.0), (15.0, 260.0)) # (elevation, azimuth)
+
+@dataclass(frozen=True)
+class BenchmarkScenario:
+    controllerName: str
+    axis: str # 'pitch' or 'roll'
+    position: str # Name of the UpDownPosition or EastWestPosition
+    startOffset: float
+    sunElevation: float
+    sunAzimuth: float
+
+    @property
+    def name(self):
+        return (f"{self.controllerName}/{self.axis}/{self.position}/offset={self.startOffset:+g}"
+                f"/sun={self.sunElevation:g},{self.sunAzimuth:g}")
+
+class BenchmarkController(SolarController):
+    """SolarController counting the control ticks of a move."""
+    def __init__(self, hass, **kwargs):
+        super().__init__(hass, **kwargs)
+        self.ticks = 0
+
+    async def waitForNextTickAsync(self, listener):
+        self.ticks += 1
+        return await super().waitForNextTickAsync(listener)
+
+class MoveBenchmark:
+    """
+    Runs moveUpDown and moveEastWest over a matrix of scenarios against
+    simulated trackers on virtual time.
+
+    Every scenario starts the moved axis startOffset degrees away from the
+    target the controller computes for the sun position. The plant is
+    deterministic, so apart from the wall time all metrics are reproducible
+    and can be compared exactly against a saved baseline.
+
+    With mqtt the controllers talk to the simulated ESPHome devices over a
+    LocalBroker, getState and callService then only count the Home
+    Assistant calls left, mqttMessages counts the MQTT messages.
+    """
+    def __init__(self, registry=None, eventDriven=False, controllerNames=CONTROLLER_NAMES,
+                 positions=POSITIONS, startOffsets=START_OFFSETS, sunPositions=SUN_POSITIONS,
+                 controllerOptions=None, mqtt=False, **axisOptions):
+        self.registry = registry if registry is not None else controllerRegistry
+        self.eventDriven = eventDriven
+        self.mqtt = mqtt
+        self.controllerOptions = controllerOptions if controllerOptions is not None else {}
+        self.controllerNames = controllerNames
+        self.positions = positions
+        self.startOffsets = startOffsets
+        self.sunPositions = sunPositions
+        self.axisOptions = axisOptions
+        self.metrics = MoveMetrics()
+        self.calibrated = False
+
+    def calibrate(self):
+        """
+        Calibrates the motors of every controller against a simulated tracker
+        and stores the rates in the registry, the moves then approach open loop.
+
+        Returns:
+            dict: controllerName -> direction -> (ratePerPercent, breakawaySpeed)
+        """
+        calibrations = {}
+        for controllerName in self.controllerNames:
+            profile, created = self.registry.get(controllerName)
+            pitch = (profile.pitchMaximas.MIN + profile.pitchMaximas.MAX) / 2
+            roll = (profile.rollMaximas.MIN + profile.rollMaximas.MAX) / 2
+            tracker = SimulatedTracker(controllerName, pitch, roll, registry=self.registry, **self.axisOptions)
+            hass = SimulatedHass([tracker])
+            controller = SolarController(hass, registry=self.registry, metrics=MoveMetrics())
+            calibrations[controllerName] = hass.run(MotorCalibration(controller).calibrateAsync(controllerName))
+        self.calibrated = True
+        return calibrations
+
+    def getScenarios(self):
+        scenarios = []
+        for controllerName in self.controllerNames:
+            axes = ["pitch"] if self.registry.isOneAxis(controllerName) else ["pitch", "roll"]
+            for axis in axes:
+                for position in self.positions:
+                    for sunElevation, sunAzimuth in self.sunPositions:
+                        for startOffset in self.startOffsets:
+                            scenarios.append(BenchmarkScenario(controllerName, axis, position, startOffset, sunElevation, sunAzimuth))
+        return scenarios
+
+    def getTarget(self, scenario):
+        """
+        Returns:
+            float: Target of the moved axis in sensor units, as computed by SolarController.
+        """
+        hass = SimulatedHass([], sunElevation=scenario.sunElevation, sunAzimuth=scenario.sunAzimuth)
+        controller = SolarController(hass, registry=self.registry)
+        controller.setSolarControllerEntityID(scenario.controllerName)
+        if scenario.axis == "pitch":
+            controller.upDownPosition = UpDownPosition[scenario.position]
+            return 90 - controller.getWantedPitch()
+        return controller.getWantedRoll(EastWestPosition[scenario.position])
+
+    def runScenario(self, scenario):
+        """
+        Returns:
+            dict: Metrics of the scenario
+        """
+        profile, created = self.registry.get(scenario.controllerName)
+        target = self.getTarget(scenario)
+        maximas = profile.pitchMaximas if scenario.axis == "pitch" else profile.rollMaximas
+        start = clamp(target + scenario.startOffset, maximas.MIN, maximas.MAX)
+
+        if scenario.axis == "pitch":
+            tracker = SimulatedTracker(scenario.controllerName, start, registry=self.registry, **self.axisOptions)
+            axis = tracker.pitch
+        else:
+            pitch = (profile.pitchMaximas.MIN + profile.pitchMaximas.MAX) / 2
+            tracker = SimulatedTracker(scenario.controllerName, pitch, start, registry=self.registry, **self.axisOptions)
+            axis = tracker.roll
+        hass = SimulatedHass([tracker], sunElevation=scenario.sunElevation, sunAzimuth=scenario.sunAzimuth)
+        broker = device = transport = None
+        if self.mqtt:
+            broker = LocalBroker()
+            device = SimulatedEspHomeDevice(tracker, broker)
+            transport = MqttTransport(broker.connect, HassTransport(hass), registry=self.registry)
+        controller = BenchmarkController(hass, eventDriven=self.eventDriven, registry=self.registry,
+                                         metrics=self.metrics, transport=transport, **self.controllerOptions)
+
+        if scenario.axis == "pitch":
+            move = controller.moveUpDownAsync(scenario.controllerName, UpDownPosition[scenario.position])
+        else:
+            move = controller.moveEastWestAsync(scenario.controllerName, EastWestPosition[scenario.position])
+        wallTime = time.perf_counter()
+        hass.run(self.runMoveAsync(move, device))
+        wallTime = time.perf_counter() - wallTime
+        if transport is not None:
+            transport.close()
+
+        if start < target:
+            overshoot = max(0.0, axis.highest - target)
+        else:
+            overshoot = max(0.0, target - axis.lowest)
+
+        results = {
+            "start": round(start, 3),
+            "target": round(target, 3),
+            "ticks": controller.ticks,
+            "seconds": round(hass.lastTime, 3),
+            "wallTimePerTick": wallTime / max(1, controller.ticks),
+            "getState": hass.counts["get_state"],
+            "callService": hass.counts["call_service"],
+            "overshoot": round(overshoot, 3),
+            "finalError": round(abs(axis.position - target), 3),
+            "motorOnSeconds": round(axis.motorOnTime, 3),
+            "timedOut": any("timeout" in message for _, message in hass.logs),
+        }
+        if broker is not None:
+            results["mqttMessages"] = broker.published
+        return results
+
+    async def runMoveAsync(self, move, device=None):
+        if device is None:
+            return await move
+        device.start()
+        try:
+            return await move
+        finally:
+            device.stop()
+
+    def run(self):
+        """
+        Returns:
+            dict: Machine readable results, see save() and compare()
+        """
+        self.metrics.reset()
+        scenarios = {}
+        for scenario in self.getScenarios():
+            scenarios[scenario.name] = self.runScenario(scenario)
+        options = dict({name: getattr(value, "__name__", value) for name, value in self.controllerOptions.items()},
+                       eventDriven=self.eventDriven)
+        if self.calibrated:
+            options["calibrated"] = True
+        if self.mqtt:
+            options["mqtt"] = True
+        return {
+            "version": BASELINE_VERSION,
+            "options": options,
+            "constants": getTuningConstants(),
+            "summary": summarize(scenarios),
+            "scenarios": scenarios,
+            "metrics": self.metrics.getSummary(),
+        }
+
+def getTuningConstants():
+    return {
+        "Speed": {name: getattr(Constants.Speed, name) for name in ("DOWN_FACTOR", "WEST_FACTOR", "MAX", "MIN", "MAX_WITHIN_THRESHOLD")},
+        "PIDController": {name: getattr(Constants.PIDController, name) for name in ("KP", "KI", "KD", "THRESHOLD", "UPDATE_PERIOD")},
+    }
+
+def summarize(scenarios):
+    """Aggregates the scenarios per controller, axis and position."""
+    groups = {}
+    for name, metrics in scenarios.items():
+        group = "/".join(name.split("/")[:3])
+        groups.setdefault(group, []).append(metrics)
+
+    summary = {}
+    for group, results in sorted(groups.items()):
+        count = len(results)
+        summary[group] = {
+            "scenarios": count,
+            "meanTicks": sum(result["ticks"] for result in results) / count,
+            "maxTicks": max(result["ticks"] for result in results),
+            "meanWallTimePerTick": sum(result["wallTimePerTick"] for result in results) / count,
+            "meanGetState": sum(result["getState"] for result in results) / count,
+            "meanCallService": sum(result["callService"] for result in results) / count,
+            "maxOvershoot": max(result["overshoot"] for result in results),
+            "meanMotorOnSeconds": sum(result["motorOnSeconds"] for result in results) / count,
+            "timeouts": sum(1 for result in results if result["timedOut"]),
+        }
+    return summary
+
+def compare(baseline, results, tolerance=0.1, overshootTolerance=0.2, wallTimeTolerance=0.5):
+    """
+    Compares results against a baseline.
+
+    Ticks and service calls may grow by the relative tolerance plus one,
+    overshoot and final error by overshootTolerance degrees. Wall time is
+    noisy and machine dependent, so only the mean wall time per tick of all
+    scenarios is compared, with wallTimeTolerance. A wallTimeTolerance of
+    None skips the wall time check.
+
+    Returns:
+        list: Descriptions of all regressions, empty if there are none
+    """
+    regressions = []
+    if baseline.get("version") != BASELINE_VERSION:
+        return [f"Baseline version {baseline.get('version')} isn't supported"]
+    if baseline["options"] != results["options"]:
+        return [f"Baseline options {baseline['options']} differ from {results['options']}"]
+
+    def limit(value, relative):
+        return value * (1 + relative) + 1
+
+    for name, old in baseline["scenarios"].items():
+        new = results["scenarios"].get(name)
+        if new is None:
+            regressions.append(f"{name}: missing")
+            continue
+        for metric in ("ticks", "getState", "callService"):
+            if new[metric] > limit(old[metric], tolerance):
+                regressions.append(f"{name}: {metric} {old[metric]} -> {new[metric]}")
+        for metric in ("overshoot", "finalError"):
+            if new[metric] > old[metric] + overshootTolerance:
+                regressions.append(f"{name}: {metric} {old[metric]:.2f} -> {new[metric]:.2f}")
+        if new["timedOut"] and not old["timedOut"]:
+            regressions.append(f"{name}: timed out")
+
+    if wallTimeTolerance is not None:
+        oldWallTime = meanWallTimePerTick(baseline["scenarios"])
+        newWallTime = meanWallTimePerTick(results["scenarios"])
+        if newWallTime > oldWallTime * (1 + wallTimeTolerance):
+            regressions.append(f"wall time per tick {oldWallTime * 1e6:.0f}us -> {newWallTime * 1e6:.0f}us")
+    return regressions
+
+def meanWallTimePerTick(scenarios):
+    return sum(metrics["wallTimePerTick"] for metrics in scenarios.values()) / max(1, len(scenarios))
+
+def printSummary(results, verbose=False):
+    if verbose:
+        for name, metrics in results["scenarios"].items():
+            print(f"{name}: ticks={metrics['ticks']} getState={metrics['getState']} callService={metrics['callService']} "
+                  f"overshoot={metrics['overshoot']:.2f} finalError={metrics['finalError']:.2f}"
+                  f"{' TIMEOUT' if metrics['timedOut'] else ''}")
+    for group, summary in results["summary"].items():
+        print(f"{group}: {summary['scenarios']} scenarios, ticks mean={summary['meanTicks']:.1f} max={summary['maxTicks']}, "
+              f"{summary['meanWallTimePerTick'] * 1e6:.0f}us/tick, getState={summary['meanGetState']:.1f}, "
+              f"callService={summary['meanCallService']:.1f}, overshoot max={summary['maxOvershoot']:.2f}, "
+              f"motor on={summary['meanMotorOnSeconds']:.1f}s, timeouts={summary['timeouts']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the move loops against simulated trackers.")
+    parser.add_argument("--event-driven", action="store_true", help="Run the controllers event driven instead of polling")
+    parser.add_argument("--predict-stop", action="store_true", help="Switch off early when the stop predictor forecasts rest within the dead band")
+    parser.add_argument("--filter", choices=sorted(SENSOR_FILTERS), help="Filter the pitch and roll readings")
+    parser.add_argument("--calibrate", action="store_true", help="Calibrate the motors first, large moves then approach open loop")
+    parser.add_argument("--mqtt", action="store_true", help="Talk MQTT to simulated ESPHome devices instead of going through Home Assistant")
+    parser.add_argument("--sensor-noise", type=float, default=None, help="Standard deviation of the simulated sensor noise in degrees")
+    parser.add_argument("--save", metavar="FILE", help="Save the results as baseline")
+    parser.add_argument("--compare", metavar="FILE", help="Compare the results against a baseline, exit code 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Relative tolerance of ticks and service calls")
+    parser.add_argument("--overshoot-tolerance", type=float, default=0.2, help="Tolerance of overshoot and final error in degrees")
+    parser.add_argument("--wall-time-tolerance", type=float, default=0.5, help="Relative tolerance of the mean wall time per tick, negative to skip")
+    parser.add_argument("--verbose", action="store_true", help="Print every scenario")
+    args = parser.parse_args(argv)
+
+    controllerOptions = {"predictStop": True} if args.predict_stop else {}
+    if args.filter:
+        controllerOptions["sensorFilter"] = SENSOR_FILTERS[args.filter]
+    axisOptions = {"sensorNoise": args.sensor_noise} if args.sensor_noise is not None else {}
+    benchmark = MoveBenchmark(eventDriven=args.event_driven, controllerOptions=controllerOptions, mqtt=args.mqtt, **axisOptions)
+    if args.calibrate:
+        for controllerName, rates in benchmark.calibrate().items():
+            print(f"{controllerName}: {', '.join(f'{direction} {rate[0]:.4f}/% above {rate[1]:.1f}%' for direction, rate in rates.items())}")
+    results = benchmark.run()
+    printSummary(results, args.verbose)
+    if args.verbose:
+        benchmark.metrics.dump()
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=1, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        wallTimeTolerance = args.wall_time_tolerance if args.wall_time_tolerance >= 0 else None
+        regressions = compare(baseline, results, args.tolerance, args.overshoot_tolerance, wallTimeTolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+import math
+import time
+from array import array
+from collections import Counter
+
+PHASES = ("read", "pid", "decision", "actuation", "sleep", "tick", "move")
+
+class LatencyHistogram:
+    """
+    Histogram of durations in fixed memory.
+
+    Buckets grow by a factor of 2 ** (1 / bucketsPerOctave) from minimum
+    seconds up to maximum seconds, values outside end up in the first or
+    last bucket. Percentiles are answered with the upper bound of the
+    bucket, so they are accurate to one bucket width (about 19 % with the
+    default of 4 buckets per octave).
+    """
+    def __init__(self, minimum=1e-6, maximum=1000.0, bucketsPerOctave=4):
+        self.minimum = minimum
+        self.bucketsPerOctave = bucketsPerOctave
+        self.bucketCount = int(math.ceil(math.log2(maximum / minimum) * bucketsPerOctave)) + 1
+        self.buckets = array('Q', bytes(8 * self.bucketCount))
+        self.reset()
+
+    def reset(self):
+        for i in range(self.bucketCount):
+            self.buckets[i] = 0
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def getBucket(self, seconds):
+        if seconds <= self.minimum:
+            return 0
+        return min(int(math.log2(seconds / self.minimum) * self.bucketsPerOctave) + 1, self.bucketCount - 1)
+
+    def getUpperBound(self, bucket):
+        return self.minimum * 2 ** (bucket / self.bucketsPerOctave)
+
+    def add(self, seconds):
+        self.buckets[self.getBucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def getPercentile(self, percentile):
+        """Returns the upper bound of the bucket holding the percentile (0-100), None if empty."""
+        if self.count == 0:
+            return None
+        rank = percentile / 100 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(self.getUpperBound(bucket), self.maximum)
+        return self.maximum
+
+    def getSummary(self):
+        if self.count == 0:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean": self.total / self.count,
+            "p50": self.getPercentile(50),
+            "p90": self.getPercentile(90),
+            "p99": self.getPercentile(99),
+            "max": self.maximum,
+        }
+
+class MoveMetrics:
+    """
+    Instrumentation of the move loops.
+
+    Collects per tick phase timings in LatencyHistograms, counters of the
+    get_state/call_service calls, ticks and moves, and why each axis move
+    ended. All SolarControllers of a process share moveMetrics unless they
+    get their own instance.
+
+    Phases:
+        read: Reading the tick snapshot
+        pid: PID update, nested in the decision
+        decision: Limits, direction and speed decision without the PID
+        actuation: Sending the queued service calls
+        sleep: Waiting for the next tick
+        tick: Whole tick without the sleep
+        move: Whole move
+    """
+    def __init__(self, **histogramOptions):
+        self.histograms = {phase: LatencyHistogram(**histogramOptions) for phase in PHASES}
+        self.counts = Counter()
+        self.endReasons = Counter()
+        self.nestedTime = 0.0
+
+    def reset(self):
+        for histogram in self.histograms.values():
+            histogram.reset()
+        self.counts.clear()
+        self.endReasons.clear()
+        self.nestedTime = 0.0
+
+    def now(self):
+        return time.perf_counter()
+
+    def record(self, phase, start):
+        """
+        Adds the time since start to the phase, without the nested phases
+        recorded meanwhile. Returns the current time as start of the next phase.
+        """
+        now = time.perf_counter()
+        self.histograms[phase].add(max(0.0, now - start - self.nestedTime))
+        self.nestedTime = 0.0
+        return now
+
+    def recordNested(self, phase, start):
+        """Adds the time since start to a phase nested in the next recorded one, which doesn't count it."""
+        now = time.perf_counter()
+        self.histograms[phase].add(now - start)
+        self.nestedTime += now - start
+        return now
+
+    def count(self, name, value=1):
+        self.counts[name] += value
+
+    def end(self, axis, reason):
+        """
+        Parameters:
+            axis (str): Either 'pitch' or 'roll'
+            reason (str): e.g. 'settled', 'steady', 'max position', 'predicted', 'timeout'
+        """
+        self.endReasons[f"{axis} {reason}"] += 1
+
+    def getSummary(self):
+        """Returns the metrics as dict, e.g. as attributes of a summary entity."""
+        return {
+            "phases": {phase: histogram.getSummary() for phase, histogram in self.histograms.items()},
+            "counts": dict(self.counts),
+            "endReasons": dict(self.endReasons),
+        }
+
+    def publish(self, hass, entityId="sensor.solar_controller_metrics"):
+        """Writes the summary into a Home Assistant entity, its state is the number of moves."""
+        return hass.set_state(entityId, state=self.counts["moves"], attributes=self.getSummary())
+
+    def dump(self, log=print):
+        """Logs a human readable summary, times in milliseconds."""
+        for phase, histogram in self.histograms.items():
+            summary = histogram.getSummary()
+            if summary["count"]:
+                log(f"{phase:10s} n={summary['count']} mean={summary['mean'] * 1e3:.3f} p50={summary['p50'] * 1e3:.3f} "
+                    f"p90={summary['p90'] * 1e3:.3f} p99={summary['p99'] * 1e3:.3f} max={summary['max'] * 1e3:.3f}")
+        log(f"counts: {dict(self.counts)}")
+        log(f"end reasons: {dict(self.endReasons)}")
+
+# Shared by all SolarController instances of the process
+moveMetrics = MoveMetrics()
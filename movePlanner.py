@@ -0,0 +1,105 @@
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone
+
+from controllerProfile import controllerRegistry
+from solarController import clamp
+from solarEphemeris import MINUTES_PER_DAY
+
+@dataclass(frozen=True)
+class PlannedMove:
+    controllerName: str
+    axis: str # 'pitch' or 'roll'
+    time: datetime
+    target: float
+
+class MovePlanner:
+    """
+    Plans the moves of a day ahead from the sun trajectory.
+
+    An axis is only moved when its target, derived from the sun position and
+    clamped to the limits of the controller, has drifted more than threshold
+    degrees away from where the previous move left it. The first move of a
+    day is at sunrise (sun above minimumElevation), no moves are planned at
+    night.
+    """
+    def __init__(self, ephemeris, registry=None, threshold=1.0, minimumElevation=0.0):
+        self.ephemeris = ephemeris
+        self.registry = registry if registry is not None else controllerRegistry
+        self.threshold = threshold
+        self.minimumElevation = minimumElevation
+
+    def getPitchTarget(self, profile, sunElevation):
+        """Target of the pitch as elevation, see SolarController.getPitchDifference."""
+        return clamp(sunElevation, 90 - profile.pitchMaximas.MAX, 90 - profile.pitchMaximas.MIN)
+
+    def getRollTarget(self, profile, sunAzimuth):
+        """Target of the roll, see SolarController.getRollDifference."""
+        return clamp(- (sunAzimuth - 180), profile.rollMaximas.MIN, profile.rollMaximas.MAX)
+
+    def planAxis(self, controllerName, axis, day, elevations, targets):
+        moves = []
+        midnight = datetime.combine(day, time(), tzinfo=timezone.utc)
+        position = None
+        for minute in range(MINUTES_PER_DAY + 1):
+            if elevations[minute] <= self.minimumElevation:
+                continue
+            target = targets[minute]
+            if position is None:
+                moveMinute = minute
+            elif abs(target - position) > self.threshold:
+                # Interpolate when the threshold was crossed within the last minute
+                previousDifference = abs(targets[minute - 1] - position)
+                difference = abs(target - position)
+                fraction = (self.threshold - previousDifference) / (difference - previousDifference)
+                moveMinute = minute - 1 + clamp(fraction, 0.0, 1.0)
+            else:
+                continue
+            moves.append(PlannedMove(controllerName, axis, midnight + timedelta(minutes=moveMinute), target))
+            position = target
+        return moves
+
+    def planDay(self, day, controllerNames=None):
+        """
+        Parameters:
+            day (date): UTC date
+            controllerNames (list): Controllers to plan, all known controllers if None
+
+        Returns:
+            list: PlannedMove of all controllers and axes sorted by time
+        """
+        if controllerNames is None:
+            controllerNames = self.registry.getControllerNames()
+        elevations, azimuths = self.ephemeris.getDayTable(day)
+
+        moves = []
+        for controllerName in controllerNames:
+            profile, created = self.registry.get(controllerName)
+            if profile is None:
+                continue
+            pitchTargets = [self.getPitchTarget(profile, elevation) for elevation in elevations]
+            moves += self.planAxis(controllerName, "pitch", day, elevations, pitchTargets)
+            if not profile.isOneAxis:
+                rollTargets = [self.getRollTarget(profile, azimuth) for azimuth in azimuths]
+                moves += self.planAxis(controllerName, "roll", day, elevations, rollTargets)
+        moves.sort(key=lambda move: move.time)
+        return moves
+
+    def scheduleDay(self, hass, day, callback, controllerNames=None, after=None):
+        """
+        Schedules callback with AppDaemon's run_at at the time of every planned move.
+
+        The callback gets the controllerName, axis and target of the move in its kwargs.
+
+        Parameters:
+            after (datetime): Only moves after this point in time are scheduled, now if None
+
+        Returns:
+            list: Handles of the scheduled callbacks
+        """
+        if after is None:
+            after = datetime.now(timezone.utc)
+        handles = []
+        for move in self.planDay(day, controllerNames):
+            if move.time > after:
+                handles.append(hass.run_at(callback, move.time, controllerName=move.controllerName, axis=move.axis, target=move.target))
+        return handles
@@ -0,0 +1,177 @@
+import argparse
+import json
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from constantsAndDefines import ControllerID
+from controllerProfile import ControllerRegistry, controllerRegistry
+from moveBenchmark import MoveBenchmark
+
+# Setting: (lowest, highest) value searched
+PARAMETER_RANGES = {
+    "kp": (0.3, 3.0),
+    "ki": (0.0, 0.2),
+    "kd": (0.0, 0.5),
+    "speedMax": (60.0, 100.0),
+    "speedMin": (41.0, 55.0),
+    "speedMaxWithinThreshold": (45.0, 80.0),
+    "threshold": (5.0, 30.0),
+    "aggressiveness": (1.0, 5.0),
+}
+
+TUNING_START_OFFSETS = (-20.0, -6.0, 6.0, 20.0)
+TUNING_SUN_POSITIONS = ((20.0, 110.0), (45.0, 170.0), (30.0, 240.0))
+
+def getDefaultParameters(controllerName, registry=None):
+    """Returns the current settings of a controller as tuner parameters."""
+    registry = registry if registry is not None else controllerRegistry
+    profile, created = registry.get(controllerName)
+    return {
+        "kp": profile.pidGains[0],
+        "ki": profile.pidGains[1],
+        "kd": profile.pidGains[2],
+        "speedMax": profile.speedCurve.MAX,
+        "speedMin": profile.speedCurve.MIN,
+        "speedMaxWithinThreshold": profile.speedCurve.MAX_WITHIN_THRESHOLD,
+        "threshold": profile.speedCurve.THRESHOLD,
+        "aggressiveness": profile.compensateUpDownPosition.aggressiveness,
+    }
+
+def isValidCandidate(parameters):
+    return parameters["speedMin"] <= parameters["speedMaxWithinThreshold"] <= parameters["speedMax"]
+
+def score(scenarios, overshootWeight=10.0, motorWeight=0.5, errorWeight=5.0, timeoutPenalty=100.0):
+    """
+    Scores the benchmark results of a candidate, lower is better.
+
+    The score is the mean move duration in seconds plus weighted overshoot,
+    motor-on seconds and final error beyond the 1 degree dead band, and a
+    penalty for every move that ran into the timeout.
+    """
+    total = 0.0
+    for metrics in scenarios.values():
+        total += metrics["seconds"]
+        total += overshootWeight * metrics["overshoot"]
+        total += motorWeight * metrics["motorOnSeconds"]
+        total += errorWeight * max(0.0, metrics["finalError"] - 1.0)
+        if metrics["timedOut"]:
+            total += timeoutPenalty
+    return total / max(1, len(scenarios))
+
+def evaluateCandidate(candidate):
+    """
+    Runs the tuning scenarios of one candidate, executed in a worker process.
+
+    Parameters:
+        candidate (tuple): (controllerName, settings, parameters, benchmarkOptions), settings are
+                           the ones of the controller in its registry, the parameters override them
+
+    Returns:
+        tuple: (score, parameters, summary)
+    """
+    controllerName, settings, parameters, benchmarkOptions = candidate
+    registry = ControllerRegistry()
+    registry.configure(controllerName, **dict(settings, **parameters))
+    results = MoveBenchmark(registry=registry, controllerNames=(controllerName,), **benchmarkOptions).run()
+    return score(results["scenarios"]), parameters, results["summary"]
+
+class MoveTuner:
+    """
+    Searches PID gains, speed curve, threshold and speed compensation of a
+    controller against the simulated tracker.
+
+    Each round samples candidates around the best parameters found so far,
+    the spread shrinks from round to round. Candidates are evaluated in
+    parallel over a ProcessPoolExecutor, every worker simulates its moves
+    on its own virtual time event loop.
+    """
+    def __init__(self, candidatesPerRound=32, rounds=4, shrink=0.5, maxWorkers=None, seed=0,
+                 startOffsets=TUNING_START_OFFSETS, sunPositions=TUNING_SUN_POSITIONS, registry=None, **benchmarkOptions):
+        self.candidatesPerRound = candidatesPerRound
+        self.rounds = rounds
+        self.shrink = shrink
+        self.maxWorkers = maxWorkers
+        self.rng = random.Random(seed)
+        self.registry = registry if registry is not None else controllerRegistry
+        self.benchmarkOptions = dict(benchmarkOptions, startOffsets=startOffsets, sunPositions=sunPositions)
+
+    def sampleCandidate(self, center, spread):
+        while True:
+            parameters = {}
+            for name, (lowest, highest) in PARAMETER_RANGES.items():
+                value = center[name] + self.rng.gauss(0.0, spread * (highest - lowest))
+                parameters[name] = round(max(lowest, min(highest, value)), 3)
+            if isValidCandidate(parameters):
+                return parameters
+
+    def tune(self, controllerName, executor, log=print):
+        """
+        Returns:
+            dict: Best parameters, their score and the score of the current settings
+        """
+        oneAxis = self.registry.isOneAxis(controllerName)
+        # Limits, motor rates etc. of the controller stay as configured
+        settings = dict(self.registry.settings.get(controllerName, {}))
+        defaults = getDefaultParameters(controllerName, self.registry)
+        defaultScore, best, bestSummary = evaluateCandidate((controllerName, settings, defaults, self.benchmarkOptions))
+        bestScore = defaultScore
+        log(f"{controllerName}: current settings score {defaultScore:.2f}")
+
+        spread = 0.25
+        for tuningRound in range(self.rounds):
+            candidates = [(controllerName, settings, self.sampleCandidate(best, spread), self.benchmarkOptions)
+                          for _ in range(self.candidatesPerRound)]
+            for candidateScore, parameters, summary in executor.map(evaluateCandidate, candidates):
+                if candidateScore < bestScore:
+                    bestScore, best, bestSummary = candidateScore, parameters, summary
+            log(f"{controllerName}: round {tuningRound + 1} best score {bestScore:.2f}")
+            spread *= self.shrink
+
+        return {
+            "settings": dict(best, oneAxis=oneAxis),
+            "score": bestScore,
+            "defaultScore": defaultScore,
+            "summary": bestSummary,
+        }
+
+    def run(self, controllerNames=(ControllerID.ONE_AXIS_ID, ControllerID.TWO_AXIS_ID), log=print):
+        """
+        Returns:
+            dict: Tuned profile per controller name, see loadProfiles()
+        """
+        with ProcessPoolExecutor(max_workers=self.maxWorkers) as executor:
+            return {controllerName: self.tune(controllerName, executor, log) for controllerName in controllerNames}
+
+def loadProfiles(path, registry=None):
+    """Configures the controllers of a registry with the profiles written by the tuner."""
+    registry = registry if registry is not None else controllerRegistry
+    with open(path) as file:
+        profiles = json.load(file)
+    for controllerName, profile in profiles.items():
+        registry.configure(controllerName, **profile["settings"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune PID gains and speed curves against simulated trackers.")
+    parser.add_argument("controllers", nargs="*", default=[ControllerID.ONE_AXIS_ID, ControllerID.TWO_AXIS_ID])
+    parser.add_argument("--candidates", type=int, default=32, help="Candidates per round")
+    parser.add_argument("--rounds", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes, number of CPUs if omitted")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--event-driven", action="store_true", help="Tune event driven instead of polling controllers")
+    parser.add_argument("--output", metavar="FILE", help="Write the tuned profiles as JSON")
+    args = parser.parse_args(argv)
+
+    tuner = MoveTuner(candidatesPerRound=args.candidates, rounds=args.rounds, maxWorkers=args.workers,
+                      seed=args.seed, eventDriven=args.event_driven)
+    profiles = tuner.run(args.controllers)
+    text = json.dumps(profiles, indent=1, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text)
+    else:
+        print(text)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+import asyncio
+import json
+from dataclasses import dataclass
+
+from controllerProfile import controllerRegistry
+
+# ESPHome components the controllers use, availability is the status binary sensor
+COMPONENTS = ("sensor", "binary_sensor", "switch", "light")
+MQTT_BRIGHTNESS_MAX = 255
+
+@dataclass(frozen=True)
+class DeviceEntity:
+    device: str # MQTT topic prefix of the ESPHome device
+    component: str # e.g. 'sensor' or 'switch'
+    objectId: str
+
+    def getStateTopic(self):
+        if self.component == "binary_sensor" and self.objectId == "status":
+            return f"{self.device}/status"
+        return f"{self.device}/{self.component}/{self.objectId}/state"
+
+    def getCommandTopic(self):
+        return f"{self.device}/{self.component}/{self.objectId}/command"
+
+def toHassState(entity, payload):
+    """Converts an ESPHome MQTT state payload to the state Home Assistant shows."""
+    if entity.getStateTopic() == f"{entity.device}/status":
+        return "on" if payload == "online" else "off"
+    if entity.component == "light":
+        return json.loads(payload).get("state", "OFF").lower()
+    if entity.component in ("switch", "binary_sensor"):
+        return payload.lower()
+    return payload
+
+class DeviceSession:
+    """
+    Persistent connection to one ESPHome device.
+
+    Subscribes once to all topics of the device and keeps the latest state
+    of every entity, notifying the listeners of changes. Messages may
+    arrive on the network thread of the client.
+    """
+    def __init__(self, device, client):
+        self.device = device
+        self.client = client
+        self.states = {} # state topic -> payload
+        self.listeners = {} # state topic -> {handle: callback}
+        self.waiters = set() # (loop, event) of the primes waiting for first states
+        self.primedTopics = set() # State topics primeAsync waited for, they aren't waited for again
+        client.subscribe(f"{device}/#", self.onMessage)
+
+    def onMessage(self, topic, payload):
+        old = self.states.get(topic)
+        self.states[topic] = payload
+        for callback in list(self.listeners.get(topic, {}).values()):
+            callback(old, payload)
+        for loop, event in list(self.waiters):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass # Loop already closed, the read is over
+
+    def publish(self, topic, payload):
+        self.client.publish(topic, payload)
+
+class MqttTransport:
+    """
+    Talks MQTT directly to the ESPHome devices of the solar controllers.
+
+    Every device gets a DeviceSession on first use, which is kept for the
+    lifetime of the transport: reads are answered from the local cache of
+    the session, so get_state doesn't wait for the network, and commands
+    are published without waiting for an acknowledgement, so all commands
+    of a tick go out back to back. get_state returns None for a state that
+    hasn't arrived yet, primeAsync subscribes to the devices of entities
+    before they are read and waits up to stateTimeout seconds for their
+    first states. Entities that aren't on a device, e.g. the sun sensors
+    and the action text, go to the fallback transport. The topics of a
+    device start with the mqttTopicPrefix of its controller profile.
+
+    connect(device) returns the client of a device, it needs
+    publish(topic, payload) and subscribe(topicFilter, callback(topic, payload)),
+    e.g. LocalBroker.connect or PahoConnection.
+    """
+    def __init__(self, connect, fallback=None, registry=None, stateTimeout=2.0):
+        self.connect = connect
+        self.fallback = fallback
+        self.registry = registry if registry is not None else controllerRegistry
+        self.stateTimeout = stateTimeout
+        self.sessions = {}
+        self.entities = {}
+        self.handles = {}
+        self.nextHandle = 0
+
+    def getEntity(self, entityId):
+        """Returns the DeviceEntity of an entity id, None if it isn't on a solar controller."""
+        if entityId in self.entities:
+            return self.entities[entityId]
+        entity = None
+        matchedBase = ""
+        component, separator, name = (entityId or "").partition(".")
+        if component in COMPONENTS:
+            for controllerName in self.registry.getControllerNames():
+                profile, created = self.registry.get(controllerName)
+                base = profile.controllerEntityIdBase
+                if name.startswith(base + "_") and len(base) > len(matchedBase):
+                    entity = DeviceEntity(profile.mqttTopicPrefix, component, name[len(base) + 1:])
+                    matchedBase = base
+        self.entities[entityId] = entity
+        return entity
+
+    def getSession(self, device):
+        session = self.sessions.get(device)
+        if session is None:
+            session = self.sessions[device] = DeviceSession(device, self.connect(device))
+        return session
+
+    def close(self):
+        for session in self.sessions.values():
+            close = getattr(session.client, "close", None)
+            if close is not None:
+                close()
+        self.sessions.clear()
+
+    def get_state(self, entity_id=None, **kwargs):
+        entity = self.getEntity(entity_id)
+        if entity is None:
+            return self.fallback.get_state(entity_id, **kwargs) if self.fallback is not None else None
+        payload = self.getSession(entity.device).states.get(entity.getStateTopic())
+        return toHassState(entity, payload) if payload is not None else None
+
+    async def primeAsync(self, entityIds):
+        """
+        Subscribes to the devices of entities and waits up to stateTimeout
+        seconds for the first states of those not read before.
+
+        Parameters:
+            entityIds (iterable): Entities the next reads need
+        """
+        topics = {}
+        for entityId in entityIds:
+            entity = self.getEntity(entityId)
+            if entity is not None:
+                session = self.getSession(entity.device)
+                topic = entity.getStateTopic()
+                if topic not in session.primedTopics:
+                    topics.setdefault(session, set()).add(topic)
+        if topics:
+            await asyncio.gather(*(self.waitForStatesAsync(session, sessionTopics) for session, sessionTopics in topics.items()))
+
+    async def waitForStatesAsync(self, session, topics):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.stateTimeout
+        waiter = (loop, asyncio.Event())
+        session.waiters.add(waiter)
+        try:
+            while not topics <= session.states.keys() and loop.time() < deadline:
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    pass
+                waiter[1].clear()
+        finally:
+            session.waiters.discard(waiter)
+            # A device which doesn't answer in time isn't waited for on every read
+            session.primedTopics |= topics
+
+    def call_service(self, service, **kwargs):
+        entityId = kwargs.pop("entity_id", None)
+        entity = self.getEntity(entityId)
+        if entity is None:
+            if self.fallback is not None:
+                return self.fallback.call_service(service, entity_id=entityId, **kwargs)
+            return None
+
+        if service == "switch/turn_on":
+            payload = "ON"
+        elif service == "switch/turn_off":
+            payload = "OFF"
+        elif service == "light/turn_on":
+            brightness = min(kwargs.get("brightness", MQTT_BRIGHTNESS_MAX), MQTT_BRIGHTNESS_MAX)
+            payload = json.dumps({"state": "ON", "brightness": brightness})
+        elif service == "light/turn_off":
+            payload = json.dumps({"state": "OFF"})
+        else:
+            raise ValueError(f"Service {service} isn't supported for {entityId}")
+        self.getSession(entity.device).publish(entity.getCommandTopic(), payload)
+        return None
+
+    def listen_state(self, callback, entity_id=None, **kwargs):
+        entity = self.getEntity(entity_id)
+        if entity is None:
+            return self.fallback.listen_state(callback, entity_id, **kwargs) if self.fallback is not None else None
+
+        self.nextHandle += 1
+        handle = self.nextHandle
+        topic = entity.getStateTopic()
+        def onChange(old, new):
+            callback(entity_id, "state", None if old is None else toHassState(entity, old), toHassState(entity, new), {})
+        self.getSession(entity.device).listeners.setdefault(topic, {})[handle] = onChange
+        self.handles[handle] = (entity.device, topic)
+        return handle
+
+    def cancel_listen_state(self, handle):
+        if handle not in self.handles:
+            return self.fallback.cancel_listen_state(handle) if self.fallback is not None else None
+        device, topic = self.handles.pop(handle)
+        self.sessions[device].listeners.get(topic, {}).pop(handle, None)
+
+def isMatch(topicFilter, topic):
+    """MQTT topic filter matching with the + and # wildcards."""
+    filterLevels = topicFilter.split("/")
+    topicLevels = topic.split("/")
+    for index, level in enumerate(filterLevels):
+        if level == "#":
+            return True
+        if index >= len(topicLevels) or (level != "+" and level != topicLevels[index]):
+            return False
+    return len(filterLevels) == len(topicLevels)
+
+class LocalBroker:
+    """
+    In-process stand-in for an MQTT broker, for tests and simulations.
+
+    Messages are delivered synchronously within publish, retained messages
+    are delivered to new subscriptions. Every published message is counted.
+    """
+    def __init__(self):
+        self.subscriptions = []
+        self.retained = {}
+        self.published = 0
+
+    def connect(self, clientId=None):
+        return LocalClient(self, clientId)
+
+    def subscribe(self, client, topicFilter, callback):
+        self.subscriptions.append((client, topicFilter, callback))
+        for topic, payload in list(self.retained.items()):
+            if isMatch(topicFilter, topic):
+                callback(topic, payload)
+
+    def publish(self, client, topic, payload, retain=False):
+        self.published += 1
+        if retain:
+            self.retained[topic] = payload
+        for subscriber, topicFilter, callback in list(self.subscriptions):
+            if isMatch(topicFilter, topic):
+                callback(topic, payload)
+
+    def disconnect(self, client):
+        self.subscriptions = [subscription for subscription in self.subscriptions if subscription[0] is not client]
+
+class LocalClient:
+    def __init__(self, broker, clientId):
+        self.broker = broker
+        self.clientId = clientId
+
+    def subscribe(self, topicFilter, callback):
+        self.broker.subscribe(self, topicFilter, callback)
+
+    def publish(self, topic, payload, retain=False):
+        self.broker.publish(self, topic, payload, retain)
+
+    def close(self):
+        self.broker.disconnect(self)
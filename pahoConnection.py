@@ -0,0 +1,43 @@
+import paho.mqtt.client as mqtt
+
+class PahoConnection:
+    """
+    Connection of MqttTransport to an MQTT broker with paho-mqtt.
+
+    Every connection runs its own network thread, subscriptions are renewed
+    when the client reconnects. Use one per device, e.g.
+    MqttTransport(lambda device: PahoConnection(host, clientId=f"solar-{device}"), HassTransport(hass))
+    """
+    def __init__(self, host, port=1883, clientId=None, username=None, password=None, keepalive=60):
+        try:
+            self.client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=clientId or "")
+        except AttributeError: # paho-mqtt < 2.0
+            self.client = mqtt.Client(client_id=clientId or "")
+        if username is not None:
+            self.client.username_pw_set(username, password)
+        self.subscriptions = []
+        self.client.on_connect = self.onConnect
+        self.client.on_message = self.onMessage
+        self.client.connect(host, port, keepalive)
+        self.client.loop_start()
+
+    def onConnect(self, client, userdata, flags, reasonCode, properties=None):
+        for topicFilter, callback in self.subscriptions:
+            client.subscribe(topicFilter)
+
+    def onMessage(self, client, userdata, message):
+        payload = message.payload.decode()
+        for topicFilter, callback in self.subscriptions:
+            if mqtt.topic_matches_sub(topicFilter, message.topic):
+                callback(message.topic, payload)
+
+    def subscribe(self, topicFilter, callback):
+        self.subscriptions.append((topicFilter, callback))
+        self.client.subscribe(topicFilter)
+
+    def publish(self, topic, payload, retain=False):
+        self.client.publish(topic, payload, qos=0, retain=retain)
+
+    def close(self):
+        self.client.loop_stop()
+        self.client.disconnect()
@@ -0,0 +1,356 @@
+import argparse
+import asyncio
+import bisect
+import csv
+import heapq
+import itertools
+import json
+import math
+import sys
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+
+from constantsAndDefines import UpDownPosition, EastWestPosition
+from controllerProfile import controllerRegistry
+from moveMetrics import MoveMetrics
+from solarController import SolarController
+from virtualTime import runVirtual
+
+@dataclass(frozen=True)
+class ReplayMove:
+    time: float # s, same clock as the trace
+    controllerName: str
+    axis: str # 'pitch' or 'roll'
+    position: str = "MinimizeDifference" # Name of the UpDownPosition or EastWestPosition
+
+@dataclass
+class TickRecord:
+    move: int # Index of the move in the replay
+    axis: str
+    tick: int
+    time: float # s since the start of the move
+    difference: float
+    control: float
+    speed: float
+    calls: list = field(default_factory=list) # [service, entityId, data] sent after the decision
+
+def parseHistoryRow(row):
+    changed = datetime.fromisoformat(row["last_changed"].replace("Z", "+00:00"))
+    return (changed.timestamp(), row["entity_id"], row["state"])
+
+def findSortedRuns(path):
+    """
+    Finds the runs of a Home Assistant history export, a run holds
+    consecutive rows in time order. Exports grouped by entity have a run per
+    entity, exports in time order a single one.
+
+    Returns:
+        tuple: (column names, file offsets of the runs)
+    """
+    with open(path, newline="") as file:
+        fieldnames = next(csv.reader([file.readline()]))
+        offsets = []
+        lastTime = math.inf
+        while True:
+            offset = file.tell()
+            line = file.readline()
+            if not line:
+                break
+            row = next(csv.DictReader([line], fieldnames=fieldnames), None)
+            if row is None:
+                continue
+            time = parseHistoryRow(row)[0]
+            if time < lastTime:
+                offsets.append(offset)
+            lastTime = time
+    return fieldnames, offsets
+
+def readSortedRun(path, fieldnames, offset):
+    """Streams the rows of the run starting at offset."""
+    with open(path, newline="") as file:
+        file.seek(offset)
+        lastTime = -math.inf
+        for row in csv.DictReader(file, fieldnames=fieldnames):
+            event = parseHistoryRow(row)
+            if event[0] < lastTime:
+                return
+            lastTime = event[0]
+            yield event
+
+def readHistoryCsv(path):
+    """
+    Streams a Home Assistant history export (entity_id,state,last_changed).
+
+    The exports are grouped by entity and every entity is in time order, so
+    the runs of the entities are merged instead of sorting the whole export:
+    only one row per run is kept in memory. Rows of the same time keep their
+    file order.
+
+    Yields:
+        tuple: (time in seconds since the epoch, entityId, state), in time order
+    """
+    fieldnames, offsets = findSortedRuns(path)
+    runs = [readSortedRun(path, fieldnames, offset) for offset in offsets]
+    yield from heapq.merge(*runs, key=lambda row: row[0])
+
+def checkTimeOrder(trace):
+    """
+    Passes the events of a trace through.
+
+    Raises:
+        ValueError: At the first event older than the one before it
+    """
+    lastTime = -math.inf
+    for event in trace:
+        if event[0] < lastTime:
+            raise ValueError(f"Trace isn't in time order: {event[1]} at {event[0]} after {lastTime}")
+        lastTime = event[0]
+        yield event
+
+def findMoves(trace, registry=None, quietTime=120.0):
+    """
+    Derives the moves from the switch events of a trace: a move starts when
+    a direction switch of an axis is switched on after quietTime seconds
+    without switching that axis.
+
+    Yields:
+        ReplayMove: In trace order
+    """
+    registry = registry if registry is not None else controllerRegistry
+    switches = {}
+    for controllerName in registry.getControllerNames():
+        profile, created = registry.get(controllerName)
+        for entityId in (profile.switchUpEntityId, profile.switchDownEntityId):
+            switches[entityId] = (controllerName, "pitch")
+        for entityId in (profile.switchEastEntityId, profile.switchWestEntityId):
+            switches[entityId] = (controllerName, "roll")
+
+    lastSwitched = {}
+    for time, entityId, state in checkTimeOrder(trace):
+        if entityId not in switches or state != "on":
+            continue
+        key = switches[entityId]
+        if time - lastSwitched.get(key, -math.inf) > quietTime:
+            # The move starts one update period before its first command
+            yield ReplayMove(time - 1.0, *key)
+        lastSwitched[key] = time
+
+class ReplayHass:
+    """
+    Stand-in for the AppDaemon Hass API answering get_state from a recorded trace.
+
+    The trace is consumed lazily while the virtual time advances, so only
+    the latest state of every entity and the events since the start of the
+    current move are kept in memory. Every move is replayed from the states
+    at its own start time, so moves may overlap, e.g. the pitch and the roll
+    move of a tracker. Service calls are recorded but don't change the
+    recorded states: the replay is open loop, the sensors show what the
+    field did, not what the replayed code commands. There is no
+    listen_state, controllers are replayed polling.
+    """
+    def __init__(self, trace):
+        self.startTrace = checkTimeOrder(trace)
+        self.nextStartEvent = next(self.startTrace, None)
+        self.startStates = {}
+        self.startTime = -math.inf
+        self.trace = iter(())
+        self.nextEvent = None
+        self.states = {}
+        self.offset = 0.0
+        self.calls = []
+        self.lastTime = 0.0
+
+    def startMove(self, time):
+        """
+        Positions the replay at the start time of a move, the virtual clock starts at 0.
+
+        Raises:
+            ValueError: If the move starts before the move before it
+        """
+        if time < self.startTime:
+            raise ValueError(f"Moves aren't in time order: move at {time} after {self.startTime}")
+        self.startTime = time
+        while self.nextStartEvent is not None and self.nextStartEvent[0] <= time:
+            eventTime, entityId, state = self.nextStartEvent
+            self.startStates[entityId] = state
+            self.nextStartEvent = next(self.startTrace, None)
+        # The move reads ahead on its own copy, the next move starts from here again
+        self.startTrace, self.trace = itertools.tee(self.startTrace)
+        self.nextEvent = self.nextStartEvent
+        self.states = dict(self.startStates)
+        self.offset = time
+        self.calls = []
+
+    def advance(self, time):
+        while self.nextEvent is not None and self.nextEvent[0] <= time:
+            eventTime, entityId, state = self.nextEvent
+            self.states[entityId] = state
+            self.nextEvent = next(self.trace, None)
+
+    def now(self):
+        try:
+            self.lastTime = asyncio.get_running_loop().time()
+        except RuntimeError:
+            pass
+        return self.lastTime
+
+    def log(self, msg, *args, **kwargs):
+        pass
+
+    def get_state(self, entity_id=None, **kwargs):
+        self.advance(self.offset + self.now())
+        return self.states.get(entity_id)
+
+    def call_service(self, service, **kwargs):
+        entityId = kwargs.pop("entity_id", None)
+        self.calls.append((self.now(), service, entityId, kwargs))
+
+class ReplayTelemetry:
+    """Collects the telemetry rows of a move as TickRecords."""
+    def __init__(self):
+        self.records = []
+        self.ticks = {}
+        self.move = 0
+
+    def record(self, controllerName, axis, pitch, roll, target, difference, control, speed, switches):
+        tick = self.ticks.get(axis, 0)
+        self.ticks[axis] = tick + 1
+        self.records.append(TickRecord(self.move, axis, tick, asyncio.get_running_loop().time(),
+                                       difference, math.nan if control is None else control, speed))
+
+def createController(hass, telemetry, registry=None, **controllerOptions):
+    return SolarController(hass, registry=registry, telemetry=telemetry, metrics=MoveMetrics(), **controllerOptions)
+
+def replayMoves(trace, moves, controllerFactory=createController):
+    """
+    Runs the moves against a trace, one move at a time on virtual time.
+
+    Parameters:
+        trace (iterable): (time, entityId, state) in time order
+        moves (iterable): ReplayMove in time order
+        controllerFactory (callable): (hass, telemetry) -> SolarController, e.g.
+                                      with other parameters. One controller
+                                      replays all moves, learned state carries over.
+
+    Yields:
+        list: TickRecords of every move
+    """
+    hass = ReplayHass(trace)
+    telemetry = ReplayTelemetry()
+    controller = controllerFactory(hass, telemetry)
+    for index, move in enumerate(moves):
+        hass.startMove(move.time)
+        telemetry.records = []
+        telemetry.ticks = {}
+        telemetry.move = index
+        if move.axis == "pitch":
+            runVirtual(controller.moveUpDownAsync(move.controllerName, UpDownPosition[move.position]))
+        else:
+            runVirtual(controller.moveEastWestAsync(move.controllerName, EastWestPosition[move.position]))
+
+        # Service calls are sent after the decision of their tick, they belong
+        # to the last tick recorded before them
+        times = [record.time for record in telemetry.records]
+        for time, service, entityId, data in hass.calls:
+            index = bisect.bisect_right(times, time) - 1
+            if index >= 0:
+                telemetry.records[index].calls.append([service, entityId, data])
+        yield telemetry.records
+
+def writeRecords(path, replay):
+    """Writes the TickRecords of a replay as JSON lines, one move after the other."""
+    with open(path, "w") as file:
+        for records in replay:
+            for record in records:
+                file.write(json.dumps(asdict(record)) + "\n")
+
+def readRecords(path):
+    """Streams the TickRecords written by writeRecords, grouped per move."""
+    with open(path) as file:
+        move = None
+        records = []
+        for line in file:
+            record = TickRecord(**json.loads(line))
+            if record.move != move and records:
+                yield records
+                records = []
+            move = record.move
+            records.append(record)
+        if records:
+            yield records
+
+def isDifferent(a, b, tolerance):
+    if isinstance(a, float) and isinstance(b, float):
+        if math.isnan(a) and math.isnan(b):
+            return False
+        return not abs(a - b) <= tolerance
+    return a != b
+
+def alignMoves(replayA, replayB):
+    """Pairs the moves of two replays by move index, moves without ticks pair with an empty list."""
+    replayA = (records for records in replayA if records)
+    replayB = (records for records in replayB if records)
+    recordsA = next(replayA, None)
+    recordsB = next(replayB, None)
+    while recordsA is not None or recordsB is not None:
+        moveA = recordsA[0].move if recordsA is not None else math.inf
+        moveB = recordsB[0].move if recordsB is not None else math.inf
+        yield (recordsA if moveA <= moveB else []), (recordsB if moveB <= moveA else [])
+        if moveA <= moveB:
+            recordsA = next(replayA, None)
+        if moveB <= moveA:
+            recordsB = next(replayB, None)
+
+def diffReplays(replayA, replayB, tolerance=1e-9):
+    """
+    Compares two replays tick for tick.
+
+    Yields:
+        str: One line per difference in decision (PID output, speed),
+             service calls or number of ticks.
+    """
+    for recordsA, recordsB in alignMoves(replayA, replayB):
+        ticksA = {(record.axis, record.tick): record for record in recordsA}
+        ticksB = {(record.axis, record.tick): record for record in recordsB}
+        for key in sorted(set(ticksA) | set(ticksB)):
+            a = ticksA.get(key)
+            b = ticksB.get(key)
+            if a is None or b is None:
+                record = a or b
+                yield f"move {record.move} {key[0]} tick {key[1]}: only in {'A' if b is None else 'B'}"
+                continue
+            for name in ("difference", "control", "speed", "calls"):
+                if isDifferent(getattr(a, name), getattr(b, name), tolerance):
+                    yield f"move {a.move} {key[0]} tick {key[1]}: {name} {getattr(a, name)} != {getattr(b, name)}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded moves against the controller code of this checkout.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    record = subparsers.add_parser("record", help="Replay the moves of a Home Assistant history export")
+    record.add_argument("trace", help="CSV with entity_id,state,last_changed")
+    record.add_argument("output", help="JSON lines file of the tick records")
+    record.add_argument("--quiet-time", type=float, default=120.0, help="Seconds without switching that separate two moves")
+    record.add_argument("--predict-stop", action="store_true")
+    diff = subparsers.add_parser("diff", help="Compare the tick records of two replays")
+    diff.add_argument("a")
+    diff.add_argument("b")
+    diff.add_argument("--tolerance", type=float, default=1e-9)
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        # findMoves only runs ahead of the replay up to the start of the next move
+        movesTrace, trace = itertools.tee(readHistoryCsv(args.trace))
+        moves = findMoves(movesTrace, quietTime=args.quiet_time)
+        factory = lambda hass, telemetry: createController(hass, telemetry, predictStop=args.predict_stop)
+        writeRecords(args.output, replayMoves(trace, moves, factory))
+        return 0
+
+    differences = 0
+    for line in diffReplays(readRecords(args.a), readRecords(args.b), args.tolerance):
+        print(line)
+        differences += 1
+    print(f"{differences} differences")
+    return 1 if differences else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,57 @@
+import asyncio
+
+from asyncUtils import resolve
+
+class SampleListener:
+    """
+    Wakes a waiting control loop whenever Home Assistant publishes a new value
+    of one of the given sensor entities.
+
+    State callbacks may come from an AppDaemon worker thread, so the waiting
+    event is always set on the loop the listener was started on.
+    """
+    def __init__(self, hass, *entityIds):
+        self.hass = hass
+        self.entityIds = entityIds
+        self.handles = []
+        self.loop = None
+        self.event = None
+
+    async def startAsync(self):
+        self.loop = asyncio.get_running_loop()
+        self.event = asyncio.Event()
+        for entityId in self.entityIds:
+            self.handles.append(await resolve(self.hass.listen_state(self.onStateChange, entityId)))
+
+    async def stopAsync(self):
+        handles, self.handles = self.handles, []
+        for handle in handles:
+            await resolve(self.hass.cancel_listen_state(handle))
+
+    def onStateChange(self, entity, attribute, old, new, kwargs):
+        if new == old:
+            return
+        try:
+            self.loop.call_soon_threadsafe(self.event.set)
+        except RuntimeError:
+            pass # Loop already closed, the move is over
+
+    def clear(self):
+        """Forgets the samples that arrived while nobody was waiting."""
+        if self.event is not None:
+            self.event.clear()
+
+    async def waitAsync(self, timeout):
+        """
+        Waits for the next sample.
+
+        Returns:
+            bool: True if a new sample arrived, False on timeout.
+        """
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+            received = True
+        except asyncio.TimeoutError:
+            received = False
+        self.event.clear()
+        return received
@@ -0,0 +1,129 @@
+import math
+
+class AlphaBetaFilter:
+    """
+    Alpha-beta filter estimating position and velocity of an axis.
+
+    The gains are the steady state gains of a KalmanFilter with the same
+    noise model, derived from the tracking index for the time between two
+    readings, so they follow the sample period. processNoise is the
+    spectral density of the acceleration in (degrees/s²)²/Hz,
+    measurementNoise the variance of a reading in degrees². After a gap of
+    more than maxGap seconds the filter starts again from the reading. The
+    controller resets it at the start of every move, settle() tells the
+    filter that the motor was switched off so the velocity doesn't carry
+    into the next move.
+    """
+    def __init__(self, processNoise=0.01, measurementNoise=0.0025, maxGap=5.0):
+        self.processNoise = processNoise
+        self.measurementNoise = measurementNoise
+        self.maxGap = maxGap
+        self.reset()
+
+    def reset(self):
+        self.position = None
+        self.velocity = 0.0
+        self.time = None
+
+    def settle(self):
+        self.velocity = 0.0
+
+    def getGains(self, dt):
+        """
+        Returns:
+            tuple: (alpha, beta) for readings dt seconds apart
+        """
+        trackingIndex = math.sqrt(self.processNoise * dt ** 3 / self.measurementNoise)
+        r = (4 + trackingIndex - math.sqrt(8 * trackingIndex + trackingIndex ** 2)) / 4
+        return 1 - r * r, 2 * (1 - r) ** 2
+
+    def update(self, time, measurement):
+        """
+        Parameters:
+            time (float): Time of the measurement in seconds
+            measurement (float): Sensor reading
+
+        Returns:
+            float: Position estimate
+        """
+        if self.position is not None and time - self.time > self.maxGap:
+            self.reset()
+        if self.position is None:
+            self.position, self.time = measurement, time
+            return self.position
+
+        dt = time - self.time
+        self.time = time
+        position = self.position + self.velocity * dt
+        residual = measurement - position
+        if dt > 0:
+            alpha, beta = self.getGains(dt)
+            self.position = position + alpha * residual
+            self.velocity = self.velocity + beta * residual / dt
+        else:
+            self.position = position
+        return self.position
+
+class KalmanFilter:
+    """
+    Kalman filter with a constant velocity model estimating position and
+    velocity of an axis.
+
+    processNoise is the spectral density of the acceleration in
+    (degrees/s²)²/Hz, measurementNoise the variance of a reading in
+    degrees². The controller resets it at the start of every move,
+    settle() tells the filter that the motor was switched off so the
+    velocity doesn't carry into the next move.
+    """
+    def __init__(self, processNoise=0.01, measurementNoise=0.0025, initialVelocityVariance=1.0):
+        self.processNoise = processNoise
+        self.measurementNoise = measurementNoise
+        self.initialVelocityVariance = initialVelocityVariance
+        self.reset()
+
+    def reset(self):
+        self.position = None
+        self.velocity = 0.0
+        self.time = None
+        self.covariance = None # [[pp, pv], [pv, vv]] as (pp, pv, vv)
+
+    def settle(self):
+        if self.covariance is not None:
+            pp, pv, vv = self.covariance
+            self.covariance = (pp, 0.0, vv)
+        self.velocity = 0.0
+
+    def update(self, time, measurement):
+        """
+        Parameters:
+            time (float): Time of the measurement in seconds
+            measurement (float): Sensor reading
+
+        Returns:
+            float: Position estimate
+        """
+        if self.position is None:
+            self.position, self.velocity, self.time = measurement, 0.0, time
+            self.covariance = (self.measurementNoise, 0.0, self.initialVelocityVariance)
+            return self.position
+
+        dt = max(0.0, time - self.time)
+        self.time = time
+
+        # Predict
+        pp, pv, vv = self.covariance
+        q = self.processNoise
+        position = self.position + self.velocity * dt
+        pp = pp + 2 * dt * pv + dt * dt * vv + q * dt ** 3 / 3
+        pv = pv + dt * vv + q * dt ** 2 / 2
+        vv = vv + q * dt
+
+        # Update
+        innovation = measurement - position
+        innovationVariance = pp + self.measurementNoise
+        positionGain = pp / innovationVariance
+        velocityGain = pv / innovationVariance
+        self.position = position + positionGain * innovation
+        self.velocity = self.velocity + velocityGain * innovation
+        self.covariance = ((1 - positionGain) * pp, (1 - positionGain) * pv, vv - velocityGain * pv)
+        return self.position
@@ -1,22 +1,51 @@
+import asyncio
 import math
+import threading
 import time
 
 from constantsAndDefines import (
     UpDownPosition,
     EastWestPosition,
-    Constants,
-    ControllerID
+    Constants
 )
-from compensatePosition import CompensatePosition
+from actionBoard import actionBoard
+from actuator import Actuator
+from axisMove import AxisMove
+from asyncUtils import resolve, runSync
+from controllerProfile import controllerRegistry
+from moveMetrics import moveMetrics
+from motionVerifier import MotionStatus, MotionVerifier
 from pidController import PIDController
+from sampleListener import SampleListener
 from steadyState import SteadyState
+from stopPredictor import StopPredictor
+from sunTracking import AxisTracker
+from telemetryRecorder import SWITCH_UP, SWITCH_DOWN, SWITCH_EAST, SWITCH_WEST
+from transport import HassTransport
+from stateSnapshot import StateSnapshot
+
+SUN_ELEVATION_ENTITY_ID = "sensor.sun_elevation"
+SUN_AZIMUTH_ENTITY_ID = "sensor.sun_azimuth"
 
 def clamp(n, minn, maxn):
     return max(min(maxn, n), minn)
 
+def speedToBrightness(speed):
+    return clamp(int(speed*1.0 / 100 * 256), 0, 256)
+
 class SolarController:
-    def __init__(self, hass):
+    def __init__(self, hass, eventDriven=False, sampleTimeout=Constants.PIDController.SAMPLE_TIMEOUT, registry=None, ephemeris=None,
+                 predictStop=False, sensorFilter=None, metrics=None, telemetry=None, verifyMotion=True, transport=None):
         self.hass = hass
+        # Reads and writes the entities, e.g. MqttTransport, Home Assistant if None
+        self.transport = transport if transport is not None else HassTransport(hass)
+        self.ephemeris = ephemeris
+        self.eventDriven = eventDriven
+        self.sampleTimeout = sampleTimeout
+        self.registry = registry if registry is not None else controllerRegistry
+        self.metrics = metrics if metrics is not None else moveMetrics
+        self.telemetry = telemetry
+        self.profile = None
         self.controllerName = None
         self.controllerEntityIdBase = None
         self.statusEntityId = None
@@ -30,46 +59,98 @@ class SolarController:
         self.lightSpeedEastWestEntityId = None
         self.actionStateId = None
         self.upDownPosition = None
-
-        self.pidController = PIDController(Kp=1.0, Ki=0.0, Kd=0.0, setpoint=0)
-
+        self.actionMessage = ""
+        self.actionBoard = actionBoard
+        self.actionAxes = frozenset(("pitch", "roll")) # Axes the action messages are about
+        self.snapshot = None
+        self.actuator = Actuator(hass, self.transport)
+
+        self.pitchPidController = PIDController(Kp=Constants.PIDController.KP, Ki=Constants.PIDController.KI, Kd=Constants.PIDController.KD, setpoint=0)
+        self.rollPidController = PIDController(Kp=Constants.PIDController.KP, Ki=Constants.PIDController.KI, Kd=Constants.PIDController.KD, setpoint=0)
+        self.pitchTrackingPidController = PIDController(Kp=Constants.Tracking.KP, Ki=Constants.Tracking.KI, Kd=Constants.Tracking.KD, setpoint=0)
+        self.rollTrackingPidController = PIDController(Kp=Constants.Tracking.KP, Ki=Constants.Tracking.KI, Kd=Constants.Tracking.KD, setpoint=0)
+        self.motorModel = None
+        self.trackingStopped = False
+        # Move or tracking in progress as (loop, task), see preempt()
+        self.runningMove = None
+        self.preempted = False
+        self.cancelledByPreemption = False
+        self.preemptionLock = threading.Lock()
+        self.moveFinished = threading.Event()
+        self.moveFinished.set()
+
+        self.pitchMaximas = None
+        self.rollMaximas = None
         self.compensateUpDownPosition = None
+        self.speedCurve = None
         self.pitchSteadyState = SteadyState()
         self.rollSteadyState = SteadyState()
+        self.predictStop = predictStop
+        self.pitchStopPredictor = None
+        self.rollStopPredictor = None
+        # Factory of the per axis filters, e.g. KalmanFilter, None uses the raw readings
+        self.sensorFilter = sensorFilter
+        self.pitchFilter = None
+        self.rollFilter = None
+        self.pitchMotionVerifier = MotionVerifier() if verifyMotion else None
+        self.rollMotionVerifier = MotionVerifier() if verifyMotion else None
+        self.resetAxisEstimators()
+
+    def resetAxisEstimators(self):
+        """Resets the state learned and estimated about the axes of the controller."""
+        self.pitchStopPredictor = StopPredictor() if self.predictStop else None
+        self.rollStopPredictor = StopPredictor() if self.predictStop else None
+        self.pitchFilter = self.sensorFilter() if self.sensorFilter is not None else None
+        self.rollFilter = self.sensorFilter() if self.sensorFilter is not None else None
 
     def setSolarControllerEntityID(self, controllerName):
-        if controllerName == ControllerID.ONE_AXIS_ID or controllerName == ControllerID.TWO_AXIS_ID:
-            self.controllerName = controllerName
-            self.controllerEntityIdBase = Constants.DEVICE_NAME_PREFIX + controllerName
-            self.statusEntityId = "binary_sensor." + self.controllerEntityIdBase + "_status"
-            self.pitchEntityId = "sensor." + self.controllerEntityIdBase + "_mpu6050_pitch"
-            self.rollEntityId = "sensor." + self.controllerEntityIdBase + "_mpu6050_roll"
-            self.switchUpEntityId   = "switch." + self.controllerEntityIdBase + "_up"
-            self.switchDownEntityId = "switch." + self.controllerEntityIdBase + "_down"
-            self.switchEastEntityId   = "switch." + self.controllerEntityIdBase + "_east"
-            self.switchWestEntityId   = "switch." + self.controllerEntityIdBase + "_west"
-            self.lightSpeedUpDownEntityId = "light." + self.controllerEntityIdBase + "_speed_up_down"
-            self.lightSpeedEastWestEntityId = "light." + self.controllerEntityIdBase + "_speed_east_west"
-            self.actionStateId = "input_text." + self.controllerEntityIdBase + "_action_state"
-            self.pitchMaximas = Constants.Pitch(controllerName)
-
-            self.compensateUpDownPosition = CompensatePosition(self.pitchMaximas.MIN, self.pitchMaximas.MAX)
-
-            self.hass.log(f"Got:")
-            self.hass.log(f" - controllerName: {self.controllerName}")
-            self.hass.log(f" - pitch:")
-            self.hass.log(f"   - MAX     : {self.pitchMaximas.MAX}")
-            self.hass.log(f"   - MIN     : {self.pitchMaximas.MIN}")
-            self.hass.log(f"   - Current : {self.getPitch()}")
-            self.hass.log(f" - roll:")
-            self.hass.log(f"   - MAX     : {Constants.Roll.MAX}")
-            self.hass.log(f"   - MIN     : {Constants.Roll.MIN}")
-            self.hass.log(f"   - Current : {self.getRoll()}")
-        else:
+        """Applies the cached profile of a controller, the configuration is only logged when it was (re)built."""
+        profile, created = self.registry.get(controllerName)
+        if profile is None:
             self.hass.log(f"Solar controller {controllerName} is not valid")
+            return False
+
+        self.applyProfile(profile)
+        if created:
+            self.logConfiguration()
+        return True
+
+    def applyProfile(self, profile):
+        if self.controllerName is not None and self.controllerName != profile.controllerName:
+            self.resetAxisEstimators()
+        self.profile = profile
+        self.controllerName = profile.controllerName
+        self.controllerEntityIdBase = profile.controllerEntityIdBase
+        self.statusEntityId = profile.statusEntityId
+        self.pitchEntityId = profile.pitchEntityId
+        self.rollEntityId = profile.rollEntityId
+        self.switchUpEntityId = profile.switchUpEntityId
+        self.switchDownEntityId = profile.switchDownEntityId
+        self.switchEastEntityId = profile.switchEastEntityId
+        self.switchWestEntityId = profile.switchWestEntityId
+        self.lightSpeedUpDownEntityId = profile.lightSpeedUpDownEntityId
+        self.lightSpeedEastWestEntityId = profile.lightSpeedEastWestEntityId
+        self.actionStateId = profile.actionStateId
+        self.pitchMaximas = profile.pitchMaximas
+        self.rollMaximas = profile.rollMaximas
+        self.compensateUpDownPosition = profile.compensateUpDownPosition
+        self.speedCurve = profile.speedCurve
+        self.motorModel = profile.motorModel
+        for pidController in (self.pitchPidController, self.rollPidController):
+            pidController.Kp, pidController.Ki, pidController.Kd = profile.pidGains
+
+    def logConfiguration(self):
+        self.hass.log(f"Got:")
+        self.hass.log(f" - controllerName: {self.controllerName}")
+        self.hass.log(f" - pitch:")
+        self.hass.log(f"   - MAX     : {self.pitchMaximas.MAX}")
+        self.hass.log(f"   - MIN     : {self.pitchMaximas.MIN}")
+        self.hass.log(f" - roll:")
+        self.hass.log(f"   - MAX     : {self.rollMaximas.MAX}")
+        self.hass.log(f"   - MIN     : {self.rollMaximas.MIN}")
 
     def is1AxisSolarControl(self):
-        return self.controllerName == ControllerID.ONE_AXIS_ID
+        return self.profile is not None and self.profile.isOneAxis
 
     def isSolarControllerConnected(self):
         if self.getStatus() == 'on':
@@ -79,26 +160,111 @@ class SolarController:
 
     def getQuantity(self, entityId):
         if entityId is not None:
-            entityId = self.hass.get_state(entityId)
+            self.metrics.count("get_state")
+            entityId = self.transport.get_state(entityId)
             return entityId
         return None
 
+    async def readSnapshotAsync(self, axis=None):
+        """
+        Reads every entity needed by one control tick at once, concurrently.
+
+        Until the next call all getters, and thereby all is*/get*Difference
+        predicates, are evaluated against this consistent reading.
+
+        Parameters:
+            axis (str): Either 'pitch', 'roll' or None for both axes
+        """
+        self.snapshot = None
+        entityIds = self.getSnapshotEntityIdList(axis)
+        await self.transport.primeAsync([self.statusEntityId] + entityIds)
+        status = await resolve(self.getQuantity(self.statusEntityId))
+        states = {}
+        if status == 'on':
+            values = await asyncio.gather(*(resolve(self.getQuantity(entityId)) for entityId in entityIds))
+            states = dict(zip(entityIds, values))
+
+        self.snapshot = self.createSnapshot(axis, status, states)
+        return self.snapshot
+
+    def createSnapshot(self, axis, status, states):
+        if status != 'on':
+            return StateSnapshot(status=status)
+
+        quantities, switchEntityIds = self.getSnapshotEntityIds(axis)
+        values = {name: float(states[entityId]) for name, entityId in quantities.items()}
+        for name, sensorFilter in (("pitch", self.pitchFilter), ("roll", self.rollFilter)):
+            if sensorFilter is not None and name in values:
+                values[name] = sensorFilter.update(self.getTime(), values[name])
+        if self.ephemeris is not None:
+            values["sunElevation"], values["sunAzimuth"] = self.ephemeris.getPosition()
+        switchStates = tuple((entityId, states[entityId]) for entityId in switchEntityIds)
+        return StateSnapshot(status=status, switchStates=switchStates, **values)
+
+    def getSnapshotEntityIdList(self, axis=None):
+        quantities, switchEntityIds = self.getSnapshotEntityIds(axis)
+        return list(quantities.values()) + switchEntityIds
+
+    def getSnapshotEntityIds(self, axis=None):
+        """The sun sensors are only read if there is no local ephemeris."""
+        quantities = {}
+        switchEntityIds = []
+        if self.ephemeris is None:
+            quantities["sunAzimuth"] = SUN_AZIMUTH_ENTITY_ID
+        if axis is None or axis == "pitch":
+            quantities["pitch"] = self.pitchEntityId
+            if self.ephemeris is None:
+                quantities["sunElevation"] = SUN_ELEVATION_ENTITY_ID
+            switchEntityIds += [self.switchUpEntityId, self.switchDownEntityId]
+        if axis is None or axis == "roll":
+            quantities["roll"] = self.rollEntityId
+            switchEntityIds += [self.switchEastEntityId, self.switchWestEntityId]
+        return quantities, switchEntityIds
+
+    def getSnapshotValue(self, name):
+        if self.snapshot is not None:
+            return getattr(self.snapshot, name)
+        return None
+
     def getStatus(self):
-        return self.getQuantity(self.statusEntityId)
+        status = self.getSnapshotValue("status")
+        if status is None:
+            status = self.getQuantity(self.statusEntityId)
+        return status
 
     def getPitch(self):
-        pitch = float(self.getQuantity(self.pitchEntityId))
+        pitch = self.getSnapshotValue("pitch")
+        if pitch is None:
+            pitch = float(self.getQuantity(self.pitchEntityId))
         return pitch
 
     def getRoll(self):
-        roll = float(self.getQuantity(self.rollEntityId))
+        roll = self.getSnapshotValue("roll")
+        if roll is None:
+            roll = float(self.getQuantity(self.rollEntityId))
         return roll
 
     def getSunElevation(self):
-        return self.getQuantity("sensor.sun_elevation")
+        sunElevation = self.getSnapshotValue("sunElevation")
+        if sunElevation is None and self.ephemeris is not None:
+            sunElevation = self.ephemeris.getElevation()
+        if sunElevation is None:
+            sunElevation = self.getQuantity(SUN_ELEVATION_ENTITY_ID)
+        return sunElevation
 
     def getSunAzimuth(self):
-        return self.getQuantity("sensor.sun_azimuth")
+        sunAzimuth = self.getSnapshotValue("sunAzimuth")
+        if sunAzimuth is None and self.ephemeris is not None:
+            sunAzimuth = self.ephemeris.getAzimuth()
+        if sunAzimuth is None:
+            sunAzimuth = self.getQuantity(SUN_AZIMUTH_ENTITY_ID)
+        return sunAzimuth
+
+    def getSwitchState(self, entityId):
+        """Returns the switch state of the current snapshot, None without a snapshot."""
+        if self.snapshot is not None:
+            return self.snapshot.switchState(entityId)
+        return None
 
     def isBeforeNoon(self):
         return float(self.getSunAzimuth()) < 180
@@ -136,55 +302,82 @@ class SolarController:
     def isWestMovementAllowed(self, eastWestPosition):
         return True
 
+    def queueSwitchOn(self, entityId):
+        self.actuator.switchOn(entityId, self.getSwitchState(entityId))
+
+    def queueSwitchOff(self, entityId):
+        self.actuator.switchOff(entityId, self.getSwitchState(entityId))
+
+    def queueSpeed(self, entityId, speed, force=False):
+        self.actuator.setBrightness(entityId, speedToBrightness(speed), force)
+
+    def queueAction(self, msg):
+        """Posts the message of the axes of the move, the action text of the tracker shows those of the other axes too."""
+        if self.actionStateId is None:
+            return
+        text = self.actionBoard.post(self.actionStateId, self.actionAxes, msg)
+        if text is not None:
+            # The controller of another axis may have sent another text since
+            self.actuator.invalidate(self.actionStateId)
+            self.actuator.setText(self.actionStateId, text)
+
+    def beginActions(self, moves):
+        self.actionAxes = frozenset(move.axis for move in moves)
+        self.actionBoard.forget(self.actionStateId)
+
+    def switchOn(self, entityId):
+        self.queueSwitchOn(entityId)
+        self.actuator.flush()
+
+    def switchOff(self, entityId):
+        self.queueSwitchOff(entityId)
+        self.actuator.flush()
+
+    async def switchOnAsync(self, entityId):
+        self.queueSwitchOn(entityId)
+        await self.actuator.flushAsync()
+
+    async def switchOffAsync(self, entityId):
+        self.queueSwitchOff(entityId)
+        await self.actuator.flushAsync()
+
     def switchOnUp(self):
-        if self.hass.get_state(self.switchUpEntityId) == "off":
-            self.hass.log(f"Switch on {self.switchUpEntityId}")
-            self.hass.call_service("switch/turn_on", entity_id=self.switchUpEntityId)
+        self.switchOn(self.switchUpEntityId)
 
     def switchOnDown(self):
-        if self.hass.get_state(self.switchDownEntityId) == "off":
-            self.hass.log(f"Switch on {self.switchDownEntityId}")
-            self.hass.call_service("switch/turn_on", entity_id=self.switchDownEntityId)
+        self.switchOn(self.switchDownEntityId)
 
     def switchOffUp(self):
-        if self.hass.get_state(self.switchUpEntityId) == "on":
-            self.hass.log(f"Switch off {self.switchUpEntityId}")
-            self.hass.call_service("switch/turn_off", entity_id=self.switchUpEntityId)
+        self.switchOff(self.switchUpEntityId)
 
     def switchOffDown(self):
-        if self.hass.get_state(self.switchDownEntityId) == "on":
-            self.hass.log(f"Switch off {self.switchDownEntityId}")
-            self.hass.call_service("switch/turn_off", entity_id=self.switchDownEntityId)
+        self.switchOff(self.switchDownEntityId)
 
     def switchOnEast(self):
-        if self.hass.get_state(self.switchEastEntityId) == "off":
-            self.hass.log(f"Switch on {self.switchEastEntityId}")
-            self.hass.call_service("switch/turn_on", entity_id=self.switchEastEntityId)
+        self.switchOn(self.switchEastEntityId)
 
     def switchOnWest(self):
-        if self.hass.get_state(self.switchWestEntityId) == "off":
-            self.hass.log(f"Switch on {self.switchWestEntityId}")
-            self.hass.call_service("switch/turn_on", entity_id=self.switchWestEntityId)
+        self.switchOn(self.switchWestEntityId)
 
     def switchOffEast(self):
-        if self.hass.get_state(self.switchEastEntityId) == "on":
-            self.hass.log(f"Switch off {self.switchEastEntityId}")
-            self.hass.call_service("switch/turn_off", entity_id=self.switchEastEntityId)
+        self.switchOff(self.switchEastEntityId)
 
     def switchOffWest(self):
-        if self.hass.get_state(self.switchWestEntityId) == "on":
-            self.hass.log(f"Switch off {self.switchWestEntityId}")
-            self.hass.call_service("switch/turn_off", entity_id=self.switchWestEntityId)
+        self.switchOff(self.switchWestEntityId)
+
+    def setSpeed(self, entityId, speed):
+        self.queueSpeed(entityId, speed)
+        self.actuator.flush()
+
+    async def setSpeedAsync(self, entityId, speed):
+        self.queueSpeed(entityId, speed)
+        await self.actuator.flushAsync()
 
     def setUpDownSpeed(self, speed):
-        speed = clamp(int(speed*1.0 / 100 * 256), 0, 256)
-        self.hass.log(f"Set speed of {self.lightSpeedUpDownEntityId} with {speed}")
-        self.hass.call_service("light/turn_on", entity_id=self.lightSpeedUpDownEntityId, brightness=speed)
+        self.setSpeed(self.lightSpeedUpDownEntityId, speed)
 
     def setEastWestSpeed(self, speed):
-        speed = clamp(int(speed*1.0 / 100 * 256), 0, 256)
-        self.hass.log(f"Set speed of {self.lightSpeedEastWestEntityId} with {speed}")
-        self.hass.call_service("light/turn_on", entity_id=self.lightSpeedEastWestEntityId, brightness=speed)
+        self.setSpeed(self.lightSpeedEastWestEntityId, speed)
 
     def isPositionTooLow(self):
         if self.is1AxisSolarControl():
@@ -217,12 +410,33 @@ class SolarController:
             return self.getPitch() > self.pitchMaximas.MAX
 
     def isPositionMaxEast(self):
-        return self.getRoll() > Constants.Roll.MAX
+        return self.getRoll() > self.rollMaximas.MAX
 
     def isPositionMaxWest(self):
-        return self.getRoll() < Constants.Roll.MIN
-
-    def getPitchDifference(self):
+        return self.getRoll() < self.rollMaximas.MIN
+
+    def getRoomToLimit(self, direction):
+        """Returns the degrees the axis can still move in direction before it reaches its limit."""
+        if direction in ("east", "west"):
+            roll = self.getRoll()
+            return self.rollMaximas.MAX - roll if direction == "east" else roll - self.rollMaximas.MIN
+        pitch = self.getPitch()
+        # Up increases the pitch of one axis controllers and decreases it on two axis controllers
+        if (direction == "up") == self.is1AxisSolarControl():
+            return self.pitchMaximas.MAX - pitch
+        return pitch - self.pitchMaximas.MIN
+
+    def isPositionMax(self, direction):
+        if direction == "up":
+            return self.isPositionMaxUp()
+        if direction == "down":
+            return self.isPositionMaxDown()
+        if direction == "east":
+            return self.isPositionMaxEast()
+        return self.isPositionMaxWest()
+
+    def getWantedPitch(self):
+        """Returns the target of the pitch as elevation, the pitch sensor reads 90 - elevation."""
         if UpDownPosition.MinimizeDifference == self.upDownPosition:
             wantedPosition = float(self.getSunElevation())
         elif UpDownPosition.Protect == self.upDownPosition:
@@ -232,20 +446,26 @@ class SolarController:
             else:
                 wantedPosition = self.pitchMaximas.MAX
                 wantedPosition = clamp(wantedPosition, self.pitchMaximas.MIN, self.pitchMaximas.MAX)
+        return wantedPosition
 
+    def getPitchDifference(self):
+        wantedPosition = self.getWantedPitch()
         pitch = 90 - self.getPitch()
         difference = wantedPosition - pitch
         #self.hass.log("Diff=wantedPosition-Pitch: {:.2f}={:.2f}-{:.2f}".format(difference, wantedPosition, pitch))
 
         return difference
 
-    def getRollDifference(self, eastWestPosition):
+    def getWantedRoll(self, eastWestPosition):
         if EastWestPosition.MinimizeDifference == eastWestPosition:
             wantedPosition = - (float(self.getSunAzimuth()) - 180)
         elif EastWestPosition.Protect == eastWestPosition:
             wantedPosition = 0
 
-        wantedPosition = clamp(wantedPosition, Constants.Roll.MIN, Constants.Roll.MAX)
+        return clamp(wantedPosition, self.rollMaximas.MIN, self.rollMaximas.MAX)
+
+    def getRollDifference(self, eastWestPosition):
+        wantedPosition = self.getWantedRoll(eastWestPosition)
         roll = self.getRoll()
         difference = wantedPosition - roll
         #self.hass.log("Diff=wantedPosition-Roll: {:.2f}={:.2f}-{:.2f}".format(difference, wantedPosition, roll))
@@ -281,185 +501,736 @@ class SolarController:
         else:
             raise ValueError(f"Unknown axis: {axis}")
 
-        if timeout != 0:
+        if timeout > 0:
             self.hass.log(f"{controller_name} {axis} is justified diff={diff:.2f}")
         else:
             self.hass.log(f"{controller_name} timeout diff={diff:.2f}")
 
     def printAction(self, msg):
-        self.hass.call_service("input_text/set_value", entity_id=self.actionStateId, value=msg)
+        self.queueAction(msg)
+        self.actuator.flush()
+
+    async def printActionAsync(self, msg):
+        self.queueAction(msg)
+        await self.actuator.flushAsync()
+
+    async def listenForSamplesAsync(self, *entityIds):
+        """Subscribes to new sensor samples if the controller is event driven."""
+        if not self.eventDriven:
+            return None
+        listener = SampleListener(self.transport, *entityIds)
+        await listener.startAsync()
+        return listener
+
+    async def waitForNextTickAsync(self, listener):
+        """
+        Waits until the next control tick is due.
 
-    def moveUpDown(self, controllerName, upDownPosition):
+        Polling controllers sleep for one update period, event driven ones wake
+        up as soon as a new sample arrives or after sampleTimeout seconds.
 
+        Returns:
+            float: Elapsed time in seconds.
+        """
+        if listener is None:
+            await asyncio.sleep(Constants.PIDController.UPDATE_PERIOD)
+            return Constants.PIDController.UPDATE_PERIOD
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await listener.waitAsync(self.sampleTimeout)
+        return loop.time() - start
+
+    def addActionMessage(self, message):
+        self.hass.log(message)
+        self.actionMessage = self.actionMessage + message
+        self.queueAction(self.actionMessage)
+
+    def addDirectionMessage(self, move, message):
+        self.hass.log(message)
+        if move.printedDirection == False:
+            self.actionMessage = self.actionMessage + message
+            self.queueAction(self.actionMessage)
+            move.printedDirection = True
+
+    def getTime(self):
+        """Time of the running event loop, monotonic time outside of it."""
         try:
-            self.setSolarControllerEntityID(controllerName)
-            self.upDownPosition = upDownPosition
-            self.pitchSteadyState.reset()
+            return asyncio.get_running_loop().time()
+        except RuntimeError:
+            return time.monotonic()
+
+    def sampleStopPredictor(self, move, predictor, position):
+        if predictor is None:
+            return
+        now = self.getTime()
+        if move.ticks == 0:
+            predictor.start(now, position)
+        else:
+            predictor.addSample(now, position, move.direction, move.speed)
 
-            actionMessage = ""
-            message = ""
-            printedDirection = False
+    def isStopPredicted(self, move, predictor, direction, difference):
+        """Returns True if the axis, still moving in direction, comes to rest within the dead band when switched off now."""
+        if predictor is None or move.direction != direction:
+            return False
+        return math.fabs(difference) - predictor.predictTravel(direction, move.speed) <= 1
 
-            if self.isSolarControllerConnected():
-                timeout = Constants.TIMEOUT
+    def getDirectionSwitchEntityId(self, direction):
+        return {"up": self.switchUpEntityId, "down": self.switchDownEntityId,
+                "east": self.switchEastEntityId, "west": self.switchWestEntityId}.get(direction)
 
-                while self.isPitchDifferenceTooHigh() and timeout > 0:
-                    currentPitchDifference = self.getPitchDifference()
+    def isMotionFault(self, move, verifier, difference):
+        """Returns True once the verifier confirmed a fault of the moving axis, the fault ends the move."""
+        if verifier is None:
+            return False
+        direction = move.direction if move.speed > 0 else None
+        switchState = self.getSwitchState(self.getDirectionSwitchEntityId(direction))
+        expectedRate = self.motorModel.getRate(direction, move.speed) if direction is not None else 0.0
+        status = verifier.update(self.getTime(), difference, direction, switchState, expectedRate)
+        if status == MotionStatus.Ok:
+            return False
+        move.status = status
+        move.endReason = status.name.lower()
+        self.addActionMessage(f"{'U/D' if move.axis == 'pitch' else 'E/W'} motor {move.endReason} moving {direction}. ")
+        return True
 
-                    if (self.pitchSteadyState.addValue(currentPitchDifference)):
-                        message = "U/D Position is steady. "
-                        self.hass.log(message)
-                        actionMessage = actionMessage + message
-                        self.printAction(actionMessage)
-                        break
+    def planApproach(self, move, difference, speed):
+        """
+        Plans the open loop approach of an axis far away from its target.
 
-                    control = self.pidController.update(measurement=currentPitchDifference, dt=Constants.PIDController.UPDATE_PERIOD)
-                    speed = Constants.Speed.MAX
-                    if (abs(control) < Constants.PIDController.THRESHOLD):
-                        speed = abs(control/Constants.PIDController.THRESHOLD) * Constants.Speed.DIFFERENCE_MAX_WITHIN_THRESHOLD * self.compensateUpDownPosition.compensate(self.getPitch()) + Constants.Speed.MIN
-
-                    if self.isPositionTooLow() and self.isUpMovementAllowed():
-                        if (self.isPositionMaxUp()):
-                            message = "Position is up at maximum. "
-                            self.hass.log(message)
-                            actionMessage = actionMessage + message
-                            self.printAction(actionMessage)
-                            break
-                        self.switchOnUp()
-                        message = "Moving up ... "
-                        self.hass.log(message)
-                        if printedDirection == False:
-                            actionMessage = actionMessage + message
-                            self.printAction(actionMessage)
-                            printedDirection = True
-                    elif self.isPositionTooHigh() and not self.isPositionMaxDown() and self.isDownMovementAllowed():
-                        if (self.isPositionMaxDown()):
-                            message = "Position is down at maximum. "
-                            self.hass.log(message)
-                            actionMessage = actionMessage + message
-                            self.printAction(actionMessage)
-                            break
-                        self.switchOnDown()
-                        message = "Moving down ... "
-                        self.hass.log(message)
-                        if printedDirection == False:
-                            actionMessage = actionMessage + message
-                            self.printAction(actionMessage)
-                            printedDirection = True
-                        speed = speed * Constants.Speed.DOWN_FACTOR
-                    else:
-                        message = "U/D Position settled. "
-                        self.hass.log(message)
-                        actionMessage = actionMessage + message
-                        self.printAction(actionMessage)
-                        break
+        With a calibrated motor the axis runs at full speed for the time the
+        MotorModel says it needs to get within CLOSED_LOOP_DISTANCE degrees
+        of the target, or of the limit of the axis if that comes first. The
+        PID takes over from there, or earlier, see continueApproach().
 
-                    self.hass.log(f"Speed {speed}")
-                    self.setUpDownSpeed(speed)
+        Returns:
+            float: Speed of the axis
+        """
+        if not self.motorModel.isCalibrated(move.direction):
+            return speed
+        distance = min(math.fabs(difference), self.getRoomToLimit(move.direction)) - Constants.Approach.CLOSED_LOOP_DISTANCE
+        rate = self.motorModel.getRate(move.direction, self.speedCurve.MAX)
+        if distance <= 0 or rate <= 0:
+            return speed
+        duration = min(distance / rate, Constants.TIMEOUT / 2)
+        if duration < Constants.Approach.MINIMUM_DURATION:
+            return speed
+        move.approachUntil = self.getTime() + duration
+        self.addActionMessage(f"Approaching for {duration:.0f}s ... ")
+        return self.speedCurve.MAX
+
+    def isApproaching(self, move):
+        """Returns True while the open loop approach of the axis runs."""
+        if move.approachUntil is None:
+            return False
+        if self.getTime() < move.approachUntil:
+            return True
+        move.approachUntil = None
+        return False
 
-                    time.sleep(Constants.PIDController.UPDATE_PERIOD)
-                    timeout = timeout - 1
+    def continueApproach(self, move):
+        """
+        Returns True while the open loop approach of the axis runs. The limits
+        are checked every tick: the approach hands over to the closed loop
+        once the axis is within CLOSED_LOOP_DISTANCE degrees of its limit.
+        """
+        if not self.isApproaching(move):
+            return False
+        if self.getRoomToLimit(move.direction) > Constants.Approach.CLOSED_LOOP_DISTANCE:
+            return True
+        move.approachUntil = None
+        self.addActionMessage("Approach stopped before the limit. ")
+        return False
 
-                self.setUpDownSpeed(0)
+    def getApproachEnd(self, moves):
+        """Returns the time the first approach of the moves ends if all of them approach, None otherwise."""
+        if not all(self.isApproaching(move) for move in moves):
+            return None
+        return min(move.approachUntil for move in moves)
 
-                self.logDifference(controllerName, timeout, "pitch")
-                message = "DONE"
-                actionMessage = actionMessage + message
-                self.printAction(actionMessage)
+    async def waitForApproachAsync(self, listener, approachEnd):
+        """
+        Sleeps until an approach ends, samples arriving meanwhile are dropped.
 
-            else:
-                self.hass.log(f"Solar controller {controllerName} is {self.getStatus()}")
+        Returns:
+            float: Elapsed time in seconds.
+        """
+        dt = max(0.0, approachEnd - self.getTime())
+        await asyncio.sleep(dt)
+        if listener is not None:
+            listener.clear()
+        return dt
 
-        except ValueError as ve:
-            print("ValueError:", ve)
-        except:
-            print("Unknown error occurred")
+    def stepUpDown(self, move, dt):
+        """
+        Runs one control tick of the up/down axis against the current snapshot.
 
-    def moveEastWest(self, controllerName, eastWestPosition):
+        Returns:
+            bool: False once the axis has finished its move.
+        """
+        currentPitchDifference = self.getPitchDifference()
+        self.sampleStopPredictor(move, self.pitchStopPredictor, self.getPitch())
+        move.ticks += 1
 
-        try:
-            if controllerName == ControllerID.ONE_AXIS_ID:
-                self.hass.log(f"Solar controller {controllerName} East/West movement isn't available")
+        if self.isMotionFault(move, self.pitchMotionVerifier, currentPitchDifference):
+            return False
+
+        if (self.pitchSteadyState.addValue(currentPitchDifference)):
+            self.addActionMessage("U/D Position is steady. ")
+            move.endReason = "steady"
+            return False
+
+        start = self.metrics.now()
+        control = self.pitchPidController.update(measurement=currentPitchDifference, dt=dt)
+        self.metrics.recordNested("pid", start)
+        move.control = control
+        speed = self.speedCurve.getSpeed(control, self.compensateUpDownPosition.compensate(self.getPitch()))
+
+        if self.isPositionTooLow() and self.isUpMovementAllowed():
+            if (self.isPositionMaxUp()):
+                self.addActionMessage("Position is up at maximum. ")
+                move.endReason = "max position"
+                return False
+            if self.isStopPredicted(move, self.pitchStopPredictor, "up", currentPitchDifference):
+                self.addActionMessage("U/D Position predicted. ")
+                move.endReason = "predicted"
+                return False
+            self.queueSwitchOn(self.switchUpEntityId)
+            self.addDirectionMessage(move, "Moving up ... ")
+            move.direction = "up"
+        elif self.isPositionTooHigh() and self.isDownMovementAllowed():
+            if (self.isPositionMaxDown()):
+                self.addActionMessage("Position is down at maximum. ")
+                move.endReason = "max position"
+                return False
+            if self.isStopPredicted(move, self.pitchStopPredictor, "down", currentPitchDifference):
+                self.addActionMessage("U/D Position predicted. ")
+                move.endReason = "predicted"
+                return False
+            self.queueSwitchOn(self.switchDownEntityId)
+            self.addDirectionMessage(move, "Moving down ... ")
+            move.direction = "down"
+            speed = speed * Constants.Speed.DOWN_FACTOR
+        else:
+            self.addActionMessage("U/D Position settled. ")
+            move.endReason = "movement not allowed"
+            return False
+
+        if move.ticks == 1:
+            speed = self.planApproach(move, currentPitchDifference, speed)
+        self.queueSpeed(self.lightSpeedUpDownEntityId, speed)
+        move.speed = speed
+        return True
+
+    def stepEastWest(self, move, eastWestPosition, dt):
+        """
+        Runs one control tick of the east/west axis against the current snapshot.
+
+        Returns:
+            bool: False once the axis has finished its move.
+        """
+        currentRollDifference = self.getRollDifference(eastWestPosition)
+        self.sampleStopPredictor(move, self.rollStopPredictor, self.getRoll())
+        move.ticks += 1
+
+        if self.isMotionFault(move, self.rollMotionVerifier, currentRollDifference):
+            return False
+
+        if (self.rollSteadyState.addValue(currentRollDifference)):
+            self.addActionMessage("E/W Position is steady. ")
+            move.endReason = "steady"
+            return False
+
+        start = self.metrics.now()
+        control = self.rollPidController.update(measurement=currentRollDifference, dt=dt)
+        self.metrics.recordNested("pid", start)
+        move.control = control
+        speed = self.speedCurve.getSpeed(control)
+
+        if self.isPositionTooEast(eastWestPosition) and self.isWestMovementAllowed(eastWestPosition):
+            if self.isPositionMaxWest():
+                self.addActionMessage("Position is West at maximum. ")
+                move.endReason = "max position"
+                return False
+            if self.isStopPredicted(move, self.rollStopPredictor, "west", currentRollDifference):
+                self.addActionMessage("E/W Position predicted. ")
+                move.endReason = "predicted"
+                return False
+            self.queueSwitchOn(self.switchWestEntityId)
+            self.addDirectionMessage(move, "Moving west ... ")
+            move.direction = "west"
+            speed = speed * Constants.Speed.WEST_FACTOR
+        elif self.isPositionTooWest(eastWestPosition) and self.isEastMovementAllowed(eastWestPosition):
+            if self.isPositionMaxEast():
+                self.addActionMessage("Position is East at maximum. ")
+                move.endReason = "max position"
+                return False
+            if self.isStopPredicted(move, self.rollStopPredictor, "east", currentRollDifference):
+                self.addActionMessage("E/W Position predicted. ")
+                move.endReason = "predicted"
+                return False
+            self.queueSwitchOn(self.switchEastEntityId)
+            self.addDirectionMessage(move, "Moving east ... ")
+            move.direction = "east"
+        else:
+            self.addActionMessage("E/W Position settled. ")
+            move.endReason = "movement not allowed"
+            return False
+
+        if move.ticks == 1:
+            speed = self.planApproach(move, currentRollDifference, speed)
+        self.queueSpeed(self.lightSpeedEastWestEntityId, speed)
+        move.speed = speed
+        return True
+
+    def startUpDown(self, upDownPosition):
+        self.upDownPosition = upDownPosition
+        self.pitchSteadyState.reset()
+        self.pitchPidController.reset()
+        if self.pitchMotionVerifier is not None:
+            self.pitchMotionVerifier.reset()
+        if self.pitchFilter is not None:
+            self.pitchFilter.reset()
+        return AxisMove("pitch")
+
+    def startEastWest(self):
+        self.rollSteadyState.reset()
+        self.rollPidController.reset()
+        if self.rollMotionVerifier is not None:
+            self.rollMotionVerifier.reset()
+        if self.rollFilter is not None:
+            self.rollFilter.reset()
+        return AxisMove("roll")
+
+    def recordTelemetry(self, move, difference):
+        """Records the tick of an axis, the control and speed are the ones of this tick."""
+        pitch = self.getSnapshotValue("pitch")
+        roll = self.getSnapshotValue("roll")
+        if move.axis == "pitch":
+            target = pitch - difference if pitch is not None else None
+        else:
+            target = roll + difference if roll is not None else None
+        switches = 0
+        for entityId, bit in ((self.switchUpEntityId, SWITCH_UP), (self.switchDownEntityId, SWITCH_DOWN),
+                              (self.switchEastEntityId, SWITCH_EAST), (self.switchWestEntityId, SWITCH_WEST)):
+            if self.getSwitchState(entityId) == "on":
+                switches |= bit
+        self.telemetry.record(self.controllerName, move.axis, pitch, roll, target, difference, move.control,
+                              move.speed if move.active else 0.0, switches)
+        move.control = None
+
+    def endMove(self, move, timeout):
+        if move.endReason is None:
+            move.endReason = "timeout" if timeout <= 0 else "settled"
+        self.metrics.end(move.axis, move.endReason)
+
+    def finishUpDown(self, move, timeout):
+        move.active = False
+        self.endMove(move, timeout)
+        self.queueSpeed(self.lightSpeedUpDownEntityId, 0, force=True)
+        if self.pitchStopPredictor is not None and move.direction is not None:
+            self.pitchStopPredictor.stop(move.direction, self.getPitch(), move.speed)
+        if self.pitchFilter is not None:
+            self.pitchFilter.settle()
+        self.logDifference(self.controllerName, timeout, "pitch")
+
+    def finishEastWest(self, move, eastWestPosition, timeout):
+        move.active = False
+        self.endMove(move, timeout)
+        self.queueSpeed(self.lightSpeedEastWestEntityId, 0, force=True)
+        if self.rollStopPredictor is not None and move.direction is not None:
+            self.rollStopPredictor.stop(move.direction, self.getRoll(), move.speed)
+        if self.rollFilter is not None:
+            self.rollFilter.settle()
+        self.logDifference(self.controllerName, timeout, "roll", eastWestPosition)
+
+    def startTracking(self, axis):
+        """Returns the AxisTracker of an axis, its directions move the axis towards a positive and a negative difference."""
+        if axis == "pitch":
+            pidController = self.pitchTrackingPidController
+            sensorFilter = self.pitchFilter
+            stopPredictor = self.pitchStopPredictor
+            directions = ("down", "up") if self.is1AxisSolarControl() else ("up", "down")
+        else:
+            pidController = self.rollTrackingPidController
+            sensorFilter = self.rollFilter
+            stopPredictor = self.rollStopPredictor
+            directions = ("east", "west")
+        pidController.reset()
+        if sensorFilter is not None:
+            sensorFilter.reset()
+        if stopPredictor is not None:
+            # Tracking moves the axis, the travel after the last stop can't be learned from the next move
+            stopPredictor.discardStop()
+        return AxisTracker(pidController, self.motorModel, directions, self.speedCurve.MIN, self.speedCurve.MAX)
+
+    def stepTracking(self, move, tracker, target, difference, dt):
+        """Runs one tracking tick of an axis, the motor stops at the limits of the axis."""
+        move.ticks += 1
+        start = self.metrics.now()
+        direction, speed = tracker.update(self.getTime(), target, difference, dt)
+        self.metrics.recordNested("pid", start)
+        move.control = tracker.rate
+        if direction is not None and self.isPositionMax(direction):
+            direction, speed = None, 0.0
+        if direction is not None:
+            self.queueSwitchOn(self.getDirectionSwitchEntityId(direction))
+            move.direction = direction
+        self.queueSpeed(self.lightSpeedUpDownEntityId if move.axis == "pitch" else self.lightSpeedEastWestEntityId, speed)
+        move.speed = speed
+
+    def stopTracking(self):
+        """Ends trackSun/trackSunAsync after the current tick."""
+        self.trackingStopped = True
+
+    def preempt(self):
+        """
+        Ends the running move or tracking at once and refuses new ones until
+        clearPreemption() is called. Can be called from any thread, the
+        running move is cancelled on its own event loop and stops its motors.
+        """
+        with self.preemptionLock:
+            self.preempted = True
+            runningMove = self.runningMove
+        if runningMove is not None:
+            loop, task = runningMove
+            try:
+                loop.call_soon_threadsafe(self.cancelRunningMove, task)
+            except RuntimeError:
+                pass # Loop already closed, the move is over
+
+    def cancelRunningMove(self, task):
+        # Runs on the loop of the move, so the move can't end in between
+        with self.preemptionLock:
+            if self.runningMove is None or self.runningMove[1] is not task:
                 return
+            self.runningMove = None
+            self.cancelledByPreemption = True
+        task.cancel()
+
+    def clearPreemption(self):
+        with self.preemptionLock:
+            self.preempted = False
+
+    def isMoving(self):
+        """Returns True while a move or tracking runs, including the stop of a preempted one."""
+        return not self.moveFinished.is_set()
+
+    def beginMove(self):
+        """Registers the running task for preempt(), returns False if the controller is preempted."""
+        with self.preemptionLock:
+            if self.preempted:
+                return False
+            self.runningMove = (asyncio.get_running_loop(), asyncio.current_task())
+            self.cancelledByPreemption = False
+            self.moveFinished.clear()
+            return True
 
-            self.setSolarControllerEntityID(controllerName)
-            self.rollSteadyState.reset()
+    def endRunningMove(self):
+        """The move can't be cancelled anymore, its clean up can't be interrupted."""
+        with self.preemptionLock:
+            self.runningMove = None
 
-            actionMessage = ""
-            message = ""
-            printedDirection = False
+    async def abortMovesAsync(self, moves):
+        """
+        Stops the motors of cancelled moves, the active axes end as 'preempted'
+        or 'cancelled'.
 
-            if self.isSolarControllerConnected():
-                timeout = Constants.TIMEOUT
+        Returns:
+            bool: True if preempt() cancelled the move, the cancellation is
+                  then handled. Any other cancellation has to be re-raised.
+        """
+        self.endRunningMove()
+        with self.preemptionLock:
+            preempted, self.cancelledByPreemption = self.cancelledByPreemption, False
+        if preempted:
+            task = asyncio.current_task()
+            if hasattr(task, "uncancel"):
+                task.uncancel()
+        await self.stopAxesAsync(moves, "preempted" if preempted else "cancelled")
+        return preempted
+
+    async def stopAxesAsync(self, moves, endReason):
+        """Stops the motors of the axes of moves after the move was interrupted, the active axes end with endReason.
+
+        Only these axes are stopped: the other axis of the tracker may be
+        moved concurrently by another controller, e.g. by the FleetManager.
+        """
+        # Commands of an interrupted tick may or may not have been sent
+        self.actuator.reset()
+        for move in moves:
+            if move.active:
+                move.active = False
+                move.endReason = endReason
+                self.endMove(move, 0)
+        if self.profile is None:
+            return
+        axes = {move.axis for move in moves}
+        if "pitch" in axes:
+            self.queueSpeed(self.lightSpeedUpDownEntityId, 0, force=True)
+        if "roll" in axes and not self.is1AxisSolarControl():
+            self.queueSpeed(self.lightSpeedEastWestEntityId, 0, force=True)
+        self.actionMessage = self.actionMessage + endReason.upper()
+        self.queueAction(self.actionMessage)
+        await self.actuator.flushAsync()
+
+    async def failMovesAsync(self, moves, error):
+        """Logs an error of a move and stops the motors, the active axes end as 'error'."""
+        self.hass.log(f"Solar controller {self.controllerName} move failed: {error!r}", level="ERROR")
+        try:
+            await self.stopAxesAsync(moves, "error")
+        except Exception as stopError:
+            self.hass.log(f"Solar controller {self.controllerName} motors couldn't be stopped: {stopError!r}", level="ERROR")
 
-                while self.isRollDifferenceTooHigh(eastWestPosition) and timeout > 0:
-                    currentRollDifference = self.getRollDifference(eastWestPosition)
+    def trackSun(self, controllerName, duration=None):
+        return runSync(self.trackSunAsync(controllerName, duration), self.hass)
 
-                    if (self.rollSteadyState.addValue(currentRollDifference)):
-                        message = "E/W Position is steady. "
-                        self.hass.log(message)
-                        actionMessage = actionMessage + message
-                        self.printAction(actionMessage)
-                        break
+    async def trackSunAsync(self, controllerName, duration=None):
+        """
+        Follows the sun continuously instead of moving whenever the difference passed the dead band.
+
+        Every axis is driven by an AxisTracker: the rate of its target is fed
+        forward into the speed and the PID only corrects the residual
+        difference, so the axis moves along with the sun.
+
+        Parameters:
+            controllerName (str): Name of the controller
+            duration (float): Seconds to track, until stopTracking() is called if None
 
-                    control = self.pidController.update(measurement=currentRollDifference, dt=Constants.PIDController.UPDATE_PERIOD)
-                    speed = Constants.Speed.MAX
-                    if (abs(control) < Constants.PIDController.THRESHOLD):
-                       speed = abs(control/Constants.PIDController.THRESHOLD) * Constants.Speed.DIFFERENCE_MAX_WITHIN_THRESHOLD + Constants.Speed.MIN
-
-                    if self.isPositionTooEast(eastWestPosition) and self.isWestMovementAllowed(eastWestPosition):
-                        if self.isPositionMaxWest():
-                            message = "Position is West at maximum. "
-                            self.hass.log(message)
-                            actionMessage = actionMessage + message
-                            self.printAction(actionMessage)
-                            break
-                        self.switchOnWest()
-                        message = "Moving west ... "
-                        self.hass.log(message)
-                        if printedDirection == False:
-                            actionMessage = actionMessage + message
-                            self.printAction(actionMessage)
-                            printedDirection = True
-                        speed = speed * Constants.Speed.WEST_FACTOR
-                    elif self.isPositionTooWest(eastWestPosition) and self.isEastMovementAllowed(eastWestPosition):
-                        if self.isPositionMaxEast():
-                            message = "Position is East at maximum. "
-                            self.hass.log(message)
-                            actionMessage = actionMessage + message
-                            self.printAction(actionMessage)
-                            break
-                        self.switchOnEast()
-                        message = "Moving east ... "
-                        self.hass.log(message)
-                        if printedDirection == False:
-                            actionMessage = actionMessage + message
-                            self.printAction(actionMessage)
-                            printedDirection = True
+        Returns:
+            list: AxisMoveResult of every tracked axis, the end reason is
+                  'duration', 'stopped', 'preempted' or 'not connected'
+        """
+        listener = None
+        moves = []
+        running = False
+        metrics = self.metrics
+        moveStart = metrics.now()
+        sentCount = self.actuator.sentCount
+        self.trackingStopped = False
+        try:
+            if not self.setSolarControllerEntityID(controllerName):
+                return []
+
+            self.actuator.reset()
+            self.upDownPosition = UpDownPosition.MinimizeDifference
+            eastWestPosition = EastWestPosition.MinimizeDifference
+            moves = [AxisMove("pitch")] if self.is1AxisSolarControl() else [AxisMove("pitch"), AxisMove("roll")]
+            self.beginActions(moves)
+            running = self.beginMove()
+            if not running:
+                for move in moves:
+                    move.endReason = "preempted"
+                return [move.getResult() for move in moves]
+            trackers = {move.axis: self.startTracking(move.axis) for move in moves}
+            axis = "pitch" if len(moves) == 1 else None
+
+            start = tickStart = metrics.now()
+            await self.readSnapshotAsync(axis)
+            start = metrics.record("read", start)
+            if not self.isSolarControllerConnected():
+                self.hass.log(f"Solar controller {controllerName} is {self.getStatus()}")
+                for move in moves:
+                    move.endReason = "not connected"
+                return [move.getResult() for move in moves]
+
+            self.actionMessage = "Tracking ... "
+            self.queueAction(self.actionMessage)
+            listener = await self.listenForSamplesAsync(*(self.pitchEntityId if move.axis == "pitch" else self.rollEntityId for move in moves))
+            elapsed = 0.0
+            dt = Constants.PIDController.UPDATE_PERIOD
+            while True:
+                for move in moves:
+                    if move.axis == "pitch":
+                        difference = self.getPitchDifference()
+                        self.stepTracking(move, trackers["pitch"], self.getWantedPitch(), difference, dt)
                     else:
-                        message = "E/W Position settled. "
-                        self.hass.log(message)
-                        actionMessage = actionMessage + message
-                        self.printAction(actionMessage)
-                        break
+                        difference = self.getRollDifference(eastWestPosition)
+                        self.stepTracking(move, trackers["roll"], self.getWantedRoll(eastWestPosition), difference, dt)
+                    if self.telemetry is not None:
+                        self.recordTelemetry(move, difference)
+                start = metrics.record("decision", start)
+                metrics.count("ticks")
+                await self.actuator.flushAsync()
+                start = metrics.record("actuation", start)
+                metrics.record("tick", tickStart)
+                if self.trackingStopped or (duration is not None and elapsed >= duration):
+                    break
+
+                dt = await self.waitForNextTickAsync(listener)
+                start = tickStart = metrics.record("sleep", start)
+                elapsed += dt
+                await self.readSnapshotAsync(axis)
+                start = metrics.record("read", start)
+                if not self.isSolarControllerConnected():
+                    self.hass.log(f"Solar controller {controllerName} is {self.getStatus()}")
+                    for move in moves:
+                        move.endReason = "not connected"
+                    break
+
+            for move in moves:
+                move.active = False
+                if move.endReason is None:
+                    move.endReason = "stopped" if self.trackingStopped else "duration"
+                self.endMove(move, 0)
+                stopPredictor = self.pitchStopPredictor if move.axis == "pitch" else self.rollStopPredictor
+                if stopPredictor is not None:
+                    stopPredictor.discardStop()
+                self.queueSpeed(self.lightSpeedUpDownEntityId if move.axis == "pitch" else self.lightSpeedEastWestEntityId, 0, force=True)
+            self.queueAction(self.actionMessage + "DONE")
+            await self.actuator.flushAsync()
+
+        except asyncio.CancelledError:
+            if not await self.abortMovesAsync(moves):
+                raise
+        except Exception as error:
+            await self.failMovesAsync(moves, error)
+        finally:
+            if running:
+                self.endRunningMove()
+            self.snapshot = None
+            if listener is not None:
+                await listener.stopAsync()
+            metrics.count("moves")
+            metrics.count("call_service", self.actuator.sentCount - sentCount)
+            metrics.record("move", moveStart)
+            if running:
+                self.moveFinished.set()
+        return [move.getResult() for move in moves]
+
+    def moveUpDown(self, controllerName, upDownPosition):
+        return runSync(self.moveUpDownAsync(controllerName, upDownPosition), self.hass)
 
-                    self.hass.log(f"Speed {speed}")
-                    self.setEastWestSpeed(speed)
+    def moveEastWest(self, controllerName, eastWestPosition):
+        return runSync(self.moveEastWestAsync(controllerName, eastWestPosition), self.hass)
 
-                    time.sleep(Constants.PIDController.UPDATE_PERIOD)
-                    timeout = timeout - 1
+    def moveBoth(self, controllerName, upDownPosition, eastWestPosition):
+        return runSync(self.moveBothAsync(controllerName, upDownPosition, eastWestPosition), self.hass)
 
-                self.setEastWestSpeed(0)
+    def moveToSun(self, controllerName):
+        return runSync(self.moveToSunAsync(controllerName), self.hass)
 
-                self.logDifference(controllerName, timeout, "roll", eastWestPosition)
-                message = "DONE"
-                actionMessage = actionMessage + message
-                self.printAction(actionMessage)
+    async def moveUpDownAsync(self, controllerName, upDownPosition):
+        """Returns the AxisMoveResult of the pitch, None if the pitch wasn't moved."""
+        results = await self.moveBothAsync(controllerName, upDownPosition, None)
+        return results[0] if results else None
+
+    async def moveEastWestAsync(self, controllerName, eastWestPosition):
+        """Returns the AxisMoveResult of the roll, None if the roll wasn't moved."""
+        results = await self.moveBothAsync(controllerName, None, eastWestPosition)
+        return results[0] if results else None
+
+    async def moveToSunAsync(self, controllerName):
+        return await self.moveBothAsync(controllerName, UpDownPosition.MinimizeDifference, EastWestPosition.MinimizeDifference)
+
+    async def moveBothAsync(self, controllerName, upDownPosition, eastWestPosition):
+        """
+        Moves pitch and roll in one control loop.
+
+        Both motors are commanded in the same tick, each axis has its own PID
+        and steady state tracking and finishes on its own. preempt() ends the
+        move at once, the active axes then end as 'preempted'.
+
+        Parameters:
+            controllerName (str): Name of the controller
+            upDownPosition (UpDownPosition): Target of the pitch, None to keep the pitch
+            eastWestPosition (EastWestPosition): Target of the roll, None to keep the roll
+
+        Returns:
+            list: AxisMoveResult of every moved axis
+        """
+        listener = None
+        moves = []
+        running = False
+        metrics = self.metrics
+        moveStart = metrics.now()
+        sentCount = self.actuator.sentCount
+        try:
+            valid = self.setSolarControllerEntityID(controllerName)
+            if valid and self.is1AxisSolarControl() and eastWestPosition is not None:
+                if upDownPosition is None:
+                    self.hass.log(f"Solar controller {controllerName} East/West movement isn't available")
+                    return []
+                eastWestPosition = None
+
+            self.actuator.reset()
+            self.actionMessage = ""
+            pitchMove = self.startUpDown(upDownPosition) if upDownPosition is not None else None
+            rollMove = self.startEastWest() if eastWestPosition is not None else None
+            moves = [move for move in (pitchMove, rollMove) if move is not None]
+            self.beginActions(moves)
+            running = self.beginMove()
+            if not running:
+                for move in moves:
+                    move.endReason = "preempted"
+                return [move.getResult() for move in moves]
+            axis = moves[0].axis if len(moves) == 1 else None
+
+            start = tickStart = metrics.now()
+            await self.readSnapshotAsync(axis)
+            start = metrics.record("read", start)
+            if self.isSolarControllerConnected():
+                timeout = Constants.TIMEOUT
+                dt = Constants.PIDController.UPDATE_PERIOD
+                listener = await self.listenForSamplesAsync(*(self.pitchEntityId if move.axis == "pitch" else self.rollEntityId for move in moves))
+
+                while True:
+                    if pitchMove is not None and pitchMove.active and not self.continueApproach(pitchMove):
+                        if not (self.isPitchDifferenceTooHigh() and timeout > 0 and self.stepUpDown(pitchMove, dt)):
+                            self.finishUpDown(pitchMove, timeout)
+                        if self.telemetry is not None:
+                            self.recordTelemetry(pitchMove, self.getPitchDifference())
+                    if rollMove is not None and rollMove.active and not self.continueApproach(rollMove):
+                        if not (self.isRollDifferenceTooHigh(eastWestPosition) and timeout > 0 and self.stepEastWest(rollMove, eastWestPosition, dt)):
+                            self.finishEastWest(rollMove, eastWestPosition, timeout)
+                        if self.telemetry is not None:
+                            self.recordTelemetry(rollMove, self.getRollDifference(eastWestPosition))
+                    start = metrics.record("decision", start)
+                    metrics.count("ticks")
+
+                    activeMoves = [move for move in moves if move.active]
+                    if not activeMoves:
+                        break
+                    await self.actuator.flushAsync()
+                    start = metrics.record("actuation", start)
+                    metrics.record("tick", tickStart)
+
+                    # Approaches keep ticking to watch the limits, only an approach ending before the next tick is waited for
+                    approachEnd = self.getApproachEnd(activeMoves)
+                    if approachEnd is not None and approachEnd - self.getTime() < Constants.PIDController.UPDATE_PERIOD:
+                        dt = await self.waitForApproachAsync(listener, approachEnd)
+                    else:
+                        dt = await self.waitForNextTickAsync(listener)
+                    start = tickStart = metrics.record("sleep", start)
+                    timeout = timeout - dt / Constants.PIDController.UPDATE_PERIOD
+                    await self.readSnapshotAsync(activeMoves[0].axis if len(activeMoves) == 1 else None)
+                    start = metrics.record("read", start)
+
+                self.actionMessage = self.actionMessage + "DONE"
+                self.queueAction(self.actionMessage)
+                await self.actuator.flushAsync()
+                metrics.record("actuation", start)
+                metrics.record("tick", tickStart)
 
             else:
                 self.hass.log(f"Solar controller {controllerName} is {self.getStatus()}")
-
-        except ValueError as ve:
-            print("ValueError:", ve)
-        except:
-            print("Unknown error occurred")
\ No newline at end of file
+                for move in moves:
+                    move.endReason = "not connected"
+
+        except asyncio.CancelledError:
+            if not await self.abortMovesAsync(moves):
+                raise
+        except Exception as error:
+            await self.failMovesAsync(moves, error)
+        finally:
+            if running:
+                self.endRunningMove()
+            self.snapshot = None
+            if listener is not None:
+                await listener.stopAsync()
+            metrics.count("moves")
+            metrics.count("call_service", self.actuator.sentCount - sentCount)
+            metrics.record("move", moveStart)
+            if running:
+                self.moveFinished.set()
+        return [move.getResult() for move in moves]
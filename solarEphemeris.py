@@ -0,0 +1,131 @@
+import math
+from array import array
+from datetime import datetime, timezone
+from functools import lru_cache
+
+MINUTES_PER_DAY = 24 * 60
+
+@lru_cache(maxsize=16)
+def computeDayTable(day, latitude, longitude):
+    """
+    Computes the sun position for every minute of a UTC day with the NOAA
+    solar position algorithm, including atmospheric refraction.
+
+    Parameters:
+        day (date): UTC date
+        latitude (float): Latitude in degrees, north positive
+        longitude (float): Longitude in degrees, east positive
+
+    Returns:
+        tuple: (elevations, azimuths) in degrees, arrays of MINUTES_PER_DAY + 1
+               values, the last one being midnight of the next day.
+    """
+    elevations = array('d')
+    azimuths = array('d')
+
+    sinLatitude = math.sin(math.radians(latitude))
+    cosLatitude = math.cos(math.radians(latitude))
+    julianDayAtMidnight = day.toordinal() + 1721424.5
+
+    for minute in range(MINUTES_PER_DAY + 1):
+        T = (julianDayAtMidnight + minute / MINUTES_PER_DAY - 2451545.0) / 36525.0
+
+        meanLongitude = math.radians((280.46646 + T * (36000.76983 + T * 0.0003032)) % 360)
+        meanAnomaly = math.radians(357.52911 + T * (35999.05029 - 0.0001537 * T))
+        eccentricity = 0.016708634 - T * (0.000042037 + 0.0000001267 * T)
+        center = (math.sin(meanAnomaly) * (1.914602 - T * (0.004817 + 0.000014 * T))
+                  + math.sin(2 * meanAnomaly) * (0.019993 - 0.000101 * T)
+                  + math.sin(3 * meanAnomaly) * 0.000289)
+        omega = math.radians(125.04 - 1934.136 * T)
+        apparentLongitude = math.radians(math.degrees(meanLongitude) + center - 0.00569 - 0.00478 * math.sin(omega))
+        meanObliquity = 23 + (26 + (21.448 - T * (46.815 + T * (0.00059 - T * 0.001813))) / 60) / 60
+        obliquity = math.radians(meanObliquity + 0.00256 * math.cos(omega))
+        declination = math.asin(math.sin(obliquity) * math.sin(apparentLongitude))
+
+        y = math.tan(obliquity / 2) ** 2
+        equationOfTime = 4 * math.degrees(
+            y * math.sin(2 * meanLongitude)
+            - 2 * eccentricity * math.sin(meanAnomaly)
+            + 4 * eccentricity * y * math.sin(meanAnomaly) * math.cos(2 * meanLongitude)
+            - 0.5 * y * y * math.sin(4 * meanLongitude)
+            - 1.25 * eccentricity * eccentricity * math.sin(2 * meanAnomaly))
+
+        trueSolarTime = (minute + equationOfTime + 4 * longitude) % MINUTES_PER_DAY
+        hourAngle = math.radians(trueSolarTime / 4 - 180)
+
+        cosZenith = sinLatitude * math.sin(declination) + cosLatitude * math.cos(declination) * math.cos(hourAngle)
+        zenith = math.acos(max(min(cosZenith, 1.0), -1.0))
+        elevation = 90 - math.degrees(zenith)
+
+        denominator = cosLatitude * math.sin(zenith)
+        if abs(denominator) > 1e-9:
+            cosAzimuth = (sinLatitude * math.cos(zenith) - math.sin(declination)) / denominator
+            azimuth = math.degrees(math.acos(max(min(cosAzimuth, 1.0), -1.0)))
+        else:
+            azimuth = 0.0
+        if hourAngle > 0:
+            azimuth = (azimuth + 180) % 360
+        else:
+            azimuth = (540 - azimuth) % 360
+
+        elevations.append(elevation + refraction(elevation))
+        azimuths.append(azimuth)
+
+    return elevations, azimuths
+
+def refraction(elevation):
+    """Approximate atmospheric refraction in degrees for a true elevation in degrees."""
+    if elevation > 85:
+        return 0.0
+    te = math.tan(math.radians(elevation))
+    if elevation > 5:
+        correction = 58.1 / te - 0.07 / te ** 3 + 0.000086 / te ** 5
+    elif elevation > -0.575:
+        correction = 1735 + elevation * (-518.2 + elevation * (103.4 + elevation * (-12.79 + elevation * 0.711)))
+    else:
+        correction = -20.772 / te
+    return correction / 3600
+
+class SolarEphemeris:
+    """
+    Local replacement for Home Assistant's sun_elevation/sun_azimuth sensors.
+
+    The sun trajectory of a whole day is computed once per date and location
+    in minute resolution and linearly interpolated at the requested time.
+    """
+    def __init__(self, latitude, longitude):
+        self.latitude = float(latitude)
+        self.longitude = float(longitude)
+
+    def getDayTable(self, day):
+        return computeDayTable(day, self.latitude, self.longitude)
+
+    def getPosition(self, when=None):
+        """
+        Parameters:
+            when (datetime): Point in time, now if None. Naive datetimes are local time.
+
+        Returns:
+            tuple: (elevation, azimuth) in degrees
+        """
+        if when is None:
+            when = datetime.now(timezone.utc)
+        else:
+            when = when.astimezone(timezone.utc)
+
+        elevations, azimuths = self.getDayTable(when.date())
+        minutes = when.hour * 60 + when.minute + (when.second + when.microsecond / 1e6) / 60
+        index = min(int(minutes), MINUTES_PER_DAY - 1)
+        fraction = minutes - index
+
+        elevation = elevations[index] + (elevations[index + 1] - elevations[index]) * fraction
+        # Azimuth may wrap around north between two minutes
+        azimuthDelta = (azimuths[index + 1] - azimuths[index] + 180) % 360 - 180
+        azimuth = (azimuths[index] + azimuthDelta * fraction) % 360
+        return elevation, azimuth
+
+    def getElevation(self, when=None):
+        return self.getPosition(when)[0]
+
+    def getAzimuth(self, when=None):
+        return self.getPosition(when)[1]
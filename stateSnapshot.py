@@ -0,0 +1,21 @@
+from dataclasses import dataclass
+
+@dataclass(frozen=True)
+class StateSnapshot:
+    """Readings of one solar controller taken once per control tick.
+
+    Quantities which were not captured stay None.
+    """
+    status: str = None
+    pitch: float = None
+    roll: float = None
+    sunElevation: float = None
+    sunAzimuth: float = None
+    switchStates: tuple = ()
+
+    def switchState(self, entityId):
+        """Return the captured state of a switch or None if it wasn't captured."""
+        for capturedEntityId, state in self.switchStates:
+            if capturedEntityId == entityId:
+                return state
+        return None
@@ -1,28 +1,128 @@
 from collections import deque
 
 class SteadyState:
-    def __init__(self, size=15, tolerance=0.25):
+    """
+    Detects when a value stopped changing: all values of the window are
+    within ±tolerance of the latest one.
+
+    The window holds the last size values, or, if duration is given, the
+    values of the last duration seconds. Minimum and maximum of the window
+    are kept in monotonic deques and the statistics in running sums, so
+    every addValue is O(1) amortized.
+    """
+    def __init__(self, size=15, tolerance=0.25, duration=None):
         self.size = size
         self.tolerance = tolerance
-        self.buffer = deque(maxlen=size)
+        self.duration = duration
+        self.buffer = deque(maxlen=None if duration is not None else size)
+        self.reset()
 
     def reset(self):
         """Clear the buffer and reset the state."""
         self.buffer.clear()
+        self._minimas = deque() # (time, value), values increasing
+        self._maximas = deque() # (time, value), values decreasing
+        self._count = 0
+        self._firstTime = None
+        self._sumT = self._sumV = self._sumTT = self._sumTV = self._sumVV = 0.0
+
+    def addValue(self, value: float, time=None):
+        """
+        Add a new float value and perform the tolerance check.
+
+        Parameters:
+            value (float): New value
+            time (float): Time of the value in seconds, the number of the value if None.
+                          Required for time based windows.
+        """
+        if time is None:
+            if self.duration is not None:
+                raise ValueError("A time based window needs the time of every value")
+            time = self._count
+        if self._firstTime is None:
+            self._firstTime = time
+        self._count += 1
+
+        if self.duration is None and len(self.buffer) == self.size:
+            self._remove(*self.buffer[0])
+        self.buffer.append((time, value))
+        self._add(time, value)
+        if self.duration is not None:
+            while self.buffer[0][0] < time - self.duration:
+                self._remove(*self.buffer.popleft())
 
-    def addValue(self, value: float):
-        """Add a new float value and perform the tolerance check."""
-        self.buffer.append(value)
-        if len(self.buffer) == self.size:
+        while self._minimas and self._minimas[-1][1] >= value:
+            self._minimas.pop()
+        self._minimas.append((time, value))
+        while self._maximas and self._maximas[-1][1] <= value:
+            self._maximas.pop()
+        self._maximas.append((time, value))
+        oldest = self.buffer[0][0]
+        while self._minimas[0][0] < oldest:
+            self._minimas.popleft()
+        while self._maximas[0][0] < oldest:
+            self._maximas.popleft()
+
+        if self.isFull():
             return self._check_tolerance()
         else:
             return False  # Not enough values to check
 
+    def isFull(self):
+        if self.duration is not None:
+            return self._firstTime is not None and self.buffer[-1][0] - self._firstTime >= self.duration
+        return len(self.buffer) == self.size
+
+    def _add(self, time, value):
+        time = time - self._firstTime
+        self._sumT += time
+        self._sumV += value
+        self._sumTT += time * time
+        self._sumTV += time * value
+        self._sumVV += value * value
+
+    def _remove(self, time, value):
+        time = time - self._firstTime
+        self._sumT -= time
+        self._sumV -= value
+        self._sumTT -= time * time
+        self._sumTV -= time * value
+        self._sumVV -= value * value
+
     def _check_tolerance(self) -> bool:
         """Check if all values are within ±tolerance of the most recent value."""
-        latest = self.buffer[-1]
-        return all(abs(latest - v) <= self.tolerance for v in self.buffer)
+        latest = self.buffer[-1][1]
+        return self._maximas[0][1] - latest <= self.tolerance and latest - self._minimas[0][1] <= self.tolerance
+
+    def getMinimum(self):
+        return self._minimas[0][1] if self._minimas else None
+
+    def getMaximum(self):
+        return self._maximas[0][1] if self._maximas else None
+
+    def getMean(self):
+        return self._sumV / len(self.buffer) if self.buffer else None
+
+    def getVariance(self):
+        """Population variance of the window, None if empty."""
+        n = len(self.buffer)
+        if n == 0:
+            return None
+        return max(0.0, self._sumVV / n - (self._sumV / n) ** 2)
+
+    def getRateOfChange(self):
+        """
+        Slope of a least squares line through the window, per second for time
+        based windows and per value otherwise. None with less than two values.
+        """
+        n = len(self.buffer)
+        if n < 2:
+            return None
+        denominator = n * self._sumTT - self._sumT * self._sumT
+        if denominator <= 0:
+            return None
+        return (n * self._sumTV - self._sumT * self._sumV) / denominator
 
     def get_buffer(self):
         """Return the current buffer as a list."""
-        return list(self.buffer)
\ No newline at end of file
+        return [value for time, value in self.buffer]
@@ -0,0 +1,92 @@
+from collections import deque
+
+class StopPredictor:
+    """
+    Forecasts how far an axis still travels when its motor is switched off now.
+
+    The travel is velocity times a stop time which covers the sensor lag and
+    the coasting of the motor. The velocity is estimated from the recent
+    samples and from the commanded speed. Stop time and velocity per percent
+    of speed are learned per direction: the position at a stop is compared
+    with the first reading of the next move, when the axis is at rest.
+    """
+    def __init__(self, stopTime=0.5, learningRate=0.3, history=3, maximumStopTime=5.0, minimumVelocity=0.02):
+        self.defaultStopTime = stopTime
+        self.minimumVelocity = minimumVelocity
+        self.learningRate = learningRate
+        self.maximumStopTime = maximumStopTime
+        self.stopTimes = {}         # direction: seconds
+        self.velocityPerSpeed = {}  # direction: degrees per second and %
+        self.samples = deque(maxlen=history)
+        self.sampleDirection = None
+        self.pendingStop = None
+
+    def learn(self, table, direction, value, default):
+        table[direction] = table.get(direction, default) + self.learningRate * (value - table.get(direction, default))
+
+    def start(self, time, position):
+        """Starts a move at rest, learns the stop time from the previous stop."""
+        if self.pendingStop is not None:
+            direction, stopPosition, velocity = self.pendingStop
+            if velocity >= self.minimumVelocity:
+                stopTime = min(abs(position - stopPosition) / velocity, self.maximumStopTime)
+                self.learn(self.stopTimes, direction, stopTime, self.defaultStopTime)
+            self.pendingStop = None
+        self.samples.clear()
+        self.samples.append((time, position))
+        self.sampleDirection = None
+
+    def addSample(self, time, position, direction, speed):
+        """
+        Parameters:
+            time (float): Time of the sample in seconds
+            position (float): Sensor reading
+            direction (str): Direction the motor ran in since the previous sample, None if it was off
+            speed (float): Commanded speed in % since the previous sample
+        """
+        if direction != self.sampleDirection:
+            # Only samples of one run in one direction describe its velocity
+            self.samples = deque([self.samples[-1]] if self.samples else [], maxlen=self.samples.maxlen)
+            self.sampleDirection = direction
+        self.samples.append((time, position))
+
+        if direction is not None and speed and len(self.samples) == self.samples.maxlen:
+            velocity = self.getMeasuredVelocity()
+            if velocity is not None:
+                self.learn(self.velocityPerSpeed, direction, velocity / speed, velocity / speed)
+
+    def getMeasuredVelocity(self):
+        """Absolute slope of the samples in degrees per second, None with less than two samples."""
+        if len(self.samples) < 2:
+            return None
+        n = len(self.samples)
+        meanTime = sum(time for time, position in self.samples) / n
+        meanPosition = sum(position for time, position in self.samples) / n
+        denominator = sum((time - meanTime) ** 2 for time, position in self.samples)
+        if denominator <= 0:
+            return None
+        return abs(sum((time - meanTime) * (position - meanPosition) for time, position in self.samples) / denominator)
+
+    def getVelocity(self, direction, speed):
+        measured = self.getMeasuredVelocity() if direction == self.sampleDirection else None
+        model = self.velocityPerSpeed[direction] * speed if direction in self.velocityPerSpeed and speed else None
+        if measured is None:
+            return model or 0.0
+        if model is None:
+            return measured
+        return (measured + model) / 2
+
+    def getStopTime(self, direction):
+        return self.stopTimes.get(direction, self.defaultStopTime)
+
+    def predictTravel(self, direction, speed):
+        """Returns the distance in degrees the axis travels after switching off now."""
+        return self.getVelocity(direction, speed) * self.getStopTime(direction)
+
+    def stop(self, direction, position, speed):
+        """Records a stop, the travel after it is learned at the next start()."""
+        self.pendingStop = (direction, position, self.getVelocity(direction, speed))
+
+    def discardStop(self):
+        """Forgets the last stop, e.g. when the axis was moved since by something else than a move."""
+        self.pendingStop = None
@@ -0,0 +1,104 @@
+import asyncio
+from dataclasses import dataclass
+
+from constantsAndDefines import (
+    UpDownPosition,
+    EastWestPosition,
+    Constants
+)
+from solarController import SolarController
+
+# End reasons of axis moves which leave the axis in its protect position
+STOWED_END_REASONS = ("settled", "predicted", "max position")
+
+@dataclass(frozen=True)
+class StowResult:
+    """Outcome of the emergency stow of one tracker."""
+    controllerName: str
+    stowed: bool # Every axis reached its protect position
+    seconds: float # Time from the stow request until the last axis of the tracker stopped
+    results: tuple # AxisMoveResult of every axis, None for axes that didn't move
+
+class StowCoordinator:
+    """
+    Drives all trackers of a FleetManager into their protect positions, e.g.
+    for storms and high wind.
+
+    A stow first preempts every move of the fleet, whatever thread or event
+    loop it runs on, and keeps the fleet preempted until release(), so no
+    scheduled move takes a tracker out of stow. The axes of all trackers
+    then move at once within a motor current budget of maxConcurrentMotors
+    motors. The axes are queued tracker by tracker, so with a tight budget
+    the first trackers are stowed early instead of all of them late.
+    """
+    def __init__(self, fleet, maxConcurrentMotors=Constants.Stow.MAX_CONCURRENT_MOTORS, pollPeriod=Constants.Stow.POLL_PERIOD,
+                 preemptTimeout=Constants.Stow.PREEMPT_TIMEOUT):
+        """
+        Parameters:
+            fleet (FleetManager): Fleet whose controllers move the axes
+            maxConcurrentMotors (int): Motors running at the same time during the stow
+            pollPeriod (float): Seconds between checks whether a preempted move stopped
+            preemptTimeout (float): Seconds to wait for a preempted move to stop, the axis is stowed anyway afterwards
+        """
+        self.fleet = fleet
+        self.maxConcurrentMotors = maxConcurrentMotors
+        self.pollPeriod = pollPeriod
+        self.preemptTimeout = preemptTimeout
+
+    def release(self):
+        """Ends the stow, the fleet moves again."""
+        self.fleet.release()
+
+    def stow(self, controllerNames=None):
+        return self.fleet.submit(self.stowAsync(controllerNames)).result()
+
+    async def stowAsync(self, controllerNames=None):
+        """
+        Preempts all moves of the fleet and stows the trackers.
+
+        Parameters:
+            controllerNames (list): Trackers to stow, all known controllers if None
+
+        Returns:
+            list: StowResult of every tracker, in the order of controllerNames
+        """
+        fleet = self.fleet
+        if controllerNames is None:
+            controllerNames = fleet.registry.getControllerNames()
+        fleet.preempt()
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        motorSemaphore = asyncio.Semaphore(self.maxConcurrentMotors)
+
+        async def stowAxisAsync(controllerName, axis):
+            controller = fleet.getController(controllerName, axis)
+            deadline = start + self.preemptTimeout
+            while controller.isMoving() and loop.time() < deadline:
+                await asyncio.sleep(self.pollPeriod)
+            if controller.isMoving():
+                # The stuck controller is left alone, a fresh one moves the axis
+                fleet.hass.log(f"Solar controller {controllerName} {axis} move didn't stop within {self.preemptTimeout}s, stowing anyway")
+                controller = SolarController(fleet.hass, registry=fleet.registry, **fleet.controllerOptions)
+            async with motorSemaphore:
+                controller.clearPreemption()
+                if axis == "pitch":
+                    result = await controller.moveUpDownAsync(controllerName, UpDownPosition.Protect)
+                else:
+                    result = await controller.moveEastWestAsync(controllerName, EastWestPosition.Protect)
+            return result, loop.time() - start
+
+        stows = []
+        for controllerName in controllerNames:
+            axes = ("pitch",) if fleet.registry.isOneAxis(controllerName) else ("pitch", "roll")
+            stows.append((controllerName, [asyncio.ensure_future(stowAxisAsync(controllerName, axis)) for axis in axes]))
+
+        stowResults = []
+        for controllerName, tasks in stows:
+            axisStows = await asyncio.gather(*tasks)
+            results = tuple(result for result, seconds in axisStows)
+            stowed = all(result is not None and result.ok and result.endReason in STOWED_END_REASONS for result in results)
+            seconds = max(seconds for result, seconds in axisStows)
+            fleet.hass.log(f"Solar controller {controllerName} {'stowed' if stowed else 'NOT stowed'} after {seconds:.1f}s")
+            stowResults.append(StowResult(controllerName, stowed, seconds, results))
+        return stowResults
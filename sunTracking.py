@@ -0,0 +1,77 @@
+import math
+
+from constantsAndDefines import Constants
+from steadyState import SteadyState
+
+class AxisTracker:
+    """
+    Feed-forward tracking of one axis.
+
+    The rate of the target, fitted over the last rateWindow seconds, is fed
+    forward and the PID only corrects the residual difference. The sum is
+    the rate the axis has to move at, the MotorModel turns it into a speed.
+    Rates below the one of the lowest effective speed can't be driven
+    continuously, the axis then moves in pulses at that speed: a pulse
+    starts once the axis lags band degrees behind the target and ends when
+    it leads by band degrees, so the difference stays within ±band.
+    """
+    def __init__(self, pidController, motorModel, directions, minimumSpeed, maximumSpeed,
+                 band=Constants.Tracking.BAND, rateWindow=Constants.Tracking.RATE_WINDOW):
+        """
+        Parameters:
+            pidController (PIDController): Corrects the residual difference, output in degrees/s
+            motorModel (MotorModel): Speed needed for a rate
+            directions (tuple): Directions moving the axis towards a positive and a negative difference
+            minimumSpeed (float): Lowest effective speed in %
+            maximumSpeed (float): Highest speed in %
+        """
+        self.pidController = pidController
+        self.motorModel = motorModel
+        self.directions = directions
+        self.minimumSpeed = minimumSpeed
+        self.maximumSpeed = maximumSpeed
+        self.band = band
+        self.targetRate = SteadyState(duration=rateWindow)
+        self.feedForward = 0.0
+        self.rate = 0.0
+        self.pulse = 0 # Sign of the difference the running pulse reduces, 0 without pulse
+
+    def getDirection(self, sign):
+        return self.directions[0] if sign > 0 else self.directions[1]
+
+    def update(self, time, target, difference, dt):
+        """
+        Parameters:
+            time (float): Time of the readings in seconds
+            target (float): Target of the axis
+            difference (float): Target - position
+            dt (float): Time since the last update in seconds
+
+        Returns:
+            tuple: (direction, speed), direction None to stop the motor
+        """
+        self.targetRate.addValue(target, time)
+        rateOfChange = self.targetRate.getRateOfChange()
+        self.feedForward = rateOfChange if rateOfChange is not None else 0.0
+        # The PID regulates the difference to 0, its error is -difference
+        self.rate = self.feedForward - self.pidController.update(measurement=difference, dt=dt)
+
+        direction = self.getDirection(self.rate)
+        if math.fabs(self.rate) >= self.motorModel.getRate(direction, self.minimumSpeed):
+            self.pulse = 0
+            return direction, min(self.maximumSpeed, self.motorModel.getSpeed(direction, math.fabs(self.rate)))
+
+        if self.pulse == 0:
+            sign = 1 if difference > 0 else -1
+            # Pulses end leading the target by band, the target catches up from there
+            threshold = self.band if self.feedForward * sign >= 0 else 2 * self.band
+            if math.fabs(difference) >= threshold:
+                self.pulse = sign
+        else:
+            # Lead the target if it moves on in the direction of the pulse
+            lead = self.band if self.feedForward * self.pulse > 0 else 0.0
+            if difference * self.pulse <= -lead:
+                self.pulse = 0
+        if self.pulse == 0:
+            return None, 0.0
+        return self.getDirection(self.pulse), self.minimumSpeed
@@ -0,0 +1,216 @@
+import math
+import mmap
+import os
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+# Column name and array typecode, one file per column
+COLUMNS = (
+    ("time", "d"),       # s, clock of the recorder
+    ("axis", "B"),       # index into AXES
+    ("pitch", "f"),      # sensor reading
+    ("roll", "f"),       # sensor reading
+    ("target", "f"),     # target of the moved axis in sensor units
+    ("difference", "f"), # target - position as seen by the controller
+    ("control", "f"),    # PID output, NaN if the PID wasn't updated
+    ("speed", "f"),      # commanded speed in %, 0 once the axis stopped
+    ("switches", "B"),   # SWITCH_* bits of the switches that were on
+)
+AXES = ("pitch", "roll")
+SWITCH_UP = 1
+SWITCH_DOWN = 2
+SWITCH_EAST = 4
+SWITCH_WEST = 8
+
+def getColumnFileName(name, typecode):
+    return f"{name}.{typecode}{array(typecode).itemsize * 8}"
+
+class TelemetryRing:
+    """
+    Preallocated ring buffer of telemetry rows, stored column wise in arrays.
+
+    When the ring is full the oldest row is overwritten and counted as dropped.
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.columns = [array(typecode, bytes(array(typecode).itemsize * capacity)) for name, typecode in COLUMNS]
+        self.start = 0
+        self.count = 0
+        self.dropped = 0
+
+    def isFull(self):
+        return self.count == self.capacity
+
+    def append(self, row):
+        """
+        Parameters:
+            row (tuple): One value per column of COLUMNS
+        """
+        index = self.start + self.count
+        if index >= self.capacity:
+            index -= self.capacity
+        if self.count == self.capacity:
+            self.start = index + 1 if index + 1 < self.capacity else 0
+            self.dropped += 1
+        else:
+            self.count += 1
+        for column, value in zip(self.columns, row):
+            column[index] = value
+
+    def drain(self):
+        """Returns the rows as one array per column in recording order and empties the ring."""
+        end = self.start + self.count
+        if end <= self.capacity:
+            columns = [column[self.start:end] for column in self.columns]
+        else:
+            columns = [column[self.start:] + column[:end - self.capacity] for column in self.columns]
+        self.start = 0
+        self.count = 0
+        return columns
+
+class TelemetryRecorder:
+    """
+    Records the tick trajectory of every move into one TelemetryRing per
+    tracker and appends the rings in bulk to binary column files.
+
+    Every tracker gets a directory with one append-only file per column,
+    holding the raw native-endian values, so each column can be memory
+    mapped as a plain array (see TelemetryFile). A ring is flushed when it
+    is full and when flushInterval seconds have passed since the last flush.
+    The rows are written by a writer thread, so the control loop never
+    waits for the disk. Call close() on shutdown, e.g. in the terminate()
+    of the AppDaemon app, it writes the remaining rows and waits for them.
+    """
+    def __init__(self, directory, capacity=4096, flushInterval=300.0, clock=time.time):
+        self.directory = directory
+        self.capacity = capacity
+        self.flushInterval = flushInterval
+        self.clock = clock
+        self.rings = {}
+        self.lastFlush = clock()
+        self.repaired = set()
+        self.writer = None # One thread, so the writes of a tracker stay in order
+        self.writeError = None
+
+    def record(self, controllerName, axis, pitch, roll, target, difference, control, speed, switches):
+        ring = self.rings.get(controllerName)
+        if ring is None:
+            ring = self.rings[controllerName] = TelemetryRing(self.capacity)
+        now = self.clock()
+        ring.append((now, AXES.index(axis), nan(pitch), nan(roll), nan(target), nan(difference), nan(control), speed, switches))
+
+        if ring.isFull():
+            self.flush(controllerName)
+        elif now - self.lastFlush >= self.flushInterval:
+            self.flush()
+
+    def close(self):
+        """
+        Writes all buffered rows and waits until they are on disk.
+
+        Raises:
+            OSError: The first error of a write since the last close()
+        """
+        self.flush()
+        writer, self.writer = self.writer, None
+        if writer is not None:
+            writer.shutdown(wait=True)
+        error, self.writeError = self.writeError, None
+        if error is not None:
+            raise error
+
+    def flush(self, controllerName=None):
+        """Hands the buffered rows of one or all trackers to the writer thread, which appends them to their column files."""
+        names = list(self.rings) if controllerName is None else [controllerName]
+        for name in names:
+            ring = self.rings[name]
+            if ring.count:
+                if self.writer is None:
+                    self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="TelemetryRecorder")
+                self.writer.submit(self.writeColumns, name, ring.drain()).add_done_callback(self.checkWrite)
+        if controllerName is None:
+            self.lastFlush = self.clock()
+
+    def checkWrite(self, future):
+        if self.writeError is None and future.exception() is not None:
+            self.writeError = future.exception()
+
+    def getTrackerDirectory(self, controllerName):
+        return os.path.join(self.directory, controllerName)
+
+    def writeColumns(self, controllerName, columns):
+        trackerDirectory = self.getTrackerDirectory(controllerName)
+        if controllerName not in self.repaired:
+            os.makedirs(trackerDirectory, exist_ok=True)
+            truncateToCommonLength(trackerDirectory)
+            self.repaired.add(controllerName)
+        for (name, typecode), column in zip(COLUMNS, columns):
+            with open(os.path.join(trackerDirectory, getColumnFileName(name, typecode)), "ab") as file:
+                column.tofile(file)
+
+def nan(value):
+    return math.nan if value is None else value
+
+def truncateToCommonLength(trackerDirectory):
+    """Cuts off rows a crash left behind in some column files but not in others."""
+    lengths = {}
+    for name, typecode in COLUMNS:
+        path = os.path.join(trackerDirectory, getColumnFileName(name, typecode))
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        lengths[path] = (size // array(typecode).itemsize, array(typecode).itemsize)
+    rows = min(count for count, itemsize in lengths.values())
+    for path, (count, itemsize) in lengths.items():
+        if os.path.exists(path) and os.path.getsize(path) != rows * itemsize:
+            os.truncate(path, rows * itemsize)
+    return rows
+
+class TelemetryFile:
+    """
+    Read access to the column files of one tracker written by TelemetryRecorder.
+
+    The columns are memory mapped, column(name) returns a memoryview of the
+    values without copying them. Use as context manager to unmap the files.
+    """
+    def __init__(self, directory, controllerName):
+        self.trackerDirectory = os.path.join(directory, controllerName)
+        self.files = []
+        self.maps = {}
+        self.length = None
+        for name, typecode in COLUMNS:
+            path = os.path.join(self.trackerDirectory, getColumnFileName(name, typecode))
+            rows = os.path.getsize(path) // array(typecode).itemsize if os.path.exists(path) else 0
+            self.length = rows if self.length is None else min(self.length, rows)
+            if rows:
+                file = open(path, "rb")
+                self.files.append(file)
+                self.maps[name] = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.maps.clear()
+        for file in self.files:
+            file.close()
+        self.files = []
+
+    def column(self, name):
+        """Returns a memoryview of a column, e.g. column('pitch')[-100:]."""
+        typecode = dict(COLUMNS)[name]
+        if name not in self.maps:
+            return memoryview(array(typecode))
+        return memoryview(self.maps[name]).cast(typecode)[:self.length]
+
+    def rows(self, start=0, stop=None):
+        """Yields the rows as dicts, one at a time."""
+        stop = self.length if stop is None else min(stop, self.length)
+        columns = [(name, self.column(name)) for name, typecode in COLUMNS]
+        for index in range(start, stop):
+            yield {name: column[index] for name, column in columns}
@@ -0,0 +1,65 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from batchedControl import BatchedPIDController, BatchedCompensatePosition
+from compensatePosition import CompensatePosition
+from pidController import PIDController
+
+COUNT = 32
+
+def randomGains(rng):
+    return ([rng.uniform(0, 2) for index in range(COUNT)],
+            [rng.uniform(0, 0.5) for index in range(COUNT)],
+            [rng.uniform(0, 0.5) for index in range(COUNT)])
+
+@pytest.mark.parametrize("seed", range(10))
+def test_pidUpdateMatchesScalar(seed):
+    rng = random.Random(seed)
+    kp, ki, kd = randomGains(rng)
+    setpoints = [rng.uniform(-10, 10) for index in range(COUNT)]
+    scalars = [PIDController(kp[index], ki[index], kd[index], setpoints[index]) for index in range(COUNT)]
+    batched = BatchedPIDController(kp, ki, kd, COUNT, setpoints)
+    for tick in range(100):
+        measurements = [rng.uniform(-40, 40) for index in range(COUNT)]
+        # dt 0 skips the derivative, like the first tick of an event driven move
+        dts = [rng.choice((0.0, 0.5, 1.0, rng.uniform(0.1, 3.0))) for index in range(COUNT)]
+        mask = [rng.random() < 0.8 for index in range(COUNT)]
+        outputs = batched.update(np.array(measurements), np.array(dts), np.array(mask))
+        for index, pid in enumerate(scalars):
+            expected = pid.update(measurements[index], dts[index]) if mask[index] else 0.0
+            # Bitwise, the batch does the arithmetic of the scalar in the same order
+            assert outputs[index] == expected
+
+def test_pidFromControllersContinuesTheirState():
+    rng = random.Random(0)
+    scalars = [PIDController(1.0, 0.1, 0.2) for index in range(COUNT)]
+    for pid in scalars:
+        pid.update(rng.uniform(-10, 10), 1.0)
+    batched = BatchedPIDController.fromControllers(scalars)
+    measurements = [rng.uniform(-10, 10) for index in range(COUNT)]
+    outputs = batched.update(np.array(measurements), 1.0)
+    assert list(outputs) == [pid.update(measurement, 1.0) for pid, measurement in zip(scalars, measurements)]
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("exact", [True, False])
+def test_compensateMatchesScalar(seed, exact):
+    rng = random.Random(seed)
+    compensations = []
+    for index in range(COUNT):
+        low = rng.uniform(20, 40)
+        compensations.append(CompensatePosition(low, low + rng.uniform(10, 50), 1.0, rng.uniform(1.0, 2.0),
+                                                aggressiveness=rng.uniform(0.5, 5)))
+    batched = BatchedCompensatePosition.fromCompensations(compensations, exact=exact)
+    for tick in range(50):
+        # Beyond the limits the curve is clamped
+        pitches = [rng.uniform(10, 100) for index in range(COUNT)]
+        outputs = batched.compensate(np.array(pitches))
+        expected = np.array([compensation.compensate(pitch) for compensation, pitch in zip(compensations, pitches)])
+        if exact:
+            assert list(outputs) == list(expected)
+        else:
+            # np.power may round the last bit differently than math.pow
+            assert np.all(np.abs(outputs - expected) <= np.spacing(expected))
@@ -0,0 +1,62 @@
+import pytest
+
+from constantsAndDefines import UpDownPosition, EastWestPosition
+from motionVerifier import MotionStatus
+from moveBenchmark import BenchmarkScenario, MoveBenchmark
+from moveMetrics import MoveMetrics
+from solarController import SolarController
+from trackerSimulation import SimulatedHass, SimulatedTracker
+
+SUN_ELEVATION = 35
+SUN_AZIMUTH = 140
+# controllerName, axis, start offset from the target, the axes stay off their end stops
+MOVES = [
+    ("1_axis", "pitch", 10),
+    ("1_axis", "pitch", -10),
+    ("2_axis", "pitch", -10),
+    ("2_axis", "roll", 10),
+    ("2_axis", "roll", -10),
+]
+
+def runMove(controllerName, axis, offset, responsive=True, **axisOptions):
+    """Moves an axis of a simulated tracker to the sun, the axis starts offset degrees away from its target."""
+    scenario = BenchmarkScenario(controllerName, axis, "MinimizeDifference", offset, SUN_ELEVATION, SUN_AZIMUTH)
+    target = MoveBenchmark().getTarget(scenario)
+    if axis == "pitch":
+        tracker = SimulatedTracker(controllerName, target + offset, responsive=responsive, **axisOptions)
+    else:
+        tracker = SimulatedTracker(controllerName, 45, target + offset, responsive=responsive, **axisOptions)
+    hass = SimulatedHass([tracker], sunElevation=SUN_ELEVATION, sunAzimuth=SUN_AZIMUTH)
+    controller = SolarController(hass, metrics=MoveMetrics())
+    if axis == "pitch":
+        return hass.run(controller.moveUpDownAsync(controllerName, UpDownPosition.MinimizeDifference))
+    return hass.run(controller.moveEastWestAsync(controllerName, EastWestPosition.MinimizeDifference))
+
+@pytest.mark.parametrize("controllerName,axis,offset", MOVES)
+@pytest.mark.parametrize("sensorNoise", [0.05, 0.3])
+def test_healthyMoveHasNoFault(controllerName, axis, offset, sensorNoise):
+    result = runMove(controllerName, axis, offset, sensorNoise=sensorNoise)
+    assert result.status == MotionStatus.Ok
+    # Close to the breakaway speed the axis crawls, the move may end steady or time out but not with a fault
+    assert result.endReason not in ("stalled", "reversed", "unresponsive")
+
+@pytest.mark.parametrize("controllerName,axis,offset", MOVES)
+def test_jammedMotorStalls(controllerName, axis, offset):
+    result = runMove(controllerName, axis, offset, fault="jammed")
+    assert result.status == MotionStatus.Stalled
+    assert result.endReason == "stalled"
+    assert result.ticks <= 15
+
+@pytest.mark.parametrize("controllerName,axis,offset", [move for move in MOVES if move[1:] != ("roll", 10)])
+def test_reversedMotorIsDetected(controllerName, axis, offset):
+    # Starting east of the target, the reversed roll runs into its east end stop and stalls instead
+    result = runMove(controllerName, axis, offset, fault="reversed")
+    assert result.status == MotionStatus.Reversed
+    assert result.endReason == "reversed"
+    assert result.ticks <= 15
+
+@pytest.mark.parametrize("controllerName,axis,offset", MOVES)
+def test_ignoredCommandsAreUnresponsive(controllerName, axis, offset):
+    result = runMove(controllerName, axis, offset, responsive=False)
+    assert result.status == MotionStatus.Unresponsive
+    assert result.endReason == "unresponsive"
@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from steadyState import SteadyState
+
+def isSteadyByScan(window, tolerance):
+    """The full scan SteadyState did before the monotonic deques."""
+    latest = window[-1]
+    return all(abs(latest - value) <= tolerance for value in window)
+
+def randomWalk(rng, count, step):
+    value = rng.uniform(20, 70)
+    values = []
+    for index in range(count):
+        # Runs of small steps settle, occasional jumps break the window again
+        value += rng.gauss(0, step) if rng.random() < 0.9 else rng.uniform(-5, 5)
+        values.append(value)
+    return values
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("size,tolerance", [(1, 0.25), (3, 0.1), (15, 0.25), (40, 0.5)])
+def test_countWindowMatchesFullScan(seed, size, tolerance):
+    rng = random.Random(seed)
+    steadyState = SteadyState(size=size, tolerance=tolerance)
+    window = []
+    for value in randomWalk(rng, 500, tolerance / 2):
+        window = (window + [value])[-size:]
+        expected = len(window) == size and isSteadyByScan(window, tolerance)
+        assert steadyState.addValue(value) == expected
+        assert steadyState.getMinimum() == min(window)
+        assert steadyState.getMaximum() == max(window)
+        assert steadyState.get_buffer() == window
+
+@pytest.mark.parametrize("seed", range(10))
+def test_timeWindowMatchesFullScan(seed):
+    rng = random.Random(seed)
+    duration = 10.0
+    steadyState = SteadyState(tolerance=0.25, duration=duration)
+    time = 0.0
+    samples = []
+    for value in randomWalk(rng, 500, 0.1):
+        time += rng.uniform(0.2, 2.0)
+        samples.append((time, value))
+        window = [value for sampleTime, value in samples if sampleTime >= time - duration]
+        expected = time - samples[0][0] >= duration and isSteadyByScan(window, 0.25)
+        assert steadyState.addValue(value, time) == expected
+        assert steadyState.get_buffer() == window
+
+def test_resetStartsAnEmptyWindow():
+    steadyState = SteadyState(size=3, tolerance=0.1)
+    for value in (1.0, 1.0, 1.0):
+        steadyState.addValue(value)
+    steadyState.reset()
+    assert steadyState.addValue(1.0) is False
+    assert steadyState.get_buffer() == [1.0]
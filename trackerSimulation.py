@@ -0,0 +1,351 @@
+import asyncio
+import json
+import math
+import random
+from collections import Counter, deque
+
+from constantsAndDefines import Constants
+from controllerProfile import controllerRegistry
+from mqttTransport import DeviceEntity, MQTT_BRIGHTNESS_MAX
+from solarController import SUN_ELEVATION_ENTITY_ID, SUN_AZIMUTH_ENTITY_ID, clamp
+from virtualTime import runVirtual
+
+class SimulatedAxis:
+    """
+    Plant model of one tracker axis.
+
+    The motor runs at ratePerPercent degrees per second for every percent of
+    speed above stallSpeed, scaled per direction, and follows speed changes
+    with a first order lag of responseTime seconds, so it coasts after being
+    stopped. The axis is held by end stops endStopMargin degrees beyond the
+    controller limits. The sensor samples every samplePeriod seconds with
+    Gaussian noise and its value becomes visible sensorLag seconds later.
+
+    fault injects a motor fault: 'jammed' doesn't move at all, 'reversed'
+    moves against the commanded direction.
+    """
+    def __init__(self, position, minimum, maximum, directionFactors,
+                 ratePerPercent=0.03, stallSpeed=40.0, responseTime=0.5,
+                 samplePeriod=1.0, sensorLag=0.3, sensorNoise=0.05,
+                 endStopMargin=2.0, integrationStep=0.05, rng=None, fault=None):
+        self.position = float(position)
+        self.minimum = minimum - endStopMargin
+        self.maximum = maximum + endStopMargin
+        self.directionFactors = directionFactors # {+1: factor, -1: factor}
+        self.ratePerPercent = ratePerPercent
+        self.stallSpeed = stallSpeed
+        self.responseTime = responseTime
+        self.samplePeriod = samplePeriod
+        self.sensorLag = sensorLag
+        self.sensorNoise = sensorNoise
+        self.integrationStep = integrationStep
+        self.rng = rng if rng is not None else random.Random(0)
+        self.fault = fault
+
+        self.direction = 0
+        self.speed = 0.0 # %
+        self.velocity = 0.0 # degrees per second
+        self.time = 0.0
+        self.nextSampleTime = samplePeriod
+        self.samples = deque([(0.0, self.position)], maxlen=int(sensorLag / samplePeriod) + 2)
+        self.motorOnTime = 0.0
+        self.lowest = self.position
+        self.highest = self.position
+
+    def getTargetVelocity(self):
+        if self.direction == 0 or self.fault == "jammed":
+            return 0.0
+        rate = self.ratePerPercent * max(0.0, self.speed - self.stallSpeed)
+        velocity = self.direction * rate * self.directionFactors[self.direction]
+        return -velocity if self.fault == "reversed" else velocity
+
+    def advance(self, now):
+        while self.time < now:
+            end = min(now, self.time + self.integrationStep, self.nextSampleTime)
+            dt = end - self.time
+            targetVelocity = self.getTargetVelocity()
+            if targetVelocity != 0:
+                self.motorOnTime += dt
+            if dt > 0:
+                self.velocity += (targetVelocity - self.velocity) * min(1.0, dt / self.responseTime)
+                moved = self.position + self.velocity * dt
+                self.position = clamp(moved, self.minimum, self.maximum)
+                if self.position != moved:
+                    self.velocity = 0.0
+                self.lowest = min(self.lowest, self.position)
+                self.highest = max(self.highest, self.position)
+            self.time = end
+            if self.time >= self.nextSampleTime:
+                self.samples.append((self.time, self.position + self.rng.gauss(0.0, self.sensorNoise)))
+                self.nextSampleTime += self.samplePeriod
+
+    def command(self, now, direction=None, speed=None):
+        self.advance(now)
+        if direction is not None:
+            self.direction = direction
+        if speed is not None:
+            self.speed = speed
+
+    def getSensorValue(self, now):
+        self.advance(now)
+        value = None
+        for sampleTime, sampleValue in self.samples:
+            if sampleTime <= now - self.sensorLag:
+                value = sampleValue
+        if value is None:
+            value = self.samples[0][1]
+        return value
+
+    def getNextPublishTime(self, now):
+        """Time at which the next sensor sample becomes visible."""
+        sample = math.floor((now - self.sensorLag) / self.samplePeriod) + 1
+        publishTime = sample * self.samplePeriod + self.sensorLag
+        if publishTime <= now + 1e-9:
+            publishTime += self.samplePeriod
+        return publishTime
+
+class SimulatedTracker:
+    """
+    Solar controller (ESP32) with a pitch and a roll axis.
+
+    A tracker that isn't responsive reports 'on' but ignores all switch and
+    light commands.
+    """
+    def __init__(self, controllerName, pitch, roll=0.0, registry=None, connected=True, responsive=True, **axisOptions):
+        registry = registry if registry is not None else controllerRegistry
+        self.profile, created = registry.get(controllerName)
+        self.connected = connected
+        self.responsive = responsive
+        self.actionState = ""
+        self.switches = {}
+
+        # Up decreases the pitch of two axis controllers and increases it on one axis controllers
+        up = 1 if self.profile.isOneAxis else -1
+        self.pitch = SimulatedAxis(pitch, self.profile.pitchMaximas.MIN, self.profile.pitchMaximas.MAX,
+                                   {up: 1.0, -up: 1.0 / Constants.Speed.DOWN_FACTOR}, **axisOptions)
+        self.roll = SimulatedAxis(roll, self.profile.rollMaximas.MIN, self.profile.rollMaximas.MAX,
+                                  {1: 1.0, -1: 1.0 / Constants.Speed.WEST_FACTOR}, **axisOptions)
+        self.switchAxes = {
+            self.profile.switchUpEntityId: (self.pitch, up, self.profile.switchDownEntityId),
+            self.profile.switchDownEntityId: (self.pitch, -up, self.profile.switchUpEntityId),
+            self.profile.switchEastEntityId: (self.roll, 1, self.profile.switchWestEntityId),
+            self.profile.switchWestEntityId: (self.roll, -1, self.profile.switchEastEntityId),
+        }
+        self.lightAxes = {
+            self.profile.lightSpeedUpDownEntityId: self.pitch,
+            self.profile.lightSpeedEastWestEntityId: self.roll,
+        }
+        for entityId in self.switchAxes:
+            self.switches[entityId] = "off"
+
+    def getEntityIds(self):
+        profile = self.profile
+        return [profile.statusEntityId, profile.pitchEntityId, profile.rollEntityId, profile.actionStateId] \
+            + list(self.switchAxes) + list(self.lightAxes)
+
+    def getState(self, entityId, now):
+        profile = self.profile
+        if entityId == profile.statusEntityId:
+            return "on" if self.connected else "off"
+        if not self.connected:
+            return "unavailable"
+        if entityId == profile.pitchEntityId:
+            return str(round(self.pitch.getSensorValue(now), 2))
+        if entityId == profile.rollEntityId:
+            return str(round(self.roll.getSensorValue(now), 2))
+        if entityId in self.switches:
+            return self.switches[entityId]
+        if entityId in self.lightAxes:
+            return "on" if self.lightAxes[entityId].speed > 0 else "off"
+        if entityId == profile.actionStateId:
+            return self.actionState
+        return None
+
+    def callService(self, service, entityId, now, data):
+        if not self.connected or not self.responsive:
+            return
+        if entityId in self.switchAxes:
+            axis, direction, oppositeEntityId = self.switchAxes[entityId]
+            if service == "switch/turn_on":
+                # The ESP32 interlocks both directions of an axis
+                self.switches[entityId] = "on"
+                self.switches[oppositeEntityId] = "off"
+                axis.command(now, direction=direction)
+            elif service == "switch/turn_off":
+                self.switches[entityId] = "off"
+                if axis.direction == direction:
+                    axis.command(now, direction=0)
+        elif entityId in self.lightAxes:
+            brightness = data.get("brightness", 256) if service == "light/turn_on" else 0
+            self.lightAxes[entityId].command(now, speed=brightness / 256 * 100)
+        elif entityId == self.profile.actionStateId:
+            self.actionState = data.get("value", "")
+
+class SimulatedHass:
+    """
+    Stand-in for the AppDaemon Hass API backed by simulated trackers and a
+    sun moving at a constant angular rate.
+
+    Time is the time of the running event loop, use run() to execute a move
+    on virtual time. All get_state and call_service calls are counted.
+    """
+    def __init__(self, trackers, sunElevation=45.0, sunAzimuth=180.0,
+                 sunElevationRate=0.0, sunAzimuthRate=0.0, keepLogs=1000):
+        self.trackers = {}
+        for tracker in trackers:
+            for entityId in tracker.getEntityIds():
+                self.trackers[entityId] = tracker
+        self.sunElevation = sunElevation
+        self.sunAzimuth = sunAzimuth
+        self.sunElevationRate = sunElevationRate
+        self.sunAzimuthRate = sunAzimuthRate
+        self.logs = deque(maxlen=keepLogs)
+        self.counts = Counter()
+        self.listeners = {}
+        self.nextListenerHandle = 0
+        self.lastTime = 0.0
+
+    def run(self, coroutine):
+        return runVirtual(coroutine)
+
+    def now(self):
+        try:
+            self.lastTime = asyncio.get_running_loop().time()
+        except RuntimeError:
+            pass
+        return self.lastTime
+
+    def resetCounts(self):
+        self.counts.clear()
+
+    def log(self, msg, *args, **kwargs):
+        self.logs.append((self.now(), msg))
+
+    def get_state(self, entity_id=None, **kwargs):
+        self.counts["get_state"] += 1
+        return self.readState(entity_id, self.now())
+
+    def readState(self, entityId, now):
+        if entityId == SUN_ELEVATION_ENTITY_ID:
+            return str(round(self.sunElevation + self.sunElevationRate * now, 2))
+        if entityId == SUN_AZIMUTH_ENTITY_ID:
+            return str(round(self.sunAzimuth + self.sunAzimuthRate * now, 2))
+        tracker = self.trackers.get(entityId)
+        if tracker is None:
+            return None
+        return tracker.getState(entityId, now)
+
+    def call_service(self, service, **kwargs):
+        self.counts["call_service"] += 1
+        self.counts[service] += 1
+        entityId = kwargs.pop("entity_id", None)
+        tracker = self.trackers.get(entityId)
+        if tracker is not None:
+            tracker.callService(service, entityId, self.now(), kwargs)
+
+    def listen_state(self, callback, entity_id=None, **kwargs):
+        self.nextListenerHandle += 1
+        handle = self.nextListenerHandle
+        self.listeners[handle] = (callback, entity_id, self.readState(entity_id, self.now()))
+        self.schedulePublish(handle)
+        return handle
+
+    def cancel_listen_state(self, handle):
+        self.listeners.pop(handle, None)
+
+    def schedulePublish(self, handle):
+        callback, entityId, lastValue = self.listeners[handle]
+        tracker = self.trackers.get(entityId)
+        if tracker is None:
+            return
+        axis = tracker.pitch if entityId == tracker.profile.pitchEntityId else tracker.roll
+        loop = asyncio.get_running_loop()
+        loop.call_at(axis.getNextPublishTime(loop.time()), self.publish, handle)
+
+    def publish(self, handle):
+        if handle not in self.listeners:
+            return
+        callback, entityId, lastValue = self.listeners[handle]
+        value = self.readState(entityId, self.now())
+        self.listeners[handle] = (callback, entityId, value)
+        if value != lastValue:
+            callback(entityId, "state", lastValue, value, {})
+        self.schedulePublish(handle)
+
+class SimulatedEspHomeDevice:
+    """
+    MQTT side of the ESPHome firmware of a simulated tracker.
+
+    Publishes the retained availability, the switch and light states on
+    every change and the pitch and roll readings whenever a new sample
+    becomes visible, and executes the commands of the command topics. The
+    device runs on the event loop it was started on, see start().
+    """
+    def __init__(self, tracker, broker):
+        self.tracker = tracker
+        self.device = tracker.profile.mqttTopicPrefix
+        self.client = broker.connect(self.device)
+        self.entities = {}
+        self.commandEntityIds = {}
+        for entityId in list(tracker.switchAxes) + list(tracker.lightAxes) \
+                + [tracker.profile.statusEntityId, tracker.profile.pitchEntityId, tracker.profile.rollEntityId]:
+            component, separator, name = entityId.partition(".")
+            entity = DeviceEntity(self.device, component, name[len(tracker.profile.controllerEntityIdBase) + 1:])
+            self.entities[entityId] = entity
+            self.commandEntityIds[entity.getCommandTopic()] = entityId
+        self.states = {}
+        self.timers = {}
+
+    def start(self):
+        tracker = self.tracker
+        self.client.publish(self.entities[tracker.profile.statusEntityId].getStateTopic(),
+                            "online" if tracker.connected else "offline", retain=True)
+        if not tracker.connected:
+            return
+        self.publishStates()
+        self.client.subscribe(f"{self.device}/+/+/command", self.onCommand)
+        for axis, entityId in ((tracker.pitch, tracker.profile.pitchEntityId), (tracker.roll, tracker.profile.rollEntityId)):
+            self.publishSample(axis, entityId)
+
+    def stop(self):
+        for timer in self.timers.values():
+            timer.cancel()
+        self.timers = {}
+        self.client.close()
+
+    def publishStates(self):
+        """Publishes the switch and light states which changed since they were last published."""
+        tracker = self.tracker
+        now = asyncio.get_running_loop().time()
+        for entityId in list(tracker.switchAxes) + list(tracker.lightAxes):
+            state = tracker.getState(entityId, now)
+            if entityId in tracker.lightAxes:
+                brightness = round(tracker.lightAxes[entityId].speed / 100 * 256)
+                payload = json.dumps({"state": state.upper(), "brightness": min(brightness, MQTT_BRIGHTNESS_MAX)})
+            else:
+                payload = state.upper()
+            if self.states.get(entityId) != payload:
+                self.states[entityId] = payload
+                self.client.publish(self.entities[entityId].getStateTopic(), payload, retain=True)
+
+    def publishSample(self, axis, entityId):
+        loop = asyncio.get_running_loop()
+        self.client.publish(self.entities[entityId].getStateTopic(), self.tracker.getState(entityId, loop.time()))
+        self.timers[entityId] = loop.call_at(axis.getNextPublishTime(loop.time()), self.publishSample, axis, entityId)
+
+    def onCommand(self, topic, payload):
+        entityId = self.commandEntityIds.get(topic)
+        if entityId is None:
+            return
+        component = self.entities[entityId].component
+        data = {}
+        if component == "light":
+            command = json.loads(payload)
+            on = command.get("state") == "ON"
+            if on and "brightness" in command:
+                data["brightness"] = command["brightness"]
+        else:
+            on = payload == "ON"
+        service = f"{component}/turn_{'on' if on else 'off'}"
+        self.tracker.callService(service, entityId, asyncio.get_running_loop().time(), data)
+        self.publishStates()
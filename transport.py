@@ -0,0 +1,27 @@
+class HassTransport:
+    """
+    Reads and writes the entities through the AppDaemon Hass API.
+
+    A transport offers the subset of the Hass API the controllers use for
+    their I/O: get_state, call_service, listen_state and
+    cancel_listen_state. Results may be awaitables like the ones of
+    AppDaemon's async API, see asyncUtils.resolve. primeAsync is awaited
+    before entities are read, e.g. to subscribe to them.
+    """
+    def __init__(self, hass):
+        self.hass = hass
+
+    def get_state(self, entity_id=None, **kwargs):
+        return self.hass.get_state(entity_id, **kwargs)
+
+    async def primeAsync(self, entityIds):
+        """Home Assistant knows the states of all entities already."""
+
+    def call_service(self, service, **kwargs):
+        return self.hass.call_service(service, **kwargs)
+
+    def listen_state(self, callback, entity_id=None, **kwargs):
+        return self.hass.listen_state(callback, entity_id, **kwargs)
+
+    def cancel_listen_state(self, handle):
+        return self.hass.cancel_listen_state(handle)
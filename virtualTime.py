@@ -0,0 +1,47 @@
+import asyncio
+import selectors
+
+class VirtualTimeSelector(selectors.DefaultSelector):
+    """
+    Selector which, instead of blocking until the next scheduled callback is
+    due, advances the virtual time to it.
+    """
+    def __init__(self):
+        super().__init__()
+        self.time = 0.0
+
+    def select(self, timeout=None):
+        events = super().select(0)
+        if events:
+            return events
+        if timeout is None:
+            # Nothing scheduled, only another thread can wake the loop up
+            return super().select(None)
+        self.time += timeout
+        return []
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    """
+    Event loop running on virtual time.
+
+    asyncio.sleep, asyncio.wait_for and call_later complete immediately while
+    loop.time() advances as if they had waited, so a 90 s move runs in
+    milliseconds.
+    """
+    def __init__(self):
+        self.virtualTimeSelector = VirtualTimeSelector()
+        super().__init__(self.virtualTimeSelector)
+
+    def time(self):
+        return self.virtualTimeSelector.time
+
+def runVirtual(coroutine):
+    """Like asyncio.run, but on a VirtualTimeEventLoop."""
+    loop = VirtualTimeEventLoop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coroutine)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()